@@ -0,0 +1,90 @@
+"""
+Admin Dashboard Statistics for SIPORTS v2.0
+Incremental user counters maintained by triggers, plus an SSE change feed
+"""
+
+import os
+import json
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Seconds between re-reads/keep-alives on the SSE stream (also picks up other workers' writes)
+STATS_STREAM_HEARTBEAT = float(os.environ.get('STATS_STREAM_HEARTBEAT', 15))
+
+USER_TYPES = ('visitor', 'exhibitor', 'partner')
+USER_STATUSES = ('pending', 'validated', 'rejected')
+
+
+# user_counters is kept up to date by triggers on users (migration 'user_counters'),
+# so every write adjusts the counters in its own transaction
+def read_user_stats(conn) -> dict:
+    """Dashboard statistics from the counters table (independent of the user count)"""
+    rows = conn.execute('SELECT user_type, status, count FROM user_counters').fetchall()
+
+    stats = {"total_users": 0}
+    by_type = {user_type: 0 for user_type in USER_TYPES}
+    by_status = {status: 0 for status in USER_STATUSES}
+    for user_type, status, count in rows:
+        stats["total_users"] += count
+        if user_type in by_type:
+            by_type[user_type] += count
+        if status in by_status:
+            by_status[status] += count
+
+    stats.update({
+        "visitors": by_type['visitor'],
+        "exhibitors": by_type['exhibitor'],
+        "partners": by_type['partner'],
+        "pending": by_status['pending'],
+        "validated": by_status['validated'],
+        "rejected": by_status['rejected']
+    })
+    return stats
+
+
+class StatsBroadcaster:
+    """Wakes SSE subscribers when a write may have changed the counters"""
+
+    def __init__(self):
+        self._subscribers = set()
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=1)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def notify(self):
+        """Signal every subscriber (coalesced: at most one pending wake-up each)"""
+        for queue in list(self._subscribers):
+            if queue.empty():
+                queue.put_nowait(True)
+
+
+async def stats_event_stream(request, read_stats, broadcaster):
+    """Server-sent events: the current stats, then one event per change"""
+    queue = broadcaster.subscribe()
+    last_stats = None
+    try:
+        while not await request.is_disconnected():
+            stats = await read_stats()
+            if stats != last_stats:
+                last_stats = stats
+                yield f"event: stats\ndata: {json.dumps(stats)}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+
+            try:
+                await asyncio.wait_for(queue.get(), timeout=STATS_STREAM_HEARTBEAT)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        broadcaster.unsubscribe(queue)
+
+
+# Global stats broadcaster instance
+stats_broadcaster = StatsBroadcaster()
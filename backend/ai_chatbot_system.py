@@ -8,16 +8,49 @@ Chatbot maritime intelligent avec IA avancée
 import os
 import json
 import uuid
-import sqlite3
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 from fastapi import HTTPException, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
 import logging
 from emergentintegrations.llm.chat import LlmChat, UserMessage
+from database import get_pool, get_async_db
+from keyword_matcher import KeywordMatcher
+from response_cache import ResponseCache
+from chatbot_service import text_chunks
 
 logger = logging.getLogger('siports_ai_chatbot')
 
+# Intentions par ordre de priorité (la première reconnue l'emporte)
+INTENT_PATTERNS = {
+    "info_packages": ["forfait", "package", "prix", "tarif", "coût"],
+    "info_event": ["salon", "événement", "programme", "horaires", "lieu"],
+    "networking": ["rdv", "rendez-vous", "rencontre", "contact", "réseau"],
+    "technical_help": ["problème", "bug", "aide", "support", "erreur"],
+    "matching": ["partenaire", "match", "recherche", "recommandation"],
+    "navigation": ["comment", "où", "naviguer", "utiliser", "fonctionner"],
+    "greeting": ["bonjour", "salut", "hello", "bonsoir", "coucou"],
+    "goodbye": ["au revoir", "bye", "salut", "à bientôt"]
+}
+
+# Sentiment et intention des messages utilisateur, reconnus en un seul passage
+MESSAGE_KEYWORDS = KeywordMatcher({
+    "sentiment": {
+        "positive": ['merci', 'excellent', 'parfait', 'super', 'génial', 'bravo', 'formidable'],
+        "negative": ['problème', 'erreur', 'bug', 'cassé', 'mauvais', 'nul', 'horrible']
+    },
+    "intent": INTENT_PATTERNS
+})
+
+# Thèmes des réponses qui déclenchent des suggestions
+RESPONSE_KEYWORDS = KeywordMatcher({
+    "topic": {
+        "packages": ["forfait", "package"],
+        "meetings": ["rdv", "rendez-vous"],
+        "matching": ["matching", "partenaire"]
+    }
+})
+
 class ChatMessage(BaseModel):
     id: str
     session_id: str
@@ -47,7 +80,11 @@ class MaritimeChatBot:
     def __init__(self, claude_api_key: str):
         self.claude_api_key = claude_api_key
         self.db_path = "/app/instance/siports_production.db"
+        self.db = get_pool(self.db_path)
+        self.async_db = get_async_db(self.db_path)
         self.active_sessions: Dict[str, LlmChat] = {}
+        # Réponses de Claude aux questions sans contexte personnel, partagées entre sessions
+        self.response_cache = ResponseCache()
         
         # Système prompt spécialisé maritime
         self.maritime_system_prompt = """
@@ -97,7 +134,12 @@ Si une question n'est pas liée au maritime, redirige poliment vers le contexte
     
     def init_database(self):
         """Initialiser les tables pour le chatbot"""
-        conn = sqlite3.connect(self.db_path)
+        with self.db.connection() as conn:
+            self._create_tables(conn)
+        logger.info("✅ Base de données chatbot initialisée")
+    
+    def _create_tables(self, conn):
+        """Créer les tables chat_* si nécessaire"""
         cursor = conn.cursor()
         
         # Table des sessions de chat
@@ -160,10 +202,6 @@ Si une question n'est pas liée au maritime, redirige poliment vers le contexte
                 FOREIGN KEY (message_id) REFERENCES chat_messages(id)
             )
         """)
-        
-        conn.commit()
-        conn.close()
-        logger.info("✅ Base de données chatbot initialisée")
     
     def create_session(self, user_id: Optional[int] = None, language: str = "fr") -> str:
         """Créer une nouvelle session de chat"""
@@ -179,16 +217,11 @@ Si une question n'est pas liée au maritime, redirige poliment vers le contexte
         self.active_sessions[session_id] = llm_chat
         
         # Sauvegarder en base
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO chat_sessions (id, user_id, language, context)
-            VALUES (?, ?, ?, ?)
-        """, (session_id, user_id, language, json.dumps({})))
-        
-        conn.commit()
-        conn.close()
+        with self.db.connection() as conn:
+            conn.execute("""
+                INSERT INTO chat_sessions (id, user_id, language, context)
+                VALUES (?, ?, ?, ?)
+            """, (session_id, user_id, language, json.dumps({})))
         
         logger.info(f"💬 Nouvelle session chat créée: {session_id}")
         return session_id
@@ -211,13 +244,21 @@ Si une question n'est pas liée au maritime, redirige poliment vers le contexte
             # Enrichir le message avec le contexte utilisateur
             enriched_message = await self.enrich_message_with_context(message, user_id, session_id)
             
-            # Envoyer le message à Claude
-            user_message = UserMessage(text=enriched_message)
-            response = await llm_chat.send_message(user_message)
+            # Sans profil ni historique, la réponse ne dépend que du message: elle peut être réutilisée
+            cache_context = f"maritime:{language}" if enriched_message == message else None
+            response = self.response_cache.get(cache_context, message) if cache_context else None
+            
+            if response is None:
+                # Envoyer le message à Claude
+                user_message = UserMessage(text=enriched_message)
+                response = await llm_chat.send_message(user_message)
+                if cache_context:
+                    self.response_cache.set(cache_context, message, response)
             
-            # Analyser le sentiment et l'intent
-            sentiment_score = await self.analyze_sentiment(message)
-            intent = await self.detect_intent(message)
+            # Analyser le sentiment et l'intent (un seul passage sur le message)
+            keywords = MESSAGE_KEYWORDS.scan(message)
+            sentiment_score = await self.analyze_sentiment(message, keywords)
+            intent = await self.detect_intent(message, keywords)
             
             # Sauvegarder le message et la réponse
             message_id = str(uuid.uuid4())
@@ -248,6 +289,38 @@ Si une question n'est pas liée au maritime, redirige poliment vers le contexte
                 "timestamp": datetime.utcnow().isoformat()
             }
     
+    async def stream_message(self, session_id: str, message: str, user_id: Optional[int] = None,
+                             message_type: str = "text", language: str = "fr"):
+        """Réponse en événements: "start", un "token" par fragment, puis "end" (résultat de send_message).
+
+        LlmChat ne renvoie que des réponses complètes: les fragments d'une réponse
+        de Claude partent dès sa réception, ceux d'une réponse en cache immédiatement.
+        """
+        yield {"type": "start", "session_id": session_id}
+        result = await self.send_message(session_id, message, user_id, message_type, language)
+        if "error" not in result:
+            for chunk in text_chunks(result["response"]):
+                yield {"type": "token", "content": chunk}
+        yield {"type": "end", **result}
+    
+    async def serve_websocket(self, websocket: WebSocket, user_id: Optional[int] = None, language: str = "fr"):
+        """Conversation sur WebSocket: {"message": ...} en entrée, événements de stream_message en sortie"""
+        await websocket.accept()
+        session_id = None
+        try:
+            while True:
+                payload = await websocket.receive_json()
+                message = payload.get("message") if isinstance(payload, dict) else None
+                if not isinstance(message, str) or not message.strip():
+                    await websocket.send_json({"type": "error", "detail": "Message vide"})
+                    continue
+                session_id = payload.get("session_id") or session_id or self.create_session(user_id, language)
+                async for event in self.stream_message(session_id, message, user_id,
+                                                       payload.get("message_type", "text"), language):
+                    await websocket.send_json(event)
+        except WebSocketDisconnect:
+            logger.info(f"💬 WebSocket chat fermé: {session_id}")
+    
     async def enrich_message_with_context(self, message: str, user_id: Optional[int], session_id: str) -> str:
         """Enrichir le message avec le contexte utilisateur et session"""
         context_parts = [message]
@@ -268,19 +341,12 @@ Si une question n'est pas liée au maritime, redirige poliment vers le contexte
     async def get_user_context(self, user_id: int) -> str:
         """Récupérer le contexte utilisateur pour personnaliser les réponses"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            user = await self.async_db.fetchone("""
                 SELECT user_type, visitor_package, partnership_package, company, 
                        first_name, last_name, profile_completion
                 FROM users WHERE id = ?
             """, (user_id,))
             
-            user = cursor.fetchone()
-            conn.close()
-            
             if not user:
                 return ""
             
@@ -308,10 +374,7 @@ Si une question n'est pas liée au maritime, redirige poliment vers le contexte
     async def get_session_context(self, session_id: str, limit: int = 3) -> str:
         """Récupérer l'historique récent de la session"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            messages = await self.async_db.fetchall("""
                 SELECT message, response
                 FROM chat_messages 
                 WHERE session_id = ?
@@ -319,9 +382,6 @@ Si une question n'est pas liée au maritime, redirige poliment vers le contexte
                 LIMIT ?
             """, (session_id, limit))
             
-            messages = cursor.fetchall()
-            conn.close()
-            
             if not messages:
                 return ""
             
@@ -336,24 +396,13 @@ Si une question n'est pas liée au maritime, redirige poliment vers le contexte
             logger.error(f"Erreur historique session: {e}")
             return ""
     
-    async def analyze_sentiment(self, message: str) -> float:
+    async def analyze_sentiment(self, message: str, keywords: Optional[Dict[str, Any]] = None) -> float:
         """Analyser le sentiment du message (simple heuristique)"""
-        positive_words = ['merci', 'excellent', 'parfait', 'super', 'génial', 'bravo', 'formidable']
-        negative_words = ['problème', 'erreur', 'bug', 'cassé', 'mauvais', 'nul', 'horrible']
-        neutral_words = ['question', 'comment', 'pourquoi', 'quand', 'où', 'info']
-        
-        message_lower = message.lower()
-        
-        score = 0.0
+        found = (keywords or MESSAGE_KEYWORDS.scan(message))["sentiment"]
         word_count = len(message.split())
         
-        for word in positive_words:
-            if word in message_lower:
-                score += 1.0
-        
-        for word in negative_words:
-            if word in message_lower:
-                score -= 1.0
+        # Un point par mot positif présent, moins un par mot négatif
+        score = float(len(found.get("positive", ())) - len(found.get("negative", ())))
         
         # Normaliser entre -1 et 1
         if word_count > 0:
@@ -361,23 +410,12 @@ Si une question n'est pas liée au maritime, redirige poliment vers le contexte
         
         return score
     
-    async def detect_intent(self, message: str) -> Optional[str]:
+    async def detect_intent(self, message: str, keywords: Optional[Dict[str, Any]] = None) -> Optional[str]:
         """Détecter l'intention du message"""
-        message_lower = message.lower()
+        found = (keywords or MESSAGE_KEYWORDS.scan(message))["intent"]
         
-        intent_patterns = {
-            "info_packages": ["forfait", "package", "prix", "tarif", "coût"],
-            "info_event": ["salon", "événement", "programme", "horaires", "lieu"],
-            "networking": ["rdv", "rendez-vous", "rencontre", "contact", "réseau"],
-            "technical_help": ["problème", "bug", "aide", "support", "erreur"],
-            "matching": ["partenaire", "match", "recherche", "recommandation"],
-            "navigation": ["comment", "où", "naviguer", "utiliser", "fonctionner"],
-            "greeting": ["bonjour", "salut", "hello", "bonsoir", "coucou"],
-            "goodbye": ["au revoir", "bye", "salut", "à bientôt"]
-        }
-        
-        for intent, keywords in intent_patterns.items():
-            if any(keyword in message_lower for keyword in keywords):
+        for intent in INTENT_PATTERNS:
+            if intent in found:
                 return intent
         
         return "general_inquiry"
@@ -386,23 +424,23 @@ Si une question n'est pas liée au maritime, redirige poliment vers le contexte
         """Générer des suggestions d'actions basées sur la réponse"""
         suggestions = []
         
-        response_lower = response.lower()
+        topics = RESPONSE_KEYWORDS.scan(response)["topic"]
         
-        if "forfait" in response_lower or "package" in response_lower:
+        if "packages" in topics:
             suggestions.extend([
                 "Voir tous les forfaits disponibles",
                 "Comparer les packages",
                 "Obtenir une recommandation personnalisée"
             ])
         
-        if "rdv" in response_lower or "rendez-vous" in response_lower:
+        if "meetings" in topics:
             suggestions.extend([
                 "Consulter mon calendrier",
                 "Prendre un nouveau rendez-vous",
                 "Voir mes contacts"
             ])
         
-        if "matching" in response_lower or "partenaire" in response_lower:
+        if "matching" in topics:
             suggestions.extend([
                 "Lancer une recherche de partenaires",
                 "Voir mes matches en attente",
@@ -439,11 +477,8 @@ Si une question n'est pas liée au maritime, redirige poliment vers le contexte
                           message: str, response: str, message_type: str, language: str,
                           sentiment_score: float, intent: Optional[str]):
         """Sauvegarder le message et la réponse en base"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+        def insert_message(conn):
+            conn.execute("""
                 INSERT INTO chat_messages 
                 (id, session_id, user_id, message, response, message_type, 
                  language, sentiment_score, intent)
@@ -453,13 +488,13 @@ Si une question n'est pas liée au maritime, redirige poliment vers le contexte
             
             # Sauvegarder l'intent avec confiance
             if intent:
-                cursor.execute("""
+                conn.execute("""
                     INSERT INTO chat_intents (session_id, intent, confidence, context)
                     VALUES (?, ?, ?, ?)
                 """, (session_id, intent, 0.8, json.dumps({"message_length": len(message)})))
-            
-            conn.commit()
-            conn.close()
+        
+        try:
+            await self.async_db.run(insert_message)
             
         except Exception as e:
             logger.error(f"Erreur sauvegarde message: {e}")
@@ -467,48 +502,34 @@ Si une question n'est pas liée au maritime, redirige poliment vers le contexte
     async def update_session_activity(self, session_id: str):
         """Mettre à jour l'activité de la session"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            await self.async_db.execute("""
                 UPDATE chat_sessions 
                 SET last_activity = CURRENT_TIMESTAMP,
                     message_count = message_count + 1
                 WHERE id = ?
             """, (session_id,))
             
-            conn.commit()
-            conn.close()
-            
         except Exception as e:
             logger.error(f"Erreur mise à jour session: {e}")
     
     def get_session_stats(self, session_id: str) -> Dict[str, Any]:
         """Récupérer les statistiques d'une session"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT * FROM chat_sessions WHERE id = ?
-            """, (session_id,))
-            
-            session = cursor.fetchone()
-            
-            if not session:
-                return {}
-            
-            cursor.execute("""
-                SELECT COUNT(*) as message_count,
-                       AVG(sentiment_score) as avg_sentiment,
-                       COUNT(DISTINCT intent) as unique_intents
-                FROM chat_messages 
-                WHERE session_id = ?
-            """, (session_id,))
-            
-            stats = cursor.fetchone()
-            conn.close()
+            with self.db.connection() as conn:
+                session = conn.execute("""
+                    SELECT * FROM chat_sessions WHERE id = ?
+                """, (session_id,)).fetchone()
+                
+                if not session:
+                    return {}
+                
+                stats = conn.execute("""
+                    SELECT COUNT(*) as message_count,
+                           AVG(sentiment_score) as avg_sentiment,
+                           COUNT(DISTINCT intent) as unique_intents
+                    FROM chat_messages 
+                    WHERE session_id = ?
+                """, (session_id,)).fetchone()
             
             return {
                 "session_id": session_id,
@@ -533,17 +554,12 @@ Si une question n'est pas liée au maritime, redirige poliment vers le contexte
                 del self.active_sessions[session_id]
             
             # Marquer comme terminée en base
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                UPDATE chat_sessions 
-                SET status = 'ended', last_activity = CURRENT_TIMESTAMP
-                WHERE id = ?
-            """, (session_id,))
-            
-            conn.commit()
-            conn.close()
+            with self.db.connection() as conn:
+                conn.execute("""
+                    UPDATE chat_sessions 
+                    SET status = 'ended', last_activity = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """, (session_id,))
             
             logger.info(f"🔚 Session terminée: {session_id}")
             
@@ -0,0 +1,117 @@
+"""
+Authentication Cache for SIPORTS v2.0
+In-process TTL-bounded LRU caches for decoded JWTs and user rows
+"""
+
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+AUTH_CACHE_MAX_ENTRIES = int(os.environ.get('AUTH_CACHE_MAX_ENTRIES', 10000))
+AUTH_CACHE_TOKEN_TTL = int(os.environ.get('AUTH_CACHE_TOKEN_TTL', 300))
+AUTH_CACHE_USER_TTL = int(os.environ.get('AUTH_CACHE_USER_TTL', 60))
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a TTL"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached value, or None if absent or expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        """Store a value, evicting the least recently used entry when full"""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        """Remove an entry if present"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class AuthCache:
+    """Caches what get_current_user needs: decoded tokens and user rows"""
+
+    def __init__(self, maxsize=AUTH_CACHE_MAX_ENTRIES, token_ttl=AUTH_CACHE_TOKEN_TTL, user_ttl=AUTH_CACHE_USER_TTL):
+        self.tokens = TTLCache(maxsize, token_ttl)
+        self.users = TTLCache(maxsize, user_ttl)
+
+    def get_token(self, token: str):
+        """Get the decoded payload of an already verified token"""
+        return self.tokens.get(token)
+
+    def set_token(self, token: str, payload: dict):
+        """Cache a verified payload, never beyond the token's own expiry"""
+        ttl = None
+        if payload.get('exp'):
+            ttl = payload['exp'] - time.time()
+        self.tokens.set(token, payload, ttl)
+
+    def get_user(self, user_id: int):
+        """Get a copy of a cached user row"""
+        user = self.users.get(user_id)
+        return dict(user) if user is not None else None
+
+    def set_user(self, user_id: int, user: dict):
+        """Cache a user row"""
+        self.users.set(user_id, dict(user))
+
+    def invalidate_user(self, user_id: int):
+        """Drop a user row after it has been modified"""
+        self.users.pop(user_id)
+
+    def invalidate_all_users(self):
+        """Drop every cached user row (bulk or external updates)"""
+        self.users.clear()
+
+    def get_stats(self) -> dict:
+        """Hit/miss counters for monitoring"""
+        return {
+            "tokens": {"size": len(self.tokens), "hits": self.tokens.hits, "misses": self.tokens.misses},
+            "users": {"size": len(self.users), "hits": self.users.hits, "misses": self.users.misses}
+        }
+
+
+# Global authentication cache instance
+auth_cache = AuthCache()
@@ -0,0 +1,364 @@
+"""
+Event Catalogue for SIPORTS v2.0
+Visitor/partnership packages and exhibitor directory, encoded once at import
+"""
+
+import logging
+from http_cache import EncodedPayload
+
+logger = logging.getLogger(__name__)
+
+# Visitor packages
+VISITOR_PACKAGES = [
+    {
+        "id": 1,
+        "name": "Free Pass",
+        "price": 0,
+        "currency": "€",
+        "description": "Accès gratuit aux espaces d'exposition",
+        "features": [
+            "Accès aux espaces d'exposition",
+            "Conférences publiques",
+            "Application mobile",
+            "Plan du salon"
+        ],
+        "limitations": {
+            "b2b_meetings": 0,
+            "networking": "Limité"
+        }
+    },
+    {
+        "id": 2,
+        "name": "Basic Pass",
+        "price": 150,
+        "currency": "€",
+        "description": "Pass essentiel pour 1 journée",
+        "features": [
+            "Tout du Free Pass",
+            "2 rendez-vous B2B garantis",
+            "Accès aux pauses café",
+            "Badge visiteur personnalisé"
+        ],
+        "limitations": {
+            "b2b_meetings": 2,
+            "networking": "Standard"
+        }
+    },
+    {
+        "id": 3,
+        "name": "Premium Pass",
+        "price": 350,
+        "currency": "€",
+        "description": "Pass complet pour 2 journées",
+        "features": [
+            "Tout du Basic Pass",
+            "5 rendez-vous B2B garantis",
+            "Ateliers techniques spécialisés",
+            "Déjeuners networking",
+            "Accès zone VIP"
+        ],
+        "popular": True,
+        "limitations": {
+            "b2b_meetings": 5,
+            "networking": "Avancé"
+        }
+    },
+    {
+        "id": 4,
+        "name": "VIP Pass",
+        "price": 750,
+        "currency": "€",
+        "description": "Accès privilégié 3 journées complètes",
+        "features": [
+            "Tout du Premium Pass",
+            "Rendez-vous B2B illimités",
+            "Soirée de gala exclusive",
+            "Conférences privées C-Level",
+            "Service de conciergerie",
+            "Transferts inclus"
+        ],
+        "limitations": {
+            "b2b_meetings": "unlimited",
+            "networking": "Premium"
+        }
+    }
+]
+
+# Partnership packages
+PARTNERSHIP_PACKAGES = [
+    {
+        "id": 1,
+        "name": "Startup Package",
+        "price": 2500,
+        "currency": "$",
+        "description": "Idéal pour les jeunes entreprises maritimes",
+        "features": [
+            "Stand 6m² (2x3m)",
+            "2 badges exposant",
+            "Listing annuaire digital",
+            "Support technique de base"
+        ],
+        "category": "startup"
+    },
+    {
+        "id": 2,
+        "name": "Silver Package", 
+        "price": 8000,
+        "currency": "$",
+        "description": "Package standard pour exposants confirmés",
+        "features": [
+            "Stand 12m² (3x4m)",
+            "4 badges exposant",
+            "Mobilier standard inclus",
+            "1 session de networking sponsorisée",
+            "Présence catalogue premium"
+        ],
+        "category": "standard"
+    },
+    {
+        "id": 3,
+        "name": "Gold Package",
+        "price": 15000,
+        "currency": "$", 
+        "description": "Package avancé avec visibilité renforcée",
+        "features": [
+            "Stand 20m² (4x5m) - Emplacement premium",
+            "6 badges exposant",
+            "Mobilier sur-mesure",
+            "2 conférences sponsorisées (30min)",
+            "Logo sur supports officiels",
+            "1 cocktail networking privé"
+        ],
+        "popular": True,
+        "category": "premium"
+    },
+    {
+        "id": 4,
+        "name": "Platinum Package",
+        "price": 25000,
+        "currency": "$",
+        "description": "Package prestige - Partenaire officiel",
+        "features": [
+            "Stand 40m² (5x8m) - Hall d'entrée",
+            "10 badges exposant",
+            "Design stand personnalisé",
+            "Keynote session dédiée (45min)",
+            "Mini-site SIPORTS Premium dédié",
+            "Branding événement (logos, panneaux)",
+            "Dîner VIP avec comité d'organisation",
+            "Communiqué de presse co-signé"
+        ],
+        "category": "prestige"
+    }
+]
+
+# Exhibitors directory (same as frontend)
+EXPOSANTS = [
+    {
+        "id": 1,
+        "name": "TechMarine Solutions",
+        "category": "Technologies Maritimes",
+        "logo": "/images/logo1.png",
+        "description": "Solutions technologiques pour l'industrie maritime",
+        "stand": "A12",
+        "hall": "Hall Innovation",
+        "website": "https://techmarinesolutions.com",
+        "email": "contact@techmarinesolutions.com",
+        "phone": "+33 1 23 45 67 89",
+        "specialties": ["IoT Maritime", "Navigation Intelligente", "Maintenance Prédictive"],
+        "products": [
+            "SmartShip Navigator - Système de navigation IA",
+            "MarineIoT Hub - Plateforme IoT embarquée",
+            "PredictMaintain - Solution maintenance prédictive"
+        ],
+        "certifications": ["ISO 9001", "ISO 14001", "Maritime MED"],
+        "founded": 2015,
+        "employees": "50-100",
+        "countries": ["France", "Allemagne", "Norvège"]
+    },
+    {
+        "id": 2,
+        "name": "Green Port Energy",
+        "category": "Énergies Renouvelables",
+        "logo": "/images/logo2.png",
+        "description": "Transition énergétique des ports et terminaux",
+        "stand": "B08",
+        "hall": "Hall Environnement",
+        "website": "https://greenportenergy.com",
+        "email": "info@greenportenergy.com", 
+        "phone": "+33 2 34 56 78 90",
+        "specialties": ["Énergie Solaire", "Éolien Offshore", "Stockage Batterie"],
+        "products": [
+            "SolarPort - Ombrières solaires pour ports",
+            "WindTerminal - Éoliennes portuaires",
+            "BatteryHub - Stockage énergétique intelligent"
+        ],
+        "certifications": ["ISO 50001", "REC Certified", "Wind Power"],
+        "founded": 2018,
+        "employees": "20-50", 
+        "countries": ["France", "Espagne", "Portugal"]
+    },
+    {
+        "id": 3,
+        "name": "Smart Container Corp",
+        "category": "Logistique Intelligente", 
+        "logo": "/images/logo3.png",
+        "description": "Conteneurs connectés et logistique 4.0",
+        "stand": "C15",
+        "hall": "Hall Logistique",
+        "website": "https://smartcontainer.com",
+        "email": "hello@smartcontainer.com",
+        "phone": "+33 3 45 67 89 01",
+        "specialties": ["Conteneurs Connectés", "Tracking IoT", "Blockchain Logistique"],
+        "products": [
+            "ConnectBox - Conteneurs intelligents",
+            "TrackChain - Traçabilité blockchain", 
+            "LogiAI - Intelligence artificielle logistique"
+        ],
+        "certifications": ["ISO 28000", "CTPAT", "AEO"],
+        "founded": 2020,
+        "employees": "10-20",
+        "countries": ["France", "Pays-Bas", "Belgique"]
+    },
+    {
+        "id": 4,
+        "name": "Ocean Data Analytics",
+        "category": "Big Data Maritime",
+        "logo": "/images/logo4.png", 
+        "description": "Analyse de données pour l'industrie maritime",
+        "stand": "D22",
+        "hall": "Hall Innovation",
+        "website": "https://oceandataanalytics.com",
+        "email": "data@oceandataanalytics.com",
+        "phone": "+33 4 56 78 90 12",
+        "specialties": ["Machine Learning", "Prédiction Météo", "Optimisation Routes"],
+        "products": [
+            "WeatherPredict - Prédiction météorologique avancée",
+            "RouteOptim - Optimisation de routes maritimes",
+            "FleetAnalytics - Analyse performance flotte"
+        ],
+        "certifications": ["ISO 27001", "GDPR Certified", "Cloud Security"],
+        "founded": 2017,
+        "employees": "30-50",
+        "countries": ["France", "UK", "Canada"]
+    },
+    {
+        "id": 5,
+        "name": "AquaTech Innovations",
+        "category": "Technologies Marines",
+        "logo": "/images/logo5.png",
+        "description": "Innovations pour l'aquaculture et l'environnement marin", 
+        "stand": "E05",
+        "hall": "Hall Environnement",
+        "website": "https://aquatechinnovations.com",
+        "email": "contact@aquatechinnovations.com",
+        "phone": "+33 5 67 89 01 23",
+        "specialties": ["Aquaculture Durable", "Surveillance Marine", "Biotechnologies"],
+        "products": [
+            "AquaFarm Pro - Systèmes aquaculture intelligente",
+            "MarineWatch - Surveillance écosystèmes marins",
+            "BioClean - Solutions bioremédiation"
+        ],
+        "certifications": ["ASC Aquaculture", "Marine Stewardship", "Bio Certified"],
+        "founded": 2016,
+        "employees": "25-50",
+        "countries": ["France", "Norvège", "Chili"]
+    },
+    {
+        "id": 6,
+        "name": "Port Security Systems",
+        "category": "Sécurité Portuaire",
+        "logo": "/images/logo6.png",
+        "description": "Solutions de sécurité et surveillance pour ports",
+        "stand": "F18", 
+        "hall": "Hall Sécurité",
+        "website": "https://portsecuritysystems.com",
+        "email": "security@portsecuritysystems.com",
+        "phone": "+33 6 78 90 12 34",
+        "specialties": ["Vidéosurveillance IA", "Contrôle Accès", "Détection Intrusion"],
+        "products": [
+            "SecurePort AI - Surveillance intelligente par IA",
+            "AccessGuard - Contrôle d'accès biométrique",
+            "ThreatDetect - Détection de menaces en temps réel"
+        ],
+        "certifications": ["ISO 27001", "ANSSI Qualified", "Security Certified"],
+        "founded": 2014,
+        "employees": "40-80",
+        "countries": ["France", "Italie", "Grèce"]
+    }
+]
+
+# Detailed exhibitor pages
+EXPOSANT_DETAILS = {
+    1: {
+        "id": 1,
+        "name": "TechMarine Solutions",
+        "category": "Technologies Maritimes",
+        "description": "Leader européen des solutions technologiques pour l'industrie maritime depuis 2015. Spécialisé dans l'IoT maritime, la navigation intelligente et la maintenance prédictive.",
+        "stand": "A12",
+        "hall": "Hall Innovation",
+        "website": "https://techmarinesolutions.com",
+        "email": "contact@techmarinesolutions.com",
+        "phone": "+33 1 23 45 67 89",
+        "logo": "/images/logo1.png",
+        "images": ["/images/tech1.jpg", "/images/tech2.jpg", "/images/tech3.jpg"],
+        "specialties": ["IoT Maritime", "Navigation Intelligente", "Maintenance Prédictive"],
+        "products": [
+            {
+                "name": "SmartShip Navigator",
+                "description": "Système de navigation assistée par intelligence artificielle",
+                "features": ["Navigation autonome", "Évitement obstacles", "Optimisation carburant"]
+            },
+            {
+                "name": "MarineIoT Hub", 
+                "description": "Plateforme IoT embarquée pour navires connectés",
+                "features": ["Capteurs temps réel", "Maintenance prédictive", "Télémétrie avancée"]
+            }
+        ],
+        "team": [
+            {"name": "Pierre Durand", "role": "CEO & Fondateur", "email": "p.durand@techmarinesolutions.com"},
+            {"name": "Marie Lambert", "role": "CTO", "email": "m.lambert@techmarinesolutions.com"}
+        ],
+        "presentations": [
+            {
+                "title": "L'avenir de la navigation autonome",
+                "date": "2026-03-15T14:30:00",
+                "duration": "45 minutes",
+                "location": "Salle Innovation A"
+            }
+        ],
+        "special_offers": [
+            "Démonstration gratuite sur stand",
+            "20% de réduction pour commandes salon",
+            "Formation gratuite avec installation"
+        ],
+        "founded": 2015,
+        "employees": "50-100",
+        "turnover": "12M€ (2024)",
+        "countries": ["France", "Allemagne", "Norvège"],
+        "certifications": ["ISO 9001", "ISO 14001", "Maritime MED"]
+    }
+    # Add other exposants as needed...
+}
+
+
+class Catalogue:
+    """Pre-serialised catalogue responses, built once per process"""
+
+    def __init__(self):
+        self.visitor_packages = EncodedPayload({"packages": VISITOR_PACKAGES})
+        self.partnership_packages = EncodedPayload({"packages": PARTNERSHIP_PACKAGES})
+        self.exposants = EncodedPayload({"exposants": EXPOSANTS, "total": len(EXPOSANTS)})
+        self.exposant_details = {
+            exposant_id: EncodedPayload(data)
+            for exposant_id, data in EXPOSANT_DETAILS.items()
+        }
+        logger.info(f"Catalogue encoded: {len(EXPOSANTS)} exposants, {len(self.exposant_details)} detail pages")
+
+    def get_exposant_detail(self, exposant_id: int):
+        """Encoded detail page for an exposant, or None"""
+        return self.exposant_details.get(exposant_id)
+
+
+# Global catalogue instance
+catalogue = Catalogue()
@@ -3,13 +3,21 @@ SIPORTS v2.0 AI Chatbot Service
 Service pour chatbot IA gratuit avec support Ollama et simulation pour développement
 """
 
+import re
+import json
 import time
+import uuid
 import random
 import logging
-from typing import Dict, List, Optional, Any
-from pydantic import BaseModel, Field
+from typing import Dict, List, Optional, Any, AsyncIterator
+from fastapi import WebSocket, WebSocketDisconnect
+from pydantic import BaseModel, Field, ValidationError
 from enum import Enum
 
+from conversation_store import MemoryConversationBackend
+from keyword_matcher import KeywordMatcher
+from response_cache import ResponseCache
+
 logger = logging.getLogger(__name__)
 
 class ContextType(str, Enum):
@@ -32,13 +40,53 @@ class ChatResponse(BaseModel):
     session_id: str = Field(..., description="ID de session")
     timestamp: float = Field(default_factory=time.time, description="Timestamp de la réponse")
 
+# Fragments transmis en streaming: un mot et l'espace qui le suit
+CHUNK_PATTERN = re.compile(r"\s*\S+\s*")
+
+def text_chunks(text: str) -> List[str]:
+    """Découpe un texte en fragments dont la concaténation le redonne"""
+    return CHUNK_PATTERN.findall(text) or [text]
+
+# Mots-clés des réponses simulées, par table puis par libellé (recherche de sous-chaînes)
+MOCK_KEYWORDS = KeywordMatcher({
+    "context": {
+        "package": ["forfait", "package", "prix", "tarif"],
+        "exhibitor": ["exposant", "entreprise", "technologie", "fournisseur"],
+        "event": ["événement", "conférence", "horaire", "programme"]
+    },
+    "package": {
+        "free": ["gratuit", "free"],
+        "premium": ["premium", "vip"],
+        "basic": ["basic"]
+    },
+    "exhibitor": {
+        "technology": ["technologie", "tech", "innovation"],
+        "shipping": ["shipping", "transport", "logistique"],
+        "equipment": ["équipement", "naval", "bateau"]
+    },
+    "event": {
+        "schedule": ["horaire", "programme", "planning"],
+        "conference": ["conférence", "présentation", "speaker"],
+        "networking": ["networking", "rencontre"]
+    },
+    "general": {
+        "greeting": ["bonjour", "hello", "salut", "bonsoir"],
+        "help": ["aide", "help", "assistance"],
+        "siports": ["siports", "événement"]
+    }
+})
+
 class SiportsAIService:
     """Service IA pour SIPORTS v2.0 avec support Ollama et mode simulation"""
     
-    def __init__(self, mock_mode: bool = True, model_name: str = "tinyllama:1.1b"):
+    def __init__(self, mock_mode: bool = True, model_name: str = "tinyllama:1.1b", conversations=None,
+                 response_cache: ResponseCache = None):
         self.mock_mode = mock_mode
         self.model_name = model_name
-        self.conversation_history: Dict[str, List[Dict[str, str]]] = {}
+        # Historiques bornés, en mémoire par défaut; backend partagé (SQLite, Redis) avec plusieurs workers
+        self.conversations = conversations or MemoryConversationBackend()
+        # Réponses aux questions déjà posées (message normalisé, par contexte)
+        self.response_cache = response_cache or ResponseCache()
         
         # Templates de contexte pour réponses spécialisées
         self.context_templates = {
@@ -79,81 +127,81 @@ class SiportsAIService:
         }
 
     def get_session_id(self, user_id: str = None) -> str:
-        """Génère ou récupère un ID de session"""
+        """Génère un ID de session unique, renvoyé au client qui le réutilise pour la suite de la conversation"""
         if user_id:
-            return f"session_{user_id}_{int(time.time())}"
-        return f"session_anonymous_{int(time.time())}"
+            return f"session_{user_id}_{uuid.uuid4().hex}"
+        return f"session_anonymous_{uuid.uuid4().hex}"
 
     async def generate_response_mock(self, message: str, context_type: ContextType, session_id: str) -> str:
         """Génère une réponse simulée intelligente basée sur le contexte"""
         
-        message_lower = message.lower()
+        # Tous les mots-clés du message en un seul passage
+        keywords = MOCK_KEYWORDS.scan(message)
         
         # Réponses contextuelles basées sur le type
         if context_type == ContextType.PACKAGE:
-            if any(word in message_lower for word in ["forfait", "package", "prix", "tarif"]):
-                return self._generate_package_response(message_lower)
+            if "package" in keywords["context"]:
+                return self._generate_package_response(keywords["package"])
         
         elif context_type == ContextType.EXHIBITOR:
-            if any(word in message_lower for word in ["exposant", "entreprise", "technologie", "fournisseur"]):
-                return self._generate_exhibitor_response(message_lower)
+            if "exhibitor" in keywords["context"]:
+                return self._generate_exhibitor_response(keywords["exhibitor"])
         
         elif context_type == ContextType.EVENT:
-            if any(word in message_lower for word in ["événement", "conférence", "horaire", "programme"]):
-                return self._generate_event_response(message_lower)
+            if "event" in keywords["context"]:
+                return self._generate_event_response(keywords["event"])
         
         # Réponse générale par défaut
-        return self._generate_general_response(message_lower)
+        return self._generate_general_response(keywords["general"])
 
-    def _generate_package_response(self, message: str) -> str:
+    def _generate_package_response(self, found: Dict[str, set]) -> str:
         """Génère réponse sur les forfaits"""
-        if "gratuit" in message or "free" in message:
+        if "free" in found:
             return "Le forfait Free est gratuit et inclut l'accès à l'exposition, aux conférences publiques et à l'app mobile. Idéal pour découvrir l'événement."
         
-        if "premium" in message or "vip" in message:
+        if "premium" in found:
             return "Le forfait Premium (350€) est notre plus populaire avec 5 RDV B2B, ateliers spécialisés, déjeuners networking et accès VIP. Le VIP (750€) offre RDV illimités, soirée gala et service conciergerie."
         
-        if "basic" in message:
+        if "basic" in found:
             return "Le forfait Basic (150€) comprend l'accès expositions, conférences principales, 2 RDV B2B garantis et pauses café networking. Parfait pour 1 jour d'événement."
         
         return "Nous proposons 4 forfaits: Free (gratuit), Basic (150€), Premium (350€) et VIP (750€). Chacun offre des avantages différents selon vos besoins. Que recherchez-vous précisément?"
 
-    def _generate_exhibitor_response(self, message: str) -> str:
+    def _generate_exhibitor_response(self, found: Dict[str, set]) -> str:
         """Génère réponse sur les exposants"""
-        if any(word in message for word in ["technologie", "tech", "innovation"]):
+        if "technology" in found:
             return "Nos exposants technologiques incluent des leaders en smart ports, IoT maritime, blockchain pour logistics, et solutions d'automatisation portuaire. Souhaitez-vous des recommandations spécifiques?"
         
-        if any(word in message for word in ["shipping", "transport", "logistique"]):
+        if "shipping" in found:
             return "Pour le shipping et logistique, nous avons des exposants spécialisés en supply chain maritime, optimisation de routes, tracking cargo, et solutions green shipping. Je peux vous orienter selon votre secteur."
         
-        if any(word in message for word in ["équipement", "naval", "bateau"]):
+        if "equipment" in found:
             return "Les équipementiers navals présents proposent systèmes de navigation, équipements de sécurité, solutions de maintenance prédictive et technologies offshore. Quel type d'équipement vous intéresse?"
         
         return "Nos 200+ exposants couvrent toute la chaîne maritime: technologies, équipements, services, financement. Pouvez-vous préciser votre domaine d'intérêt pour des recommandations ciblées?"
 
-    def _generate_event_response(self, message: str) -> str:
+    def _generate_event_response(self, found: Dict[str, set]) -> str:
         """Génère réponse sur les événements"""
-        if any(word in message for word in ["horaire", "programme", "planning"]):
+        if "schedule" in found:
             return "L'événement se déroule sur 3 jours avec conférences (9h-17h), ateliers techniques (14h-16h), sessions networking (17h-19h) et soirée gala (20h). Voulez-vous le programme détaillé d'une journée?"
         
-        if any(word in message for word in ["conférence", "présentation", "speaker"]):
+        if "conference" in found:
             return "Nous avons 50+ conférences couvrant décarbonation maritime, digitalisation des ports, nouvelles réglementations et innovations technologiques. Les speakers incluent des experts internationaux. Quel thème vous intéresse?"
         
-        if "networking" in message or "rencontre" in message:
+        if "networking" in found:
             return "Les opportunités networking incluent: pauses café (10h et 15h), déjeuners thématiques (12h), cocktail exposants (17h) et soirée gala (20h). Idéal pour créer des connexions professionnelles."
         
         return "L'événement SIPORTS propose conférences, ateliers, networking et expo sur 3 jours. Programme complet avec 200+ exposants et 50+ conférences. Que souhaitez-vous savoir spécifiquement?"
 
-    def _generate_general_response(self, message: str) -> str:
+    def _generate_general_response(self, found: Dict[str, set]) -> str:
         """Génère réponse générale"""
-        greetings = ["bonjour", "hello", "salut", "bonsoir"]
-        if any(greeting in message for greeting in greetings):
+        if "greeting" in found:
             return "Bonjour ! Je suis l'assistant IA SIPORTS v2.0. Je peux vous aider avec les informations événements, recommandations exposants, forfaits et planning. Comment puis-je vous assister ?"
         
-        if any(word in message for word in ["aide", "help", "assistance"]):
+        if "help" in found:
             return "Je peux vous assister sur: 📋 Informations événements, 🏢 Recommandations exposants, 💳 Forfaits et tarifs, 📅 Programme et horaires. Sur quoi souhaitez-vous être accompagné ?"
         
-        if "siports" in message or "événement" in message:
+        if "siports" in found:
             return "SIPORTS est le salon maritime de référence avec 200+ exposants, 50+ conférences et 3 jours d'innovations. Technologies, networking, business opportunities vous attendent. Que voulez-vous découvrir ?"
         
         return "Je suis là pour vous aider avec toutes vos questions sur SIPORTS v2.0. Événements, exposants, forfaits, planning - n'hésitez pas à me demander ! 😊"
@@ -169,47 +217,86 @@ class SiportsAIService:
         return actions_map.get(context_type, [])
 
     async def generate_response(self, request: ChatRequest) -> ChatResponse:
-        """Point d'entrée principal pour génération de réponse"""
+        """Point d'entrée principal pour génération de réponse (réponse complète)"""
+        async for event in self.stream_response(request):
+            if event["type"] == "end":
+                return ChatResponse(**{key: value for key, value in event.items() if key != "type"})
+
+    async def stream_response(self, request: ChatRequest) -> AsyncIterator[Dict[str, Any]]:
+        """Génère la réponse au fil de l'eau.
+
+        Événements produits: "start" (session), un "token" par fragment de texte
+        dès qu'il est disponible, puis "end" avec la réponse complète (champs de
+        ChatResponse), qui fait foi même si un incident a interrompu les fragments.
+        Si Ollama échoue en cours de réponse, un "reset" signale que les fragments
+        déjà reçus sont à ignorer: suivent ceux de la réponse de secours.
+        """
+        session_id = request.session_id
+        context = request.context_type.value if hasattr(request.context_type, 'value') else request.context_type
         try:
-            session_id = request.session_id or self.get_session_id(request.user_id)
-            
-            # Gestion historique conversation
-            if session_id not in self.conversation_history:
-                self.conversation_history[session_id] = []
+            session_id = session_id or self.get_session_id(request.user_id)
+            yield {"type": "start", "session_id": session_id, "response_type": context}
             
-            # Ajouter message utilisateur à l'historique
-            self.conversation_history[session_id].append({
-                "role": "user",
-                "content": request.message,
-                "timestamp": time.time()
-            })
+            # Le mode simulation ignore l'historique; avec Ollama, seule une première question
+            # (sans historique) a une réponse indépendante de la conversation
+            history = [] if self.mock_mode else await self.conversations.history(session_id, limit=9)
+            cacheable = self.mock_mode or not history
+            cached = self.response_cache.get(context, request.message) if cacheable else None
             
-            # Limiter historique à 20 derniers échanges
-            if len(self.conversation_history[session_id]) > 20:
-                self.conversation_history[session_id] = self.conversation_history[session_id][-20:]
-
-            if self.mock_mode:
-                # Mode simulation pour développement
-                ai_response = await self.generate_response_mock(request.message, request.context_type, session_id)
-                confidence = round(random.uniform(0.8, 0.95), 2)
+            chunks = []
+            failed = False
+            if cached is not None:
+                ai_response, confidence = cached
+                for chunk in text_chunks(ai_response):
+                    yield {"type": "token", "content": chunk}
             else:
-                # Mode Ollama (à implémenter en production)
-                ai_response = await self.generate_response_ollama(request, session_id)
-                confidence = 0.85
+                if not self.mock_mode:
+                    # Mode Ollama: fragments transmis dès leur génération
+                    confidence = 0.85
+                    try:
+                        async for chunk in self.stream_response_ollama(request, history):
+                            chunks.append(chunk)
+                            yield {"type": "token", "content": chunk}
+                    except ImportError:
+                        logger.warning("Ollama non disponible, utilisation du mode mock")
+                        failed = True
+                    except Exception as e:
+                        logger.error(f"Erreur Ollama: {str(e)}")
+                        failed = True
+                    if failed:
+                        # Réponse partielle abandonnée: la réponse de secours n'est ni mise
+                        # en cache ni ajoutée à l'historique
+                        cacheable = False
+                        if chunks:
+                            chunks = []
+                            yield {"type": "reset"}
+                
+                if not chunks:
+                    # Mode simulation pour développement, ou Ollama indisponible (jamais mis en cache)
+                    cacheable = cacheable and self.mock_mode
+                    ai_response = await self.generate_response_mock(request.message, request.context_type, session_id)
+                    confidence = round(random.uniform(0.8, 0.95), 2)
+                    for chunk in text_chunks(ai_response):
+                        yield {"type": "token", "content": chunk}
+                else:
+                    ai_response = "".join(chunks)
+                
+                if cacheable:
+                    self.response_cache.set(context, request.message, (ai_response, confidence))
 
-            # Ajouter réponse IA à l'historique
-            self.conversation_history[session_id].append({
-                "role": "assistant", 
-                "content": ai_response,
-                "timestamp": time.time()
-            })
+            # Ajouter l'échange (question et réponse) à l'historique en une seule écriture
+            if not failed:
+                try:
+                    await self.conversations.add_exchange(session_id, request.message, ai_response, request.user_id)
+                except Exception as e:
+                    logger.error(f"Erreur sauvegarde historique chatbot: {str(e)}")
             
             # Générer actions suggérées
             suggested_actions = self._generate_suggested_actions(request.context_type, request.message)
             
-            return ChatResponse(
+            response = ChatResponse(
                 response=ai_response,
-                response_type=request.context_type.value if hasattr(request.context_type, 'value') else request.context_type,
+                response_type=context,
                 confidence=confidence,
                 suggested_actions=suggested_actions,
                 session_id=session_id
@@ -217,61 +304,90 @@ class SiportsAIService:
             
         except Exception as e:
             logger.error(f"Erreur génération réponse chatbot: {str(e)}")
-            return ChatResponse(
+            response = ChatResponse(
                 response="Désolé, je rencontre une difficulté technique. Pouvez-vous reformuler votre question ?",
-                response_type=request.context_type.value if hasattr(request.context_type, 'value') else request.context_type,
+                response_type=context,
                 confidence=0.0,
                 suggested_actions=["🔄 Réessayer", "📞 Contact support"],
                 session_id=session_id or "error_session"
             )
+        
+        yield {"type": "end", **response.model_dump()}
 
-    async def generate_response_ollama(self, request: ChatRequest, session_id: str) -> str:
-        """Génération réponse avec Ollama (implémentation future)"""
-        # TODO: Implémenter l'intégration Ollama réelle
-        try:
-            import ollama
-            
-            # Préparer le contexte système
-            system_prompt = self.context_templates[request.context_type]
-            
-            # Préparer l'historique pour le contexte
-            messages = [{"role": "system", "content": system_prompt}]
-            
-            # Ajouter historique récent (5 derniers échanges)
-            recent_history = self.conversation_history[session_id][-10:] if session_id in self.conversation_history else []
-            for msg in recent_history:
-                messages.append({"role": msg["role"], "content": msg["content"]})
-            
-            # Générer réponse avec Ollama
-            response = ollama.chat(
-                model=self.model_name,
-                messages=messages,
-                options={
-                    "temperature": 0.7,
-                    "max_tokens": 500,
-                    "top_p": 0.9
-                }
-            )
-            
-            return response['message']['content']
-            
-        except ImportError:
-            logger.warning("Ollama non disponible, utilisation du mode mock")
-            return await self.generate_response_mock(request.message, request.context_type, session_id)
-        except Exception as e:
-            logger.error(f"Erreur Ollama: {str(e)}")
-            return await self.generate_response_mock(request.message, request.context_type, session_id)
+    async def stream_response_ollama(self, request: ChatRequest, recent_history: List[Dict[str, Any]]) -> AsyncIterator[str]:
+        """Fragments de la réponse Ollama au fur et à mesure (ImportError si Ollama est absent)"""
+        import ollama
+        
+        # Préparer le contexte système
+        system_prompt = self.context_templates[request.context_type]
+        
+        # Préparer l'historique pour le contexte
+        messages = [{"role": "system", "content": system_prompt}]
+        
+        # Ajouter historique récent (5 derniers échanges, message courant inclus)
+        for msg in recent_history:
+            messages.append({"role": msg["role"], "content": msg["content"]})
+        messages.append({"role": "user", "content": request.message})
+        
+        # Générer réponse avec Ollama, en flux et sans bloquer la boucle d'événements
+        stream = await ollama.AsyncClient().chat(
+            model=self.model_name,
+            messages=messages,
+            stream=True,
+            options={
+                "temperature": 0.7,
+                "max_tokens": 500,
+                "top_p": 0.9
+            }
+        )
+        async for part in stream:
+            if part['message']['content']:
+                yield part['message']['content']
 
-    def get_conversation_history(self, session_id: str) -> List[Dict[str, Any]]:
+    async def get_conversation_history(self, session_id: str) -> List[Dict[str, Any]]:
         """Récupère l'historique de conversation pour une session"""
-        return self.conversation_history.get(session_id, [])
+        return await self.conversations.history(session_id)
 
-    def clear_conversation_history(self, session_id: str) -> bool:
+    async def clear_conversation_history(self, session_id: str) -> bool:
         """Efface l'historique d'une session"""
-        if session_id in self.conversation_history:
-            del self.conversation_history[session_id]
-            return True
-        return False
+        return await self.conversations.clear(session_id)
 
 # Instance globale du service chatbot
-siports_ai_service = SiportsAIService(mock_mode=True)
\ No newline at end of file
+siports_ai_service = SiportsAIService(mock_mode=True)
+
+def sse_event(event: Dict[str, Any]) -> str:
+    """Événement de stream_response() au format server-sent events"""
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+async def chat_event_stream(request: ChatRequest, service: SiportsAIService = siports_ai_service):
+    """Corps text/event-stream d'une réponse en streaming"""
+    async for event in service.stream_response(request):
+        yield sse_event(event)
+
+async def serve_chat_websocket(websocket: WebSocket, service: SiportsAIService = siports_ai_service):
+    """Conversation sur WebSocket: un ChatRequest JSON par message, réponse en événements JSON.
+
+    Sans session_id, les questions suivantes reprennent la session de la première.
+    """
+    await websocket.accept()
+    session_id = None
+    try:
+        while True:
+            payload = await websocket.receive_json()
+            try:
+                request = ChatRequest.model_validate(payload)
+            except ValidationError as e:
+                await websocket.send_json({
+                    "type": "error",
+                    "detail": "Message invalide",
+                    "errors": e.errors(include_url=False, include_context=False)
+                })
+                continue
+            if not request.session_id:
+                request.session_id = session_id
+            async for event in service.stream_response(request):
+                if event["type"] == "start":
+                    session_id = event["session_id"]
+                await websocket.send_json(event)
+    except WebSocketDisconnect:
+        pass
@@ -0,0 +1,110 @@
+"""
+Compatibility Scoring for SIPORTS v2.0
+Vectorised user-to-candidates compatibility with NumPy lookup matrices
+"""
+
+import numpy as np
+
+BASE_SCORE = 70
+MAX_SCORE = 100
+SAME_SECTOR_BONUS = 20
+COMPATIBLE_SECTOR_BONUS = 10
+
+COMPATIBLE_SECTOR_PAIRS = [
+    ('Gestion Portuaire', 'Technologies Marines'),
+    ('Logistique Maritime', 'Solutions IoT'),
+    ('Innovation Maritime', 'Equipment Portuaire')
+]
+
+USER_TYPE_BONUS = {
+    ('visitor', 'exhibitor'): 15,
+    ('visitor', 'partner'): 12,
+    ('exhibitor', 'partner'): 18
+}
+
+# Code 0 is "missing", the last code is "any other value"
+SECTORS = sorted({sector for pair in COMPATIBLE_SECTOR_PAIRS for sector in pair})
+SECTOR_CODES = {sector: code for code, sector in enumerate(SECTORS, start=1)}
+OTHER_SECTOR = len(SECTORS) + 1
+
+USER_TYPES = ['visitor', 'exhibitor', 'partner']
+USER_TYPE_CODES = {user_type: code for code, user_type in enumerate(USER_TYPES, start=1)}
+OTHER_USER_TYPE = len(USER_TYPES) + 1
+
+
+def _sector_matrix():
+    matrix = np.zeros((OTHER_SECTOR + 1, OTHER_SECTOR + 1), dtype=np.int16)
+    for sector1, sector2 in COMPATIBLE_SECTOR_PAIRS:
+        code1, code2 = SECTOR_CODES[sector1], SECTOR_CODES[sector2]
+        matrix[code1, code2] = matrix[code2, code1] = COMPATIBLE_SECTOR_BONUS
+    return matrix
+
+
+def _user_type_matrix():
+    matrix = np.zeros((OTHER_USER_TYPE + 1, OTHER_USER_TYPE + 1), dtype=np.int16)
+    for (type1, type2), bonus in USER_TYPE_BONUS.items():
+        code1, code2 = USER_TYPE_CODES[type1], USER_TYPE_CODES[type2]
+        matrix[code1, code2] = matrix[code2, code1] = bonus
+    return matrix
+
+
+SECTOR_MATRIX = _sector_matrix()
+USER_TYPE_MATRIX = _user_type_matrix()
+
+
+def _codes(values, vocabulary, other):
+    """Encode values as matrix indices (0 for missing, `other` for unknown values)"""
+    def code(value):
+        if not value:
+            return 0
+        return vocabulary.get(value, other) if isinstance(value, str) else other
+
+    return np.fromiter((code(value) for value in values), dtype=np.intp, count=len(values))
+
+
+def score_candidates(user: dict, candidates: list) -> dict:
+    """Score one user against N candidate profiles in a single pass.
+
+    Returns NumPy arrays: 'sector' and 'user_type' bonuses, and the capped
+    'compatibility' score for each candidate, in candidate order.
+    """
+    sectors = [candidate.get('sector') for candidate in candidates]
+    user_types = [candidate.get('user_type') for candidate in candidates]
+    user_sector = user.get('sector')
+
+    # Sector compatibility: same sector, else the pair matrix (only when both are known)
+    sector_bonus = np.zeros(len(candidates), dtype=np.int16)
+    if user_sector:
+        codes = _codes(sectors, SECTOR_CODES, OTHER_SECTOR)
+        user_code = SECTOR_CODES.get(user_sector, OTHER_SECTOR)
+        same = np.fromiter((sector == user_sector for sector in sectors), dtype=bool, count=len(sectors))
+        sector_bonus = np.where(same, SAME_SECTOR_BONUS, SECTOR_MATRIX[user_code, codes])
+        sector_bonus[codes == 0] = 0
+
+    # User type synergy
+    user_type_code = _codes([user.get('user_type')], USER_TYPE_CODES, OTHER_USER_TYPE)[0]
+    user_type_bonus = USER_TYPE_MATRIX[user_type_code, _codes(user_types, USER_TYPE_CODES, OTHER_USER_TYPE)]
+
+    return {
+        'sector': sector_bonus,
+        'user_type': user_type_bonus,
+        'compatibility': np.minimum(MAX_SCORE, BASE_SCORE + sector_bonus.astype(np.int32) + user_type_bonus)
+    }
+
+
+def compatibility_results(user: dict, candidates: list) -> list:
+    """Per-candidate scores and breakdowns, in the calculate-compatibility response format"""
+    scores = score_candidates(user, candidates)
+    compatibility = scores['compatibility'].tolist()
+    user_type_bonus = scores['user_type'].tolist()
+    return [
+        {
+            "compatibility_score": compatibility[i],
+            "breakdown": {
+                "sectorial": compatibility[i],
+                "user_type": user_type_bonus[i],
+                "overall": compatibility[i]
+            }
+        }
+        for i in range(len(candidates))
+    ]
@@ -0,0 +1,423 @@
+"""
+Conversation Store for SIPORTS v2.0
+Chatbot conversation histories: bounded in-process store and shared SQLite/Redis backends
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+
+from auth_cache import TTLCache
+
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+CHAT_STORE = os.environ.get('CHAT_STORE', 'memory')  # memory, sqlite or redis
+CHAT_REDIS_URL = os.environ.get('CHAT_REDIS_URL', 'redis://localhost:6379/0')
+CHAT_REDIS_PREFIX = os.environ.get('CHAT_REDIS_PREFIX', 'siports:chat:')
+CHAT_CACHE_SESSIONS = int(os.environ.get('CHAT_CACHE_SESSIONS', 1000))
+CHAT_MAX_SESSIONS = int(os.environ.get('CHAT_MAX_SESSIONS', 10000))
+CHAT_MAX_BYTES = int(os.environ.get('CHAT_MAX_BYTES', 32 * 1024 * 1024))
+CHAT_SESSION_TTL = int(os.environ.get('CHAT_SESSION_TTL', 3600))
+CHAT_HISTORY_MESSAGES = int(os.environ.get('CHAT_HISTORY_MESSAGES', 20))
+
+# Approximate per-message bookkeeping (dict, timestamp, role) added to the text size
+MESSAGE_OVERHEAD = 200
+
+
+def message_size(message: dict) -> int:
+    return len(message['content'].encode('utf-8')) + MESSAGE_OVERHEAD
+
+
+class Conversation:
+    """Messages of one session, capped to the most recent ones"""
+
+    __slots__ = ('messages', 'size', 'last_seen')
+
+    def __init__(self, max_messages: int):
+        self.messages = deque(maxlen=max_messages)
+        self.size = 0
+        self.last_seen = time.monotonic()
+
+
+class ConversationStore:
+    """Thread-safe store of chatbot conversations.
+
+    Sessions are kept in least-recently-used order, so the idle ones sit at
+    the front: expired sessions and, past the session or byte budget, the
+    least recently used ones are evicted from there in amortised O(1).
+    """
+
+    def __init__(self, max_sessions=CHAT_MAX_SESSIONS, max_bytes=CHAT_MAX_BYTES,
+                 idle_ttl=CHAT_SESSION_TTL, max_messages=CHAT_HISTORY_MESSAGES):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.max_messages = max_messages
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.evictions = {'expired': 0, 'max_sessions': 0, 'max_bytes': 0}
+
+    def _drop(self, session_id, reason: str = None):
+        conversation = self._sessions.pop(session_id)
+        self.total_bytes -= conversation.size
+        if reason:
+            self.evictions[reason] += 1
+
+    def _evict(self, now: float):
+        """Drop expired sessions, then the least recently used ones over budget"""
+        while self._sessions:
+            session_id, conversation = next(iter(self._sessions.items()))
+            if now - conversation.last_seen < self.idle_ttl:
+                break
+            self._drop(session_id, 'expired')
+        while len(self._sessions) > self.max_sessions:
+            self._drop(next(iter(self._sessions)), 'max_sessions')
+        # The most recently used session always stays, even on its own over budget
+        while self.total_bytes > self.max_bytes and len(self._sessions) > 1:
+            self._drop(next(iter(self._sessions)), 'max_bytes')
+
+    def _touch(self, session_id, now: float):
+        """Live conversation of a session (None if absent or expired), marked as just used"""
+        conversation = self._sessions.get(session_id)
+        if conversation is None:
+            return None
+        if now - conversation.last_seen >= self.idle_ttl:
+            self._drop(session_id, 'expired')
+            return None
+        conversation.last_seen = now
+        self._sessions.move_to_end(session_id)
+        return conversation
+
+    def append(self, session_id: str, role: str, content: str):
+        """Add a message to a session, dropping its oldest one beyond max_messages"""
+        now = time.monotonic()
+        message = {"role": role, "content": content, "timestamp": time.time()}
+        with self._lock:
+            conversation = self._touch(session_id, now)
+            if conversation is None:
+                conversation = self._sessions[session_id] = Conversation(self.max_messages)
+            if len(conversation.messages) == conversation.messages.maxlen:
+                # deque(maxlen) discards the oldest message on append: account for it first
+                removed = message_size(conversation.messages[0])
+                conversation.size -= removed
+                self.total_bytes -= removed
+            conversation.messages.append(message)
+            size = message_size(message)
+            conversation.size += size
+            self.total_bytes += size
+            self._evict(now)
+
+    def get(self, session_id: str, limit: int = None) -> list:
+        """Copy of a session's messages (the last `limit` ones if given), oldest first"""
+        with self._lock:
+            conversation = self._touch(session_id, time.monotonic())
+            if conversation is None:
+                return []
+            messages = list(conversation.messages)
+        return messages[-limit:] if limit else messages
+
+    def clear(self, session_id: str) -> bool:
+        """Remove a session; returns whether it existed"""
+        with self._lock:
+            if session_id not in self._sessions:
+                return False
+            self._drop(session_id)
+            return True
+
+    def __contains__(self, session_id) -> bool:
+        return session_id in self._sessions
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get_stats(self) -> dict:
+        """Size and eviction counters for monitoring"""
+        with self._lock:
+            self._evict(time.monotonic())
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self.total_bytes,
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "idle_ttl": self.idle_ttl,
+                "evictions": dict(self.evictions)
+            }
+
+
+def exchange_messages(message: str, response: str, timestamp: float) -> list:
+    """History messages of one question/answer exchange"""
+    return [
+        {"role": "user", "content": message, "timestamp": timestamp},
+        {"role": "assistant", "content": response, "timestamp": timestamp}
+    ]
+
+
+class MemoryConversationBackend:
+    """Conversations kept in this process only (single worker, development)"""
+
+    name = 'memory'
+
+    def __init__(self, store: ConversationStore = None):
+        self.store = store or ConversationStore()
+
+    async def history(self, session_id: str, limit: int = None) -> list:
+        return self.store.get(session_id, limit)
+
+    async def add_exchange(self, session_id: str, message: str, response: str, user_id=None):
+        self.store.append(session_id, "user", message)
+        self.store.append(session_id, "assistant", response)
+
+    async def clear(self, session_id: str) -> bool:
+        return self.store.clear(session_id)
+
+    def get_stats(self) -> dict:
+        return {"backend": self.name, **self.store.get_stats()}
+
+
+class SharedConversationBackend(ABC):
+    """Conversations stored outside the process, so every worker sees them.
+
+    Each session carries a revision bumped by every write. Reads first fetch
+    that revision (one key lookup) and only load the messages when the local
+    read-through cache holds an older one; a write stores the whole exchange
+    at once and extends the cached copy, so the worker that answered never
+    reloads its own messages.
+    """
+
+    name = None
+
+    def __init__(self, max_messages=CHAT_HISTORY_MESSAGES, idle_ttl=CHAT_SESSION_TTL,
+                 cache_size=CHAT_CACHE_SESSIONS):
+        self.max_messages = max_messages
+        self.idle_ttl = idle_ttl
+        self.cache = TTLCache(cache_size, idle_ttl)
+        self.reads = 0
+        self.loads = 0
+        self.writes = 0
+
+    @abstractmethod
+    async def _read(self, session_id: str, cached_revision):
+        """(revision, messages) of a live session, messages None if still at cached_revision.
+
+        Returns (None, []) when the session does not exist or has expired.
+        """
+
+    @abstractmethod
+    async def _write(self, session_id: str, messages: list, user_id) -> int:
+        """Append messages to a session; returns its new revision"""
+
+    @abstractmethod
+    async def _delete(self, session_id: str) -> bool:
+        """Remove a session; returns whether it existed"""
+
+    async def history(self, session_id: str, limit: int = None) -> list:
+        self.reads += 1
+        cached = self.cache.get(session_id)
+        revision, messages = await self._read(session_id, cached[0] if cached else None)
+        if revision is None:
+            self.cache.pop(session_id)
+            return []
+        if messages is None:
+            messages = cached[1]
+        else:
+            self.loads += 1
+            messages = tuple(messages[-self.max_messages:])
+            self.cache.set(session_id, (revision, messages))
+        return list(messages[-limit:] if limit else messages)
+
+    async def add_exchange(self, session_id: str, message: str, response: str, user_id=None):
+        messages = exchange_messages(message, response, time.time())
+        revision = await self._write(session_id, messages, user_id)
+        self.writes += 1
+        cached = self.cache.get(session_id)
+        if revision == 1 or (cached and cached[0] == revision - 1):
+            previous = cached[1] if cached and revision > 1 else ()
+            self.cache.set(session_id, (revision, (previous + tuple(messages))[-self.max_messages:]))
+        else:
+            # Another worker wrote in between: the next read reloads
+            self.cache.pop(session_id)
+
+    async def clear(self, session_id: str) -> bool:
+        self.cache.pop(session_id)
+        return await self._delete(session_id)
+
+    def get_stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "cached_sessions": len(self.cache),
+            "reads": self.reads,
+            "loads": self.loads,
+            "cache_hits": self.reads - self.loads,
+            "writes": self.writes,
+            "idle_ttl": self.idle_ttl
+        }
+
+
+def delete_chat_session(conn, session_id: str) -> bool:
+    """Delete a session and its messages; returns whether it existed"""
+    conn.execute('DELETE FROM chat_messages WHERE session_id = ?', (session_id,))
+    return conn.execute('DELETE FROM chat_sessions WHERE id = ?', (session_id,)).rowcount > 0
+
+
+class SQLiteConversationBackend(SharedConversationBackend):
+    """Conversations in the chat_sessions/chat_messages tables of the application database.
+
+    chat_sessions.message_count (one per exchange) is the revision. Every
+    write also prunes the tables like the in-process store: the session
+    keeps its last max_messages messages, sessions idle for idle_ttl are
+    deleted, and past max_bytes (chat_storage, kept by triggers) the least
+    recently active sessions go first.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, async_db, max_bytes=CHAT_MAX_BYTES, **kwargs):
+        super().__init__(**kwargs)
+        self.async_db = async_db
+        self.max_bytes = max_bytes
+        self.evictions = {'expired': 0, 'max_bytes': 0}
+
+    def _prune(self, conn, session_id: str, window: str):
+        """Drop what history can no longer return, then sessions over the byte budget"""
+        conn.execute('''
+            DELETE FROM chat_messages WHERE session_id = ? AND rowid NOT IN (
+                SELECT rowid FROM chat_messages WHERE session_id = ? ORDER BY rowid DESC LIMIT ?
+            )
+        ''', (session_id, session_id, (self.max_messages + 1) // 2))
+
+        expired = "SELECT id FROM chat_sessions WHERE last_activity < datetime('now', ?)"
+        conn.execute(f'DELETE FROM chat_messages WHERE session_id IN ({expired})', (window,))
+        self.evictions['expired'] += conn.execute(
+            "DELETE FROM chat_sessions WHERE last_activity < datetime('now', ?)", (window,)
+        ).rowcount
+
+        # The session just written always stays, even on its own over budget
+        while conn.execute('SELECT bytes FROM chat_storage').fetchone()[0] > self.max_bytes:
+            oldest = conn.execute(
+                'SELECT id FROM chat_sessions WHERE id != ? ORDER BY last_activity LIMIT 1', (session_id,)
+            ).fetchone()
+            if oldest is None:
+                break
+            delete_chat_session(conn, oldest[0])
+            self.evictions['max_bytes'] += 1
+
+    async def _read(self, session_id: str, cached_revision):
+        window = f'-{int(self.idle_ttl)} seconds'
+
+        def read(conn):
+            row = conn.execute(
+                "SELECT message_count FROM chat_sessions WHERE id = ? AND last_activity >= datetime('now', ?)",
+                (session_id, window)
+            ).fetchone()
+            if row is None:
+                return None, []
+            if row[0] == cached_revision:
+                return row[0], None
+            rows = conn.execute('''
+                SELECT message, response, CAST(strftime('%s', timestamp) AS REAL) FROM chat_messages
+                WHERE session_id = ? AND timestamp >= datetime('now', ?)
+                ORDER BY rowid DESC LIMIT ?
+            ''', (session_id, window, (self.max_messages + 1) // 2)).fetchall()
+            messages = []
+            for message, response, timestamp in reversed(rows):
+                messages.extend(exchange_messages(message, response, timestamp))
+            return row[0], messages
+
+        return await self.async_db.run(read)
+
+    async def _write(self, session_id: str, messages: list, user_id) -> int:
+        user_id = int(user_id) if user_id is not None and str(user_id).isdigit() else None
+        window = f'-{int(self.idle_ttl)} seconds'
+
+        def write(conn):
+            # One transaction per exchange: session upsert, message row and new revision
+            conn.execute('''
+                INSERT INTO chat_sessions (id, user_id, message_count) VALUES (?, ?, 1)
+                ON CONFLICT (id) DO UPDATE SET
+                    message_count = message_count + 1, last_activity = CURRENT_TIMESTAMP
+            ''', (session_id, user_id))
+            conn.execute(
+                'INSERT INTO chat_messages (id, session_id, user_id, message, response) VALUES (?, ?, ?, ?, ?)',
+                (str(uuid.uuid4()), session_id, user_id, messages[0]['content'], messages[1]['content'])
+            )
+            self._prune(conn, session_id, window)
+            return conn.execute('SELECT message_count FROM chat_sessions WHERE id = ?', (session_id,)).fetchone()[0]
+
+        return await self.async_db.run(write)
+
+    async def _delete(self, session_id: str) -> bool:
+        return await self.async_db.run(delete_chat_session, session_id)
+
+    def get_stats(self) -> dict:
+        return {**super().get_stats(), "max_bytes": self.max_bytes, "evictions": dict(self.evictions)}
+
+
+class RedisConversationBackend(SharedConversationBackend):
+    """Conversations in a Redis-compatible server (Redis, Valkey, KeyDB, or fakeredis locally).
+
+    Per session: a capped list of JSON messages and a revision counter, both
+    expiring after idle_ttl. Only RPUSH/LTRIM/INCR/EXPIRE in a MULTI block,
+    GET, LRANGE and DEL are used, so any server or client speaking that
+    subset of the protocol will do. Deployments choosing it must provide the
+    server (CHAT_REDIS_URL) and the redis package, see RAILWAY_VARIABLES.env.
+    """
+
+    name = 'redis'
+
+    def __init__(self, client, prefix=CHAT_REDIS_PREFIX, **kwargs):
+        super().__init__(**kwargs)
+        self.client = client
+        self.prefix = prefix
+
+    def _keys(self, session_id: str) -> tuple:
+        return f'{self.prefix}{session_id}:messages', f'{self.prefix}{session_id}:revision'
+
+    async def _read(self, session_id: str, cached_revision):
+        messages_key, revision_key = self._keys(session_id)
+        revision = await self.client.get(revision_key)
+        if revision is None:
+            return None, []
+        revision = int(revision)
+        if revision == cached_revision:
+            return revision, None
+        return revision, [json.loads(item) for item in await self.client.lrange(messages_key, 0, -1)]
+
+    async def _write(self, session_id: str, messages: list, user_id) -> int:
+        messages_key, revision_key = self._keys(session_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.rpush(messages_key, *[json.dumps(message, ensure_ascii=False) for message in messages])
+            pipe.ltrim(messages_key, -self.max_messages, -1)
+            pipe.expire(messages_key, int(self.idle_ttl))
+            pipe.incr(revision_key)
+            pipe.expire(revision_key, int(self.idle_ttl))
+            results = await pipe.execute()
+        return int(results[3])
+
+    async def _delete(self, session_id: str) -> bool:
+        return await self.client.delete(*self._keys(session_id)) > 0
+
+
+def create_conversation_backend(async_db=None, backend: str = CHAT_STORE):
+    """Conversation backend selected by CHAT_STORE (sqlite needs the application's async_db)"""
+    if backend == 'sqlite' and async_db is not None:
+        return SQLiteConversationBackend(async_db)
+    if backend == 'redis':
+        if REDIS_AVAILABLE:
+            return RedisConversationBackend(aioredis.from_url(CHAT_REDIS_URL))
+        logger.warning("redis package not installed: chat conversations stay in process memory")
+    elif backend != 'memory':
+        logger.warning(f"Chat store {backend!r} unavailable: chat conversations stay in process memory")
+    return MemoryConversationBackend()
@@ -0,0 +1,162 @@
+"""
+SQLite Connection Pool for SIPORTS v2.0
+Shared per-thread connections with WAL journaling, busy timeout and statement cache
+"""
+
+import os
+import asyncio
+import sqlite3
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Tuning (overridable from the environment)
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+SQLITE_CACHED_STATEMENTS = int(os.environ.get('SQLITE_CACHED_STATEMENTS', 256))
+SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+DB_EXECUTOR_WORKERS = int(os.environ.get('DB_EXECUTOR_WORKERS', 8))
+
+
+class ConnectionPool:
+    """Hands out one long-lived SQLite connection per thread for a database file.
+
+    Opening a connection is the expensive part of a SQLite request (file open,
+    schema parse, empty statement cache), so each worker thread keeps its own
+    connection for the lifetime of the process instead of reconnecting.
+    """
+
+    def __init__(self, db_path, busy_timeout_ms=SQLITE_BUSY_TIMEOUT_MS,
+                 cached_statements=SQLITE_CACHED_STATEMENTS, journal_mode=SQLITE_JOURNAL_MODE):
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self.journal_mode = journal_mode
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def _connect(self):
+        """Open and configure a new connection"""
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            cached_statements=self.cached_statements,
+            check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute(f'PRAGMA journal_mode = {self.journal_mode}')
+        conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout_ms)}')
+        conn.execute('PRAGMA synchronous = NORMAL')
+
+        with self._lock:
+            self._connections.append(conn)
+
+        logger.info(f"SQLite connection opened on {self.db_path} (thread {threading.get_ident()})")
+        return conn
+
+    def get_connection(self):
+        """Get the calling thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Yield the thread's connection, committing on success and rolling back on error"""
+        conn = self.get_connection()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def close_all(self):
+        """Close every connection opened by this pool (application shutdown)"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logger.warning(f"Error closing SQLite connection: {e}")
+        self._local = threading.local()
+
+
+class AsyncDatabase:
+    """Runs SQLite work on a dedicated thread pool for async handlers.
+
+    sqlite3 calls block, so awaiting them through this class keeps the event
+    loop free while a query runs. Each executor thread gets its own pooled
+    connection from the underlying ConnectionPool.
+    """
+
+    def __init__(self, pool, max_workers=DB_EXECUTOR_WORKERS):
+        self.pool = pool
+        self.max_workers = max_workers
+        self._executor = self._new_executor()
+
+    def _new_executor(self):
+        return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='siports-db')
+
+    async def run(self, func, *args):
+        """Run func(conn, *args) in one transaction on a database thread"""
+        def task():
+            with self.pool.connection() as conn:
+                return func(conn, *args)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, task)
+
+    async def fetchone(self, query, params=()):
+        """Fetch a single row"""
+        return await self.run(lambda conn: conn.execute(query, params).fetchone())
+
+    async def fetchall(self, query, params=()):
+        """Fetch all rows"""
+        return await self.run(lambda conn: conn.execute(query, params).fetchall())
+
+    async def execute(self, query, params=()):
+        """Execute a write statement and return the cursor's lastrowid"""
+        return await self.run(lambda conn: conn.execute(query, params).lastrowid)
+
+    def shutdown(self):
+        """Stop the executor threads (application shutdown)"""
+        executor, self._executor = self._executor, self._new_executor()
+        executor.shutdown(wait=True)
+
+
+# Global pool registry, one pool per database file
+_pools = {}
+_async_databases = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path):
+    """Get the connection pool for a database file"""
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = ConnectionPool(db_path)
+            _pools[db_path] = pool
+        return pool
+
+
+def get_async_db(db_path):
+    """Get the async data-access layer for a database file"""
+    pool = get_pool(db_path)
+    with _pools_lock:
+        async_db = _async_databases.get(db_path)
+        if async_db is None:
+            async_db = AsyncDatabase(pool)
+            _async_databases[db_path] = async_db
+        return async_db
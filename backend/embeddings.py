@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Profile Embeddings for SIPORTS v2.0
+Offline hashed TF-IDF + SVD (LSA) vectors in a memory-mapped float32 matrix
+
+Build (or rebuild) the vectors for every validated profile and its mini-site:
+    python embeddings.py [--dim 128]
+"""
+
+import os
+import sys
+import math
+import logging
+import argparse
+import threading
+import numpy as np
+
+from search_index import hashed_features, EMBEDDING_HASH_FEATURES
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+EMBEDDINGS_DIR = os.environ.get('EMBEDDINGS_DIR', 'instance/embeddings')
+EMBEDDING_DIM = int(os.environ.get('EMBEDDING_DIM', 128))
+EMBEDDING_FIT_SAMPLE = int(os.environ.get('EMBEDDING_FIT_SAMPLE', 20000))
+EMBEDDING_MIN_SIMILARITY = float(os.environ.get('EMBEDDING_MIN_SIMILARITY', 0.1))
+
+
+def randomized_svd_components(rows, n_features, dim, rng, oversampling=10, power_iterations=2):
+    """Top right singular vectors (n_features x dim) of a sparse row matrix.
+
+    rows is a list of (indices, values) pairs. Randomized range finding
+    (Halko et al.) only needs products with thin dense matrices, so the
+    document-feature matrix is never materialised.
+    """
+    k = min(dim + oversampling, len(rows))
+
+    def times(right):
+        # (rows x n_features) @ (n_features x k)
+        return np.stack([values @ right[indices] if len(indices) else np.zeros(right.shape[1], dtype=np.float32)
+                         for indices, values in rows])
+
+    def transpose_times(left):
+        # (n_features x rows) @ (rows x k)
+        result = np.zeros((n_features, left.shape[1]), dtype=np.float32)
+        for (indices, values), weights in zip(rows, left):
+            result[indices] += np.outer(values, weights)
+        return result
+
+    q, _ = np.linalg.qr(times(rng.standard_normal((n_features, k)).astype(np.float32)))
+    for _ in range(power_iterations):
+        q, _ = np.linalg.qr(transpose_times(q))
+        q, _ = np.linalg.qr(times(q))
+
+    _, _, vt = np.linalg.svd(transpose_times(q).T, full_matrices=False)
+    components = np.zeros((n_features, dim), dtype=np.float32)
+    components[:, :min(dim, len(vt))] = vt[:dim].T
+    return components
+
+
+class EmbeddingModel:
+    """Hashed TF-IDF followed by a linear projection to a small dense space"""
+
+    def __init__(self, idf, components):
+        self.idf = idf.astype(np.float32)
+        self.components = components.astype(np.float32)
+
+    @property
+    def dim(self) -> int:
+        return self.components.shape[1]
+
+    @classmethod
+    def fit(cls, texts, dim=EMBEDDING_DIM, n_features=EMBEDDING_HASH_FEATURES, sample=EMBEDDING_FIT_SAMPLE):
+        """Learn IDF weights and a truncated SVD projection (random projection for tiny corpora)"""
+        features = [hashed_features(text, n_features) for text in texts]
+        document_frequency = np.zeros(n_features, dtype=np.float64)
+        for doc in features:
+            document_frequency[list(doc)] += 1
+        idf = np.log((1 + len(features)) / (1 + document_frequency)) + 1
+        # Features never seen in the corpus carry no meaning, only hash noise
+        idf[document_frequency == 0] = 0
+        model = cls(idf, np.zeros((n_features, dim), dtype=np.float32))
+
+        rng = np.random.default_rng(0)
+        if len(features) > dim:
+            chosen = rng.choice(len(features), size=min(sample, len(features)), replace=False)
+            rows = [model._weighted(features[doc_index]) for doc_index in chosen]
+            model.components = randomized_svd_components(rows, n_features, dim, rng)
+        else:
+            model.components = (rng.standard_normal((n_features, dim)) / math.sqrt(dim)).astype(np.float32)
+        return model, features
+
+    def _weighted(self, features: dict):
+        """Sublinear TF-IDF weights of hashed features, L2-normalised"""
+        if not features:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.float32)
+        indices = np.fromiter(features, dtype=np.intp, count=len(features))
+        counts = np.fromiter(features.values(), dtype=np.float32, count=len(features))
+        values = np.sign(counts) * (1 + np.log(np.maximum(np.abs(counts), 1))) * self.idf[indices]
+        norm = np.linalg.norm(values)
+        return indices, (values / norm if norm else values)
+
+    def embed_features(self, features: dict):
+        """Unit vector for pre-hashed features (zero vector for empty text)"""
+        indices, values = self._weighted(features)
+        vector = values @ self.components[indices] if len(indices) else np.zeros(self.dim, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).astype(np.float32)
+
+    def embed(self, text: str):
+        return self.embed_features(hashed_features(text, len(self.idf)))
+
+
+class EmbeddingStore:
+    """Profile vectors in a read-only memory-mapped matrix plus in-memory updates.
+
+    The matrix is produced offline by build(). Users created or edited since
+    then are embedded with the same model on the fly and kept in an overlay,
+    so search stays current until the next rebuild, which is picked up on
+    the next access.
+    """
+
+    def __init__(self, directory=EMBEDDINGS_DIR):
+        self.directory = directory
+        self.model = None
+        self._ids = None
+        self._indexed = frozenset()
+        self._vectors = None
+        self._overlay = {}
+        self._removed = set()
+        self._lock = threading.Lock()
+        # (inode, mtime) of the loaded model file; False until the first load
+        self._signature = False
+        # Bumped on every change, so callers can key cached query results on it
+        self.version = 0
+
+    def _paths(self):
+        return (os.path.join(self.directory, 'model.npz'),
+                os.path.join(self.directory, 'ids.npy'),
+                os.path.join(self.directory, 'vectors.f32'))
+
+    def _file_signature(self):
+        """(inode, mtime) of the model file, None if absent.
+
+        build() replaces the model file last, so a new signature means the
+        ids and vectors beside it are complete.
+        """
+        try:
+            stat = os.stat(self._paths()[0])
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    @property
+    def available(self) -> bool:
+        """True once vectors have been built and loaded (reloaded after a rebuild)"""
+        if self._file_signature() != self._signature:
+            self.load()
+        return self.model is not None
+
+    def load(self):
+        """Map the vectors built by build(), if present, unless already mapped"""
+        with self._lock:
+            signature = self._file_signature()
+            if signature == self._signature:
+                return
+            self._signature = signature
+            model_path, ids_path, vectors_path = self._paths()
+            if not all(os.path.exists(path) for path in self._paths()):
+                return
+            with np.load(model_path) as stored:
+                model = EmbeddingModel(stored['idf'], stored['components'])
+            ids = np.load(ids_path)
+            vectors = np.memmap(vectors_path, dtype=np.float32, mode='r', shape=(len(ids), model.dim)) if len(ids) else np.zeros((0, model.dim), dtype=np.float32)
+
+            self.model = model
+            self._ids = ids
+            self._indexed = frozenset(ids.tolist())
+            self._vectors = vectors
+            self._overlay = {}
+            self._removed = set()
+            self.version += 1
+        logger.info(f"Profile embeddings loaded ({len(ids)} vectors, {model.dim} dimensions)")
+
+    def build(self, documents: dict, dim=EMBEDDING_DIM):
+        """Fit the model on {doc_id: text} and write the memory-mapped matrix"""
+        os.makedirs(self.directory, exist_ok=True)
+        doc_ids = list(documents)
+        model, features = EmbeddingModel.fit([documents[doc_id] for doc_id in doc_ids], dim=dim)
+
+        model_path, ids_path, vectors_path = self._paths()
+        vectors = np.memmap(vectors_path + '.tmp', dtype=np.float32, mode='w+', shape=(max(len(doc_ids), 1), model.dim))
+        for row, doc_features in enumerate(features):
+            vectors[row] = model.embed_features(doc_features)
+        vectors.flush()
+        del vectors
+        if not doc_ids:
+            os.truncate(vectors_path + '.tmp', 0)
+
+        np.savez(model_path + '.tmp.npz', idf=model.idf, components=model.components)
+        np.save(ids_path + '.tmp.npy', np.array(doc_ids, dtype=np.int64))
+        os.replace(vectors_path + '.tmp', vectors_path)
+        os.replace(ids_path + '.tmp.npy', ids_path)
+        os.replace(model_path + '.tmp.npz', model_path)
+        logger.info(f"Profile embeddings built ({len(doc_ids)} vectors, {model.dim} dimensions)")
+        self.load()
+
+    def upsert(self, doc_id: int, text: str):
+        """Embed a new or changed document with the current model"""
+        if not self.available:
+            return
+        with self._lock:
+            self._overlay[doc_id] = self.model.embed(text)
+            self._removed.discard(doc_id)
+            self.version += 1
+
+    def remove(self, doc_id: int):
+        """Exclude a document from similarity results"""
+        with self._lock:
+            self._overlay.pop(doc_id, None)
+            # Only vectors of the mapped matrix need masking until the next rebuild
+            if doc_id in self._indexed:
+                self._removed.add(doc_id)
+            self.version += 1
+
+    def similarities(self, query: str, top_n: int = 1000, min_similarity=EMBEDDING_MIN_SIMILARITY) -> dict:
+        """Cosine similarity of the closest documents to a query: {doc_id: similarity}"""
+        if not self.available:
+            return {}
+        query_vector = self.model.embed(query)
+        if not query_vector.any():
+            return {}
+
+        with self._lock:
+            overlay = dict(self._overlay)
+            removed = set(self._removed)
+
+        results = {}
+        if len(self._ids):
+            # One batched matrix-vector product over the mapped matrix, then a partial sort
+            scores = np.asarray(self._vectors @ query_vector)
+            count = min(top_n + len(overlay) + len(removed), len(scores))
+            best = np.argpartition(-scores, count - 1)[:count]
+            for row in best:
+                doc_id = int(self._ids[row])
+                if scores[row] >= min_similarity and doc_id not in overlay and doc_id not in removed:
+                    results[doc_id] = float(scores[row])
+
+        for doc_id, vector in overlay.items():
+            score = float(vector @ query_vector)
+            if score >= min_similarity:
+                results[doc_id] = score
+        return results
+
+
+# Global profile embedding store instance
+embedding_store = EmbeddingStore()
+
+
+def main():
+    """Offline build of the profile vectors from the application database"""
+    import sqlite3
+    from networking_index import PROFILE_QUERY, build_profile, search_document
+
+    parser = argparse.ArgumentParser(description="Build profile embeddings")
+    parser.add_argument('--database', default=os.environ.get('DATABASE_URL', 'siports_production.db'))
+    parser.add_argument('--dim', type=int, default=EMBEDDING_DIM)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    conn = sqlite3.connect(args.database)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute(f"{PROFILE_QUERY} WHERE u.status = 'validated'").fetchall()
+    finally:
+        conn.close()
+
+    documents = {}
+    for row in rows:
+        row = dict(row)
+        documents[row['id']] = search_document(build_profile(row), row.get('enhanced_minisite_data'))
+    embedding_store.build(documents, dim=args.dim)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
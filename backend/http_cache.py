@@ -0,0 +1,116 @@
+"""
+HTTP Response Cache helpers for SIPORTS v2.0
+Pre-encoded, pre-compressed JSON payloads served with strong ETags and conditional GETs
+"""
+
+import json
+import gzip
+import hashlib
+import logging
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class EncodedPayload:
+    """A JSON document encoded once, with its compressed variants and ETag"""
+
+    def __init__(self, data, last_modified: datetime = None):
+        # Same encoding as FastAPI's JSONResponse
+        self.body = json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+        self.gzip = gzip.compress(self.body, compresslevel=9, mtime=0)
+        self.br = brotli.compress(self.body, quality=11) if BROTLI_AVAILABLE else None
+        self.last_modified = (last_modified or datetime.now(timezone.utc)).replace(microsecond=0)
+
+    def variant(self, encoding):
+        """Body bytes for a content-coding ('br', 'gzip' or None)"""
+        if encoding == 'br':
+            return self.br
+        if encoding == 'gzip':
+            return self.gzip
+        return self.body
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag (RFC 9110)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def not_modified_since(if_modified_since: str, last_modified: datetime) -> bool:
+    """True if an If-Modified-Since header is at or after last_modified"""
+    if not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified <= since
+
+
+def choose_encoding(accept_encoding: str, payload: EncodedPayload):
+    """Pick the best content-coding the client accepts: br, then gzip, else identity"""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    if payload.br is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def cached_json_response(request: Request, payload: EncodedPayload, max_age: int = 300,
+                         cache_control: str = None) -> Response:
+    """Serve a pre-encoded payload, answering 304 to matching conditional GET/HEAD requests"""
+    headers = {
+        'ETag': payload.etag,
+        'Last-Modified': format_datetime(payload.last_modified, usegmt=True),
+        'Cache-Control': cache_control or f'public, max-age={max_age}',
+        'Vary': 'Accept-Encoding'
+    }
+
+    # Conditional headers only validate cached representations on safe methods
+    if request.method in ('GET', 'HEAD'):
+        if_none_match = request.headers.get('if-none-match')
+        if if_none_match is not None:
+            if etag_matches(if_none_match, payload.etag):
+                return Response(status_code=304, headers=headers)
+        elif not_modified_since(request.headers.get('if-modified-since'), payload.last_modified):
+            return Response(status_code=304, headers=headers)
+
+    encoding = choose_encoding(request.headers.get('accept-encoding'), payload)
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return Response(content=payload.variant(encoding), media_type='application/json', headers=headers)
@@ -0,0 +1,54 @@
+"""
+Keyword Matcher for SIPORTS v2.0
+Every chatbot keyword table compiled into one regex, matched in a single pass over a message
+"""
+
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class KeywordMatcher:
+    """Substring matcher for {table: {label: [keywords]}} keyword tables.
+
+    All keywords are compiled into one alternation inside a lookahead, longest
+    first, so a single finditer() reports at every position the longest
+    keyword starting there. A shorter keyword starting at the same position
+    is necessarily a substring of that one: each keyword's hits include those
+    of the keywords it contains (precomputed), so the result is exactly what
+    `keyword in text` over every keyword would give.
+    """
+
+    def __init__(self, tables: dict):
+        self.tables = tables
+        owners = {}
+        for table, labels in tables.items():
+            for label, keywords in labels.items():
+                for keyword in keywords:
+                    owners.setdefault(keyword.lower(), set()).add((table, label))
+
+        keywords = sorted(owners, key=len, reverse=True)
+        # keyword -> ((table, label, keyword), ...) for itself and every keyword it contains
+        self._hits = {
+            keyword: tuple(
+                (table, label, contained)
+                for contained in keywords if contained in keyword
+                for table, label in owners[contained]
+            )
+            for keyword in keywords
+        }
+        self._pattern = re.compile('(?=({}))'.format('|'.join(re.escape(keyword) for keyword in keywords)))
+
+    def scan(self, text: str) -> dict:
+        """{table: {label: {matched keywords}}} of every table, in one pass over text (case-insensitive)"""
+        found = {table: {} for table in self.tables}
+        seen = set()
+        for match in self._pattern.finditer(text.lower()):
+            keyword = match.group(1)
+            if keyword in seen:
+                continue
+            seen.add(keyword)
+            for table, label, contained in self._hits[keyword]:
+                found[table].setdefault(label, set()).add(contained)
+        return found
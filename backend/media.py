@@ -0,0 +1,256 @@
+"""
+Media Pipeline for SIPORTS v2.0
+Content-addressed image storage with responsive WebP/AVIF variants built in a worker pool
+"""
+
+import os
+import json
+import asyncio
+import hashlib
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from fastapi.staticfiles import StaticFiles
+
+try:
+    from PIL import Image, ImageOps, features
+    PIL_AVAILABLE = True
+    try:
+        # Registers the AVIF codec on Pillow versions without native support
+        import pillow_avif  # noqa: F401
+    except ImportError:
+        pass
+except ImportError:
+    PIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+MEDIA_DIR = os.environ.get('MEDIA_DIR', 'instance/media')
+MEDIA_URL = os.environ.get('MEDIA_URL', '/media')
+MEDIA_MAX_BYTES = int(os.environ.get('MEDIA_MAX_BYTES', 10 * 1024 * 1024))
+MEDIA_WORKERS = int(os.environ.get('MEDIA_WORKERS', 2))
+
+# Responsive widths (never upscaled) and the square thumbnail size
+VARIANT_WIDTHS = (320, 640, 1280, 1920)
+THUMBNAIL_SIZE = 256
+WEBP_QUALITY = 80
+AVIF_QUALITY = 60
+
+# Leading bytes of the accepted image formats -> file extension
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+
+
+def image_extension(data: bytes):
+    """File extension of a supported image, from its magic bytes (None if unsupported)"""
+    for signature, extension in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return extension
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    if data[4:12] in (b'ftypavif', b'ftypavis'):
+        return 'avif'
+    return None
+
+
+def original_path(asset_id: str, extension: str, media_dir: str = MEDIA_DIR) -> str:
+    return os.path.join(media_dir, 'originals', asset_id[:2], f'{asset_id}.{extension}')
+
+
+def media_url(path: str, media_dir: str = MEDIA_DIR) -> str:
+    """Public URL of a file stored under media_dir"""
+    return f"{MEDIA_URL}/{os.path.relpath(path, media_dir).replace(os.sep, '/')}"
+
+
+def write_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporary, 'wb') as handle:
+        handle.write(data)
+    os.replace(temporary, path)
+
+
+def store_original(data: bytes, extension: str, media_dir: str = MEDIA_DIR) -> str:
+    """Write an upload under its SHA-256 (identical uploads share one file); returns the asset id"""
+    asset_id = hashlib.sha256(data).hexdigest()
+    path = original_path(asset_id, extension, media_dir)
+    if not os.path.exists(path):
+        write_atomic(path, data)
+    return asset_id
+
+
+def generate_variants(asset_id: str, extension: str, media_dir: str = MEDIA_DIR) -> dict:
+    """Build the responsive variants of an original (runs in a worker process).
+
+    Returns {'width', 'height', 'variants': {'webp': [...], 'avif': [...],
+    'thumbnail': url}} where each list holds {'width', 'url'} by increasing width.
+    """
+    if not PIL_AVAILABLE:
+        return {'width': None, 'height': None, 'variants': {}}
+
+    formats = []
+    if features.check('webp'):
+        formats.append(('webp', 'WEBP', {'quality': WEBP_QUALITY, 'method': 6}))
+    Image.init()
+    if 'AVIF' in Image.SAVE:
+        formats.append(('avif', 'AVIF', {'quality': AVIF_QUALITY}))
+
+    variant_dir = os.path.join(media_dir, 'variants', asset_id)
+    os.makedirs(variant_dir, exist_ok=True)
+    with Image.open(original_path(asset_id, extension, media_dir)) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        width, height = image.size
+
+        widths = sorted({min(target, width) for target in VARIANT_WIDTHS})
+        variants = {name: [] for name, _, _ in formats}
+        for target in widths:
+            resized = image if target == width else image.resize(
+                (target, max(1, round(height * target / width))), Image.LANCZOS
+            )
+            for name, pil_format, options in formats:
+                path = os.path.join(variant_dir, f'{target}.{name}')
+                resized.save(path + '.tmp', pil_format, **options)
+                os.replace(path + '.tmp', path)
+                variants[name].append({'width': target, 'url': media_url(path, media_dir)})
+
+        if formats:
+            name, pil_format, options = formats[0]
+            thumbnail = ImageOps.fit(image, (THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.LANCZOS)
+            path = os.path.join(variant_dir, f'thumbnail.{name}')
+            thumbnail.save(path + '.tmp', pil_format, **options)
+            os.replace(path + '.tmp', path)
+            variants['thumbnail'] = media_url(path, media_dir)
+
+    return {'width': width, 'height': height, 'variants': variants}
+
+
+class MediaPipeline:
+    """Stores uploads and renders their variants in a pool of worker processes.
+
+    Encoding WebP/AVIF is CPU-bound, so it runs in separate processes
+    (spawned, not forked from the threaded server) and never holds up the
+    event loop or the database threads.
+    """
+
+    def __init__(self, workers=MEDIA_WORKERS, media_dir=MEDIA_DIR):
+        self.workers = workers
+        self.media_dir = media_dir
+        self._executor = None
+        self._lock = threading.Lock()
+        if not PIL_AVAILABLE:
+            logger.warning("Pillow not installed: images are stored without responsive variants")
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    async def build(self, asset_id: str, extension: str) -> dict:
+        """Build an asset's variants in a worker process (see generate_variants)"""
+        if not PIL_AVAILABLE:
+            # Nothing to render, no need to start the workers
+            return generate_variants(asset_id, extension, self.media_dir)
+        future = self.executor.submit(generate_variants, asset_id, extension, self.media_dir)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        """Stop the worker processes (application shutdown)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+# Global media pipeline instance
+media_pipeline = MediaPipeline()
+
+
+def register_asset(conn, asset_id: str, user_id: int, extension: str, size: int) -> bool:
+    """Record an upload; returns False when the same content was already uploaded"""
+    cursor = conn.execute(
+        'INSERT OR IGNORE INTO media_assets (id, user_id, extension, size) VALUES (?, ?, ?, ?)',
+        (asset_id, user_id, extension, size)
+    )
+    return cursor.rowcount > 0
+
+
+def complete_asset(conn, asset_id: str, result: dict = None):
+    """Store the variants built for an asset (or mark it failed when result is None)"""
+    if result is None:
+        conn.execute("UPDATE media_assets SET status = 'failed' WHERE id = ?", (asset_id,))
+        return
+    conn.execute(
+        "UPDATE media_assets SET status = 'ready', width = ?, height = ?, variants = ? WHERE id = ?",
+        (result['width'], result['height'], json.dumps(result['variants']), asset_id)
+    )
+
+
+def asset_document(row) -> dict:
+    """API representation of a media_assets row"""
+    return {
+        'id': row['id'],
+        'url': media_url(original_path(row['id'], row['extension'])),
+        'status': row['status'],
+        'width': row['width'],
+        'height': row['height'],
+        'size': row['size'],
+        'variants': json.loads(row['variants']) if row['variants'] else {}
+    }
+
+
+def get_asset(conn, asset_id: str):
+    row = conn.execute('SELECT * FROM media_assets WHERE id = ?', (asset_id,)).fetchone()
+    return asset_document(row) if row else None
+
+
+def asset_ids_in(value) -> set:
+    """Ids of the uploaded originals referenced by URL anywhere in a value"""
+    prefix = f'{MEDIA_URL}/originals/'
+    found = set()
+    if isinstance(value, str):
+        position = value.find(prefix)
+        if position >= 0:
+            name = value[position + len(prefix):].split('/')[-1]
+            found.add(name.split('.')[0])
+    elif isinstance(value, list):
+        for item in value:
+            found |= asset_ids_in(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            found |= asset_ids_in(item)
+    return found
+
+
+def media_references(conn, document: dict, fields=('logo', 'coverImage', 'gallery')) -> dict:
+    """{original URL: asset} for the uploaded images a mini-site references"""
+    asset_ids = set()
+    for field in fields:
+        asset_ids |= asset_ids_in(document.get(field))
+    if not asset_ids:
+        return {}
+    rows = conn.execute(
+        f"SELECT * FROM media_assets WHERE id IN ({', '.join('?' * len(asset_ids))})",
+        list(asset_ids)
+    ).fetchall()
+    assets = [asset_document(row) for row in rows]
+    return {asset['url']: asset for asset in assets}
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """Static files whose URLs change with their content, so they can be cached forever"""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
@@ -0,0 +1,401 @@
+"""
+Schema Migrations for SIPORTS v2.0
+Versioned, idempotent schema changes applied once per database file
+"""
+
+import json
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# A schema change: a unique, increasing version and a function taking a connection.
+# Migrations only use the SQL and data written here, never application modules:
+# once applied somewhere, a migration must keep doing exactly the same thing.
+Migration = namedtuple('Migration', ['version', 'name', 'apply'])
+
+
+def column_names(conn, table: str) -> set:
+    """Names of the columns of a table"""
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})').fetchall()}
+
+
+def add_column(conn, table: str, column: str, definition: str):
+    """ALTER TABLE ... ADD COLUMN, skipped if the column already exists (pre-migration databases)"""
+    if column not in column_names(conn, table):
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+
+# Core migrations (every server)
+
+def create_users(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            user_type TEXT DEFAULT 'visitor',
+            first_name TEXT,
+            last_name TEXT,
+            company TEXT,
+            phone TEXT,
+            visitor_package TEXT DEFAULT 'Free',
+            partnership_package TEXT,
+            status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def create_user_counters(conn):
+    # Dashboard counters per (user_type, status), kept up to date by triggers so every
+    # write to users (registration, validation, rejection, WordPress sync...) adjusts
+    # them in its own transaction
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_counters (
+            user_type TEXT NOT NULL,
+            status TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_type, status)
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS user_counters_insert AFTER INSERT ON users
+        BEGIN
+            INSERT OR IGNORE INTO user_counters (user_type, status, count)
+            VALUES (COALESCE(NEW.user_type, ''), COALESCE(NEW.status, ''), 0);
+            UPDATE user_counters SET count = count + 1
+            WHERE user_type = COALESCE(NEW.user_type, '') AND status = COALESCE(NEW.status, '');
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS user_counters_update AFTER UPDATE OF user_type, status ON users
+        WHEN OLD.user_type IS NOT NEW.user_type OR OLD.status IS NOT NEW.status
+        BEGIN
+            UPDATE user_counters SET count = count - 1
+            WHERE user_type = COALESCE(OLD.user_type, '') AND status = COALESCE(OLD.status, '');
+            INSERT OR IGNORE INTO user_counters (user_type, status, count)
+            VALUES (COALESCE(NEW.user_type, ''), COALESCE(NEW.status, ''), 0);
+            UPDATE user_counters SET count = count + 1
+            WHERE user_type = COALESCE(NEW.user_type, '') AND status = COALESCE(NEW.status, '');
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS user_counters_delete AFTER DELETE ON users
+        BEGIN
+            UPDATE user_counters SET count = count - 1
+            WHERE user_type = COALESCE(OLD.user_type, '') AND status = COALESCE(OLD.status, '');
+        END
+    ''')
+    # Seed from the users already there (pre-migration databases)
+    conn.execute('DELETE FROM user_counters')
+    conn.execute('''
+        INSERT INTO user_counters (user_type, status, count)
+        SELECT COALESCE(user_type, ''), COALESCE(status, ''), COUNT(*)
+        FROM users
+        GROUP BY COALESCE(user_type, ''), COALESCE(status, '')
+    ''')
+
+
+def add_enhanced_minisite_data(conn):
+    add_column(conn, 'users', 'enhanced_minisite_data', 'TEXT')
+
+
+def create_users_indexes(conn):
+    # Pending queue and status filters: WHERE status = ? ORDER BY created_at
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_users_status_created_at ON users (status, created_at)')
+    # Networking filters: WHERE status = 'validated' AND user_type ...
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_users_user_type_status ON users (user_type, status)')
+
+
+def create_chat_tables(conn):
+    # Chatbot histories (CHAT_STORE=sqlite); same definitions as ai_chatbot_system's tables
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS chat_sessions (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            language TEXT DEFAULT 'fr',
+            context TEXT DEFAULT '{}',
+            message_count INTEGER DEFAULT 0,
+            status TEXT DEFAULT 'active',
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS chat_messages (
+            id TEXT PRIMARY KEY,
+            session_id TEXT,
+            user_id INTEGER,
+            message TEXT NOT NULL,
+            response TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            message_type TEXT DEFAULT 'text',
+            language TEXT DEFAULT 'fr',
+            context TEXT DEFAULT '{}',
+            sentiment_score REAL DEFAULT 0.0,
+            intent TEXT,
+            FOREIGN KEY (session_id) REFERENCES chat_sessions(id),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+    # History of a session in insertion order: WHERE session_id = ? ORDER BY rowid
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_chat_messages_session ON chat_messages (session_id)')
+
+
+def create_chat_retention(conn):
+    # Expiry scans and least recently active sessions: WHERE/ORDER BY last_activity
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_chat_sessions_last_activity ON chat_sessions (last_activity)')
+    # Approximate size of the stored exchanges, kept by triggers for the byte budget:
+    # UTF-8 text plus 200 bytes of bookkeeping per message, two messages per row
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS chat_storage (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            bytes INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('''
+        INSERT OR REPLACE INTO chat_storage (id, bytes)
+        SELECT 1, COALESCE(SUM(LENGTH(CAST(message AS BLOB)) + LENGTH(CAST(response AS BLOB)) + 400), 0)
+        FROM chat_messages
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS chat_storage_insert AFTER INSERT ON chat_messages
+        BEGIN
+            UPDATE chat_storage
+            SET bytes = bytes + LENGTH(CAST(NEW.message AS BLOB)) + LENGTH(CAST(NEW.response AS BLOB)) + 400
+            WHERE id = 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS chat_storage_delete AFTER DELETE ON chat_messages
+        BEGIN
+            UPDATE chat_storage
+            SET bytes = bytes - LENGTH(CAST(OLD.message AS BLOB)) - LENGTH(CAST(OLD.response AS BLOB)) - 400
+            WHERE id = 1;
+        END
+    ''')
+
+
+# WordPress integration migrations (server_production_wp)
+
+def add_wordpress_columns(conn):
+    add_column(conn, 'users', 'wp_user_id', 'INTEGER')
+    add_column(conn, 'users', 'wp_sync_enabled', 'BOOLEAN DEFAULT 1')
+    add_column(conn, 'users', 'last_wp_sync', 'TIMESTAMP')
+    if 'updated_at' not in column_names(conn, 'users'):
+        # ADD COLUMN cannot take a CURRENT_TIMESTAMP default, so backfill instead
+        conn.execute('ALTER TABLE users ADD COLUMN updated_at TIMESTAMP')
+        conn.execute('UPDATE users SET updated_at = created_at')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS users_updated_at_default AFTER INSERT ON users
+            WHEN NEW.updated_at IS NULL
+            BEGIN
+                UPDATE users SET updated_at = NEW.created_at WHERE id = NEW.id;
+            END
+        ''')
+
+
+def create_wp_sync_log(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS wp_sync_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            action TEXT NOT NULL,
+            data TEXT,
+            status TEXT DEFAULT 'pending',
+            error_message TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+
+def create_wordpress_indexes(conn):
+    # Webhooks and sync counts: WHERE wp_user_id = ? / wp_user_id IS NOT NULL
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_users_wp_user_id ON users (wp_user_id)')
+    # Sync status: WHERE user_id = ? ORDER BY created_at DESC
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_wp_sync_log_user_created_at ON wp_sync_log (user_id, created_at)')
+
+
+# Networking, mini-site and media migrations (server)
+
+def create_user_profiles(conn):
+    # Extended networking profiles, generated once per user instead of on every request.
+    # Rows are filled by the networking index (enrich_profiles) for users without one.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_profiles (
+            user_id INTEGER PRIMARY KEY,
+            title TEXT,
+            sector TEXT,
+            location TEXT,
+            description TEXT,
+            interests TEXT,
+            languages TEXT,
+            budget TEXT,
+            business_potential TEXT,
+            affinity INTEGER,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+
+def create_minisite_sections(conn):
+    # Mini-sites move out of the users row into one row per section
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS minisites (
+            user_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 1,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS minisite_sections (
+            user_id INTEGER NOT NULL,
+            section TEXT NOT NULL,
+            data TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, section),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        ) WITHOUT ROWID
+    ''')
+
+    # Blobs saved on users: these fields get their own row, every other one goes to 'profile'
+    section_fields = ('timeline', 'team', 'values', 'certifications', 'services', 'projects',
+                      'news', 'gallery', 'contacts', 'social')
+    rows = conn.execute(
+        'SELECT id, enhanced_minisite_data FROM users WHERE enhanced_minisite_data IS NOT NULL'
+    ).fetchall()
+    migrated = []
+    for user_id, blob in rows:
+        try:
+            data = json.loads(blob)
+        except ValueError:
+            logger.warning(f"Skipping unreadable mini-site data of user {user_id}")
+            continue
+        if not isinstance(data, dict):
+            continue
+        sections = {'profile': {key: value for key, value in data.items() if key not in section_fields}}
+        sections.update((field, data[field]) for field in section_fields if field in data)
+        conn.executemany(
+            'INSERT OR REPLACE INTO minisite_sections (user_id, section, data) VALUES (?, ?, ?)',
+            [(user_id, section, json.dumps(value, ensure_ascii=False, sort_keys=True))
+             for section, value in sections.items()]
+        )
+        conn.execute('INSERT OR IGNORE INTO minisites (user_id) VALUES (?)', (user_id,))
+        migrated.append((user_id,))
+    # The blob is kept only where it could not be migrated
+    conn.executemany('UPDATE users SET enhanced_minisite_data = NULL WHERE id = ?', migrated)
+
+
+def create_media_assets(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS media_assets (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER,
+            extension TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            width INTEGER,
+            height INTEGER,
+            status TEXT DEFAULT 'pending',
+            variants TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+
+# Versions are unique across every list below: server_production and
+# server_production_wp use the same database file by default, so a version
+# must mean the same migration whichever server applied it. Each server has
+# its own list, in the order its migrations are applied.
+CORE_MIGRATIONS = [
+    Migration(1, 'create_users', create_users),
+    Migration(2, 'user_counters', create_user_counters),
+    Migration(3, 'users_enhanced_minisite_data', add_enhanced_minisite_data),
+    Migration(4, 'users_indexes', create_users_indexes),
+    Migration(5, 'chat_tables', create_chat_tables),
+]
+
+# Core migrations added after the server-specific ones, appended to every list
+CHAT_RETENTION = Migration(12, 'chat_retention', create_chat_retention)
+
+# server_production
+PRODUCTION_MIGRATIONS = CORE_MIGRATIONS + [
+    CHAT_RETENTION,
+]
+
+# server_production_wp
+WORDPRESS_MIGRATIONS = CORE_MIGRATIONS + [
+    Migration(6, 'users_wordpress_columns', add_wordpress_columns),
+    Migration(7, 'wp_sync_log', create_wp_sync_log),
+    Migration(8, 'wordpress_indexes', create_wordpress_indexes),
+    CHAT_RETENTION,
+]
+
+# server (networking, mini-sites and media)
+SERVER_MIGRATIONS = CORE_MIGRATIONS + [
+    Migration(9, 'user_profiles', create_user_profiles),
+    Migration(10, 'minisite_sections', create_minisite_sections),
+    Migration(11, 'media_assets', create_media_assets),
+    CHAT_RETENTION,
+]
+
+
+def applied_versions(conn) -> set:
+    """Versions already recorded in schema_migrations"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    return {row[0] for row in conn.execute('SELECT version FROM schema_migrations').fetchall()}
+
+
+def schema_is_current(conn, migrations) -> bool:
+    """True if every migration is already applied (read-only, no DDL)"""
+    if not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_migrations'"
+    ).fetchone():
+        return False
+    done = {row[0] for row in conn.execute('SELECT version FROM schema_migrations').fetchall()}
+    return all(m.version in done for m in migrations)
+
+
+def run_migrations(conn, migrations) -> list:
+    """Apply the pending migrations of a list in order, each in its own transaction.
+
+    BEGIN IMMEDIATE takes the write lock before re-checking the version, so
+    several workers starting together apply each migration exactly once.
+    Returns the versions applied by this call.
+    """
+    conn.commit()
+    done = applied_versions(conn)
+    pending = [m for m in migrations if m.version not in done]
+
+    applied = []
+    for migration in pending:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if migration.version in applied_versions(conn):
+                conn.rollback()
+                continue
+            migration.apply(conn)
+            conn.execute(
+                'INSERT INTO schema_migrations (version, name) VALUES (?, ?)',
+                (migration.version, migration.name)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.error(f"Migration {migration.version} ({migration.name}) failed")
+            raise
+        applied.append(migration.version)
+        logger.info(f"Applied migration {migration.version}: {migration.name}")
+
+    return applied
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Static Mini-site Export for SIPORTS v2.0
+Pre-rendered HTML and JSON files of published mini-sites, served directly by nginx
+
+Layout of the export directory:
+    minisites/{user_id}.json         same bytes as GET /api/minisite/enhanced/{user_id}/public
+    minisites/{user_id}.json.gz      pre-compressed variant (nginx gzip_static)
+    minisites/{user_id}/index.html   standalone page, with the JSON embedded
+    minisites/{user_id}/index.html.gz
+
+Export every published mini-site (and drop files of unpublished ones):
+    python minisite_export.py [--database siports_production.db] [--output instance/static]
+
+With MINISITE_EXPORT_DIR set, the server re-exports a mini-site whenever it
+is saved or deleted, so the files never lag behind the database.
+"""
+
+import os
+import sys
+import gzip
+import html
+import logging
+import argparse
+import threading
+
+from http_cache import EncodedPayload
+from minisites import public_minisite_document
+
+logger = logging.getLogger(__name__)
+
+# Directory the server keeps up to date on every mini-site change (disabled when empty)
+MINISITE_EXPORT_DIR = os.environ.get('MINISITE_EXPORT_DIR', '')
+
+# Users whose mini-site is published: exhibitors and partners who saved one
+PUBLISHED_QUERY = '''
+    SELECT u.id FROM users u
+    WHERE u.user_type IN ('exhibitor', 'partner')
+      AND EXISTS (SELECT 1 FROM minisite_sections s WHERE s.user_id = u.id)
+'''
+
+LIST_SECTIONS = (
+    ('services', 'Services'),
+    ('projects', 'Projets'),
+    ('products', 'Produits'),
+    ('team', 'Équipe'),
+    ('certifications', 'Certifications'),
+    ('news', 'Actualités')
+)
+
+PAGE_TEMPLATE = '''<!DOCTYPE html>
+<html lang="fr">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title} | SIPORTS</title>
+<meta name="description" content="{description}">
+<meta property="og:type" content="website">
+<meta property="og:title" content="{title}">
+<meta property="og:description" content="{description}">
+{og_image}<style>
+body{{font-family:system-ui,-apple-system,sans-serif;margin:0;color:#1e293b;background:#f8fafc;line-height:1.5}}
+header{{background:#0c4a6e;color:#fff;padding:2.5rem 1.5rem}}
+main{{max-width:960px;margin:0 auto;padding:1.5rem}}
+section{{background:#fff;border-radius:8px;padding:1.25rem;margin-bottom:1rem;box-shadow:0 1px 2px rgba(0,0,0,.06)}}
+h1{{margin:0 0 .25rem}} h2{{margin-top:0;color:#0c4a6e}} ul{{padding-left:1.25rem}}
+.meta{{opacity:.85}}
+</style>
+</head>
+<body>
+<header><main>
+<h1>{icon}{title}</h1>
+<p>{tagline}</p>
+<p class="meta">{meta}</p>
+</main></header>
+<main>
+<section><h2>Présentation</h2><p>{full_description}</p></section>
+{sections}{contact}</main>
+<script type="application/json" id="minisite-data">{data}</script>
+</body>
+</html>
+'''
+
+
+def escape(value) -> str:
+    return html.escape(str(value)) if value else ''
+
+
+def render_item(item) -> str:
+    """One list entry: its name/title, role and description when present"""
+    if not isinstance(item, dict):
+        return f'<li>{escape(item)}</li>'
+    heading = item.get('name') or item.get('title') or ''
+    details = [item.get(key) for key in ('role', 'position', 'year', 'date', 'price') if item.get(key)]
+    text = item.get('description') or item.get('content') or ''
+    parts = [f'<strong>{escape(heading)}</strong>' if heading else '']
+    if details:
+        parts.append(f' — {escape(", ".join(str(detail) for detail in details))}')
+    if text:
+        parts.append(f'<br>{escape(text)}')
+    return f"<li>{''.join(parts)}</li>"
+
+
+def render_html(document: dict, data_json: str) -> str:
+    """Standalone page of a public mini-site document"""
+    sections = []
+    for key, label in LIST_SECTIONS:
+        items = document.get(key) or []
+        if isinstance(items, list) and items:
+            sections.append(f"<section><h2>{label}</h2><ul>{''.join(render_item(item) for item in items)}</ul></section>\n")
+
+    contact_lines = [document.get(key) for key in ('email', 'phone', 'website') if document.get(key)]
+    contact = ''
+    if contact_lines:
+        contact = f"<section><h2>Contact</h2><p>{'<br>'.join(escape(line) for line in contact_lines)}</p></section>\n"
+
+    meta = ' · '.join(escape(document.get(key)) for key in ('category', 'location', 'standNumber', 'pavilion') if document.get(key))
+    cover = document.get('coverImage') or document.get('logo')
+    return PAGE_TEMPLATE.format(
+        title=escape(document.get('name')),
+        description=escape(document.get('description')),
+        og_image=f'<meta property="og:image" content="{escape(cover)}">\n' if cover else '',
+        icon=f"{escape(document.get('icon'))} " if document.get('icon') else '',
+        tagline=escape(document.get('tagline')),
+        meta=meta,
+        full_description=escape(document.get('fullDescription') or document.get('description')),
+        sections=''.join(sections),
+        contact=contact,
+        # Keep the embedded JSON from closing the script element
+        data=data_json.replace('</', '<\\/')
+    )
+
+
+def export_paths(output_dir: str, user_id: int) -> tuple:
+    base = os.path.join(output_dir, 'minisites')
+    return os.path.join(base, f'{user_id}.json'), os.path.join(base, str(user_id), 'index.html')
+
+
+def write_atomic(path: str, data: bytes):
+    """Replace a file in one step, so nginx never serves a partial write"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporary, 'wb') as handle:
+        handle.write(data)
+    os.replace(temporary, path)
+
+
+def remove_export(user_id: int, output_dir: str = MINISITE_EXPORT_DIR):
+    """Delete a mini-site's exported files, so requests fall back to the API"""
+    for path in export_paths(output_dir, user_id):
+        for variant in (path, path + '.gz'):
+            if os.path.exists(variant):
+                os.remove(variant)
+    try:
+        os.rmdir(os.path.dirname(export_paths(output_dir, user_id)[1]))
+    except OSError:
+        pass
+
+
+def is_published(conn, user_id: int) -> bool:
+    return conn.execute(f'{PUBLISHED_QUERY} AND u.id = ?', (user_id,)).fetchone() is not None
+
+
+def export_minisite(conn, user_id: int, output_dir: str = MINISITE_EXPORT_DIR) -> bool:
+    """Render one mini-site to static files, or remove them if it is not published"""
+    if not is_published(conn, user_id):
+        remove_export(user_id, output_dir)
+        return False
+
+    # Exactly the API response bytes, so nginx and the backend serve the same document
+    document = public_minisite_document(conn, user_id)
+    payload = EncodedPayload({"data": document})
+    page = render_html(document, payload.body.decode('utf-8')).encode('utf-8')
+
+    json_path, html_path = export_paths(output_dir, user_id)
+    write_atomic(json_path, payload.body)
+    write_atomic(json_path + '.gz', payload.gzip)
+    write_atomic(html_path, page)
+    write_atomic(html_path + '.gz', gzip.compress(page, compresslevel=9, mtime=0))
+    return True
+
+
+def export_all(conn, output_dir: str) -> int:
+    """Export every published mini-site and drop the files of the others"""
+    published = [row[0] for row in conn.execute(PUBLISHED_QUERY).fetchall()]
+    for user_id in published:
+        export_minisite(conn, user_id, output_dir)
+
+    base = os.path.join(output_dir, 'minisites')
+    exported = {name.split('.')[0] for name in os.listdir(base)} if os.path.isdir(base) else set()
+    for stale in exported - {str(user_id) for user_id in published}:
+        if stale.isdigit():
+            remove_export(int(stale), output_dir)
+
+    logger.info(f"Exported {len(published)} mini-sites to {output_dir}")
+    return len(published)
+
+
+def main():
+    """Full export of the published mini-sites from the application database"""
+    import sqlite3
+
+    parser = argparse.ArgumentParser(description="Export published mini-sites as static files")
+    parser.add_argument('--database', default=os.environ.get('DATABASE_URL', 'siports_production.db'))
+    parser.add_argument('--output', default=MINISITE_EXPORT_DIR or 'instance/static')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    conn = sqlite3.connect(args.database)
+    conn.row_factory = sqlite3.Row
+    try:
+        export_all(conn, args.output)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
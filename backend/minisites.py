@@ -0,0 +1,198 @@
+"""
+Mini-site Storage for SIPORTS v2.0
+Enhanced mini-sites stored per section, with JSON merge-patch updates
+"""
+
+import json
+import logging
+
+from media import media_references
+
+logger = logging.getLogger(__name__)
+
+# Sections stored in their own row; every other field goes to the 'profile' section
+PROFILE_SECTION = 'profile'
+SECTION_FIELDS = ('timeline', 'team', 'values', 'certifications', 'services', 'projects',
+                  'news', 'gallery', 'contacts', 'social')
+
+# Mock products for demonstration (in production, this would come from a products table)
+DEMO_PRODUCTS = [
+    {
+        "id": 1,
+        "name": "SmartShip Navigator",
+        "description": "Système de navigation assistée par intelligence artificielle",
+        "category": "Navigation",
+        "price": "Sur devis",
+        "images": ["/images/product1.jpg"]
+    },
+    {
+        "id": 2,
+        "name": "MarineIoT Hub",
+        "description": "Plateforme IoT embarquée pour navires connectés",
+        "category": "IoT",
+        "price": "À partir de €15,000",
+        "images": ["/images/product2.jpg"]
+    }
+]
+
+
+def split_sections(data: dict) -> dict:
+    """{section: value} rows of a mini-site document"""
+    sections = {PROFILE_SECTION: {key: value for key, value in data.items() if key not in SECTION_FIELDS}}
+    sections.update((field, data[field]) for field in SECTION_FIELDS if field in data)
+    return sections
+
+
+def join_sections(sections: dict) -> dict:
+    """Mini-site document from its {section: value} rows"""
+    data = dict(sections.get(PROFILE_SECTION, {}))
+    data.update((section, value) for section, value in sections.items() if section != PROFILE_SECTION)
+    return data
+
+
+def merge_patch(target, patch):
+    """Apply a JSON merge patch (RFC 7386): objects merge recursively, null deletes a member"""
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+def _stored_sections(conn, user_id: int) -> dict:
+    rows = conn.execute('SELECT section, data FROM minisite_sections WHERE user_id = ?', (user_id,)).fetchall()
+    return {row[0]: row[1] for row in rows}
+
+
+def load_minisite(conn, user_id: int):
+    """A user's mini-site document, or None if they have not saved one"""
+    sections = _stored_sections(conn, user_id)
+    if not sections:
+        return None
+    return join_sections({section: json.loads(data) for section, data in sections.items()})
+
+
+def write_minisite(conn, user_id: int, data: dict) -> list:
+    """Store a mini-site document, rewriting only the sections that changed.
+
+    Returns the names of the changed sections; the mini-site version is bumped
+    when there is at least one.
+    """
+    stored = _stored_sections(conn, user_id)
+    encoded = {
+        section: json.dumps(value, ensure_ascii=False, sort_keys=True)
+        for section, value in split_sections(data).items()
+    }
+    changed = [section for section, text in encoded.items() if stored.get(section) != text]
+    removed = [section for section in stored if section not in encoded]
+    if not changed and not removed:
+        return []
+
+    conn.executemany(
+        'INSERT OR REPLACE INTO minisite_sections (user_id, section, data) VALUES (?, ?, ?)',
+        [(user_id, section, encoded[section]) for section in changed]
+    )
+    conn.executemany(
+        'DELETE FROM minisite_sections WHERE user_id = ? AND section = ?',
+        [(user_id, section) for section in removed]
+    )
+    conn.execute('''
+        INSERT INTO minisites (user_id) VALUES (?)
+        ON CONFLICT (user_id) DO UPDATE SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+    ''', (user_id,))
+    return changed + removed
+
+
+def patch_minisite(conn, user_id: int, patch: dict, validate) -> tuple:
+    """Merge-patch a stored mini-site; returns (document, changed sections).
+
+    validate(document) -> document checks the patched result (and may fill
+    defaults) before anything is written; the read-merge-write runs under the
+    write lock so concurrent patches cannot drop each other's changes.
+    """
+    if not conn.in_transaction:
+        conn.execute('BEGIN IMMEDIATE')
+    current = load_minisite(conn, user_id) or {}
+    document = validate(merge_patch(current, patch))
+    return document, write_minisite(conn, user_id, document)
+
+
+def delete_minisite(conn, user_id: int) -> bool:
+    """Remove a user's mini-site; returns whether one existed.
+
+    The minisites row stays behind with a bumped version, so a mini-site
+    created again later never reuses the revision of an older one.
+    """
+    deleted = conn.execute('DELETE FROM minisite_sections WHERE user_id = ?', (user_id,)).rowcount
+    if deleted:
+        conn.execute(
+            'UPDATE minisites SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE user_id = ?',
+            (user_id,)
+        )
+    return deleted > 0
+
+
+def touch_minisite(conn, user_id: int):
+    """Bump a mini-site's revision when something it renders changed outside its sections"""
+    conn.execute(
+        'UPDATE minisites SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE user_id = ?',
+        (user_id,)
+    )
+
+
+def minisite_revision(conn, user_id: int):
+    """(user_type, version, updated_at) of a user's mini-site, or None for unknown users.
+
+    version and updated_at are NULL when the user never saved a mini-site.
+    Two primary-key lookups: cheap enough to validate a cached rendering
+    on every request.
+    """
+    return conn.execute('''
+        SELECT u.user_type, m.version, m.updated_at FROM users u
+        LEFT JOIN minisites m ON m.user_id = u.id
+        WHERE u.id = ?
+    ''', (user_id,)).fetchone()
+
+
+def public_minisite_document(conn, user_id: int) -> dict:
+    """Public mini-site document of an exhibitor or partner"""
+    user_data = dict(conn.execute(
+        'SELECT id, email, first_name, last_name, company, phone FROM users WHERE id = ?',
+        (user_id,)
+    ).fetchone())
+
+    enhanced_data = load_minisite(conn, user_id)
+    products = [dict(product) for product in DEMO_PRODUCTS]
+
+    # Build response with enhanced data if available, fallback to basic data
+    if enhanced_data:
+        enhanced_data['products'] = products
+        # Responsive variants of the uploaded logo, cover and gallery images, by original URL
+        media = media_references(conn, enhanced_data)
+        if media:
+            enhanced_data['media'] = media
+        response_data = enhanced_data
+    else:
+        response_data = {
+            "name": user_data.get('company') or f"{user_data.get('first_name', '')} {user_data.get('last_name', '')}".strip(),
+            "tagline": 'Expert du secteur maritime',
+            "category": 'Professionnel Maritime',
+            "icon": '⚓',
+            "description": 'Professionnel expérimenté dans le secteur maritime.',
+            "email": user_data.get('email', ''),
+            "phone": user_data.get('phone', ''),
+            "products": products,
+            "contacts": {
+                "general": {
+                    "name": f"{user_data.get('first_name', '')} {user_data.get('last_name', '')}".strip(),
+                    "email": user_data.get('email', ''),
+                    "phone": user_data.get('phone') or 'Non renseigné'
+                }
+            }
+        }
+
+    return response_data
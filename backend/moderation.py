@@ -0,0 +1,208 @@
+"""
+User Moderation for SIPORTS v2.0
+Paginated moderation queue and bulk validation/rejection in a single transaction
+"""
+
+import os
+import json
+import base64
+import logging
+from datetime import timezone
+
+logger = logging.getLogger(__name__)
+
+# Largest number of accounts a single bulk request may moderate
+MODERATION_MAX_USERS = int(os.environ.get('MODERATION_MAX_USERS', 10000))
+
+# SQLite host parameter limit is 999 on older builds
+SQL_CHUNK_SIZE = 500
+
+# Moderation action -> resulting account status
+ACTION_STATUSES = {'validate': 'validated', 'reject': 'rejected'}
+
+# Columns listed in the moderation queue
+QUEUE_COLUMNS = ('id', 'email', 'first_name', 'last_name', 'company', 'user_type',
+                 'visitor_package', 'partnership_package', 'created_at')
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def utc_timestamp(value) -> str:
+    """created_at text of a datetime: aware values are converted to UTC, naive ones taken as UTC"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime(TIMESTAMP_FORMAT)
+
+
+def chunks(items: list, size: int = SQL_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def filter_clauses(status='pending', user_type=None, visitor_package=None, partnership_package=None,
+                   created_after=None, created_before=None) -> tuple:
+    """WHERE clauses and parameters of a moderation filter (dates are datetimes)"""
+    clauses, params = [], []
+    for column, value in (('status', status), ('user_type', user_type),
+                          ('visitor_package', visitor_package), ('partnership_package', partnership_package)):
+        if value is not None:
+            clauses.append(f'{column} = ?')
+            params.append(value)
+    # created_at holds CURRENT_TIMESTAMP text (UTC), which sorts chronologically
+    if created_after is not None:
+        clauses.append('created_at >= ?')
+        params.append(utc_timestamp(created_after))
+    if created_before is not None:
+        clauses.append('created_at < ?')
+        params.append(utc_timestamp(created_before))
+    return clauses, params
+
+
+def select_user_ids(conn, limit=MODERATION_MAX_USERS, **filters) -> list:
+    """Ids of the accounts matching a moderation filter, oldest first"""
+    clauses, params = filter_clauses(**filters)
+    # Administrators are never moderated in bulk
+    clauses.append("user_type != 'admin'")
+
+    rows = conn.execute(f'''
+        SELECT id FROM users WHERE {' AND '.join(clauses)}
+        ORDER BY created_at, id LIMIT ?
+    ''', params + [limit]).fetchall()
+    return [row[0] for row in rows]
+
+
+def encode_queue_cursor(created_at: str, user_id: int) -> str:
+    """Opaque cursor for the last account of a queue page"""
+    return base64.urlsafe_b64encode(json.dumps([created_at, user_id]).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_queue_cursor(cursor: str) -> tuple:
+    """(created_at, id) encoded by encode_queue_cursor(); raises ValueError for malformed cursors"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"invalid cursor: {cursor!r}") from e
+    if (not isinstance(key, list) or len(key) != 2 or not isinstance(key[0], str)
+            or not isinstance(key[1], int) or isinstance(key[1], bool)):
+        raise ValueError(f"invalid cursor: {cursor!r}")
+    return tuple(key)
+
+
+def queue_page(conn, after=None, limit=50, columns=QUEUE_COLUMNS, **filters) -> tuple:
+    """Newest-first page of the accounts matching a filter, and the cursor of the next page.
+
+    Keyset pagination on (created_at, id): each page is a range scan of the
+    (status, created_at) index starting right after the previous page, so
+    deep pages cost the same as the first one.
+    """
+    clauses, params = filter_clauses(**filters)
+    if after is not None:
+        clauses.append('(created_at, id) < (?, ?)')
+        params.extend(after)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+
+    rows = conn.execute(f'''
+        SELECT {', '.join(columns)} FROM users {where}
+        ORDER BY created_at DESC, id DESC LIMIT ?
+    ''', params + [limit + 1]).fetchall()
+    users = [dict(row) for row in rows[:limit]]
+    next_cursor = encode_queue_cursor(users[-1]['created_at'], users[-1]['id']) if len(rows) > limit else None
+    return users, next_cursor
+
+
+def count_users(conn, status='pending', user_type=None, **filters) -> int:
+    """Number of accounts matching a filter"""
+    if all(value is None for value in filters.values()):
+        # Status and user type alone are answered by the trigger-maintained counters
+        clauses, params = filter_clauses(status=status, user_type=user_type)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return conn.execute(f'SELECT COALESCE(SUM(count), 0) FROM user_counters {where}', params).fetchone()[0]
+
+    clauses, params = filter_clauses(status=status, user_type=user_type, **filters)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    return conn.execute(f'SELECT COUNT(*) FROM users {where}', params).fetchone()[0]
+
+
+def moderate_users(conn, action: str, user_ids=(), filters: dict = None, touch_updated_at: bool = False) -> tuple:
+    """Apply a moderation action to explicit ids and/or the accounts matching a filter.
+
+    Targets are resolved, current statuses read and the changed rows written
+    with one executemany inside a single write transaction, so the user
+    counter triggers and the other workers see the whole batch or none of it.
+    At most MODERATION_MAX_USERS accounts are processed per call. Returns
+    (results, remaining): results maps each processed id to 'validated' |
+    'rejected' | 'unchanged' | 'not_found' | 'skipped', and remaining counts
+    the accounts left out by that limit which the same request would still
+    change.
+    """
+    new_status = ACTION_STATUSES[action]
+
+    if not conn.in_transaction:
+        # Take the write lock up front: targets and statuses read below must not change before the update
+        conn.execute('BEGIN IMMEDIATE')
+
+    user_ids = list(user_ids)
+    if filters is not None:
+        # One more than the limit, to tell whether the filter was cut short
+        user_ids.extend(select_user_ids(conn, limit=MODERATION_MAX_USERS + 1, **filters))
+    user_ids = list(dict.fromkeys(user_ids))
+    truncated = len(user_ids) > MODERATION_MAX_USERS
+    user_ids = user_ids[:MODERATION_MAX_USERS]
+
+    current = {}
+    for chunk in chunks(user_ids):
+        rows = conn.execute(
+            f"SELECT id, user_type, status FROM users WHERE id IN ({', '.join('?' * len(chunk))})",
+            chunk
+        ).fetchall()
+        current.update((row[0], (row[1], row[2])) for row in rows)
+
+    results = {}
+    for user_id in user_ids:
+        if user_id not in current:
+            results[user_id] = 'not_found'
+        elif current[user_id][0] == 'admin':
+            results[user_id] = 'skipped'
+        elif current[user_id][1] == new_status:
+            results[user_id] = 'unchanged'
+        else:
+            results[user_id] = new_status
+
+    changed = [(new_status, user_id) for user_id, result in results.items() if result == new_status]
+    if touch_updated_at:
+        query = 'UPDATE users SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?'
+    else:
+        query = 'UPDATE users SET status = ? WHERE id = ?'
+    conn.executemany(query, changed)
+
+    remaining = 0
+    if truncated and filters is not None:
+        # Accounts still matching the filter that this action would change
+        clauses, params = filter_clauses(**filters)
+        clauses.extend(["user_type != 'admin'", 'status != ?'])
+        remaining = conn.execute(
+            f"SELECT COUNT(*) FROM users WHERE {' AND '.join(clauses)}", params + [new_status]
+        ).fetchone()[0]
+
+    logger.info(f"Bulk moderation: {len(changed)} users {new_status}, {len(user_ids) - len(changed)} unchanged, "
+                f"{remaining} left over the limit")
+    return results, remaining
+
+
+def changed_ids(results: dict) -> list:
+    """Ids whose status was actually changed by moderate_users()"""
+    return [user_id for user_id, result in results.items() if result in ACTION_STATUSES.values()]
+
+
+def moderation_summary(results: dict, remaining: int = 0) -> dict:
+    """Bulk moderation response: per-id results, totals and what the limit left out"""
+    counts = {}
+    for result in results.values():
+        counts[result] = counts.get(result, 0) + 1
+    return {
+        "results": [{"id": user_id, "result": result} for user_id, result in results.items()],
+        "counts": counts,
+        # Matching accounts beyond MODERATION_MAX_USERS: send the request again to process them
+        "truncated": remaining > 0,
+        "remaining": remaining
+    }
@@ -0,0 +1,496 @@
+"""
+Networking Profile Index for SIPORTS v2.0
+In-memory index of validated attendees with precomputed features and top-K matching
+"""
+
+import os
+import json
+import time
+import base64
+import heapq
+import random
+import bisect
+import threading
+import logging
+
+from search_index import SearchIndex
+
+logger = logging.getLogger(__name__)
+
+# Seconds before the index is reloaded from the database (picks up other workers' writes)
+NETWORKING_INDEX_TTL = int(os.environ.get('NETWORKING_INDEX_TTL', 300))
+
+# Extended profile attributes, precomputed per user in user_profiles
+ENRICHMENT_FIELDS = ('title', 'sector', 'location', 'description', 'interests', 'languages',
+                     'budget', 'business_potential', 'affinity')
+
+# Rows loaded into the index: the user, its extended profile and the mini-site content used by search
+PROFILE_QUERY = '''
+    SELECT u.id, u.email, u.first_name, u.last_name, u.company, u.user_type,
+           u.visitor_package, u.partnership_package, u.status, u.created_at,
+           (SELECT json_group_object(s.section, json(s.data)) FROM minisite_sections s
+            WHERE s.user_id = u.id) AS enhanced_minisite_data,
+           p.title, p.sector, p.location, p.description, p.interests, p.languages,
+           p.budget, p.business_potential, p.affinity
+    FROM users u
+    LEFT JOIN user_profiles p ON p.user_id = u.id
+'''
+
+# Mini-site fields that are not searchable prose
+MINISITE_SKIPPED_KEYS = {'logo', 'coverImage', 'icon', 'email', 'phone', 'website', 'contacts', 'social', 'gallery', 'image', 'photo', 'url'}
+
+# Demonstration vocabularies used to enrich new profiles
+TITLES = {
+    'visitor': ['Directeur Général', 'Directeur Innovation', 'Chef de Projet'],
+    'exhibitor': ['CTO', 'VP Sales', 'Business Development Manager'],
+    'partner': ['CEO', 'VP Partnerships', 'Chief Innovation Officer']
+}
+SECTORS = {
+    'visitor': ['Gestion Portuaire', 'Logistique Maritime', 'Transport Maritime'],
+    'exhibitor': ['Technologies Marines', 'Equipment Portuaire', 'Solutions IoT'],
+    'partner': ['Innovation Maritime', 'Investissement Tech', 'Consulting Maritime']
+}
+LOCATIONS = ['Paris, France', 'Rotterdam, Pays-Bas', 'Singapour', 'Dubaï, EAU', 'Hambourg, Allemagne']
+DESCRIPTIONS = {
+    'visitor': 'Dirigeant expérimenté dans la modernisation des infrastructures maritimes avec focus sur l\'innovation et la durabilité.',
+    'exhibitor': 'Expert en solutions technologiques pour l\'industrie maritime, spécialisé dans l\'IoT et l\'automatisation portuaire.',
+    'partner': 'Leader de l\'innovation maritime, spécialisé dans les partenariats technologiques stratégiques et les investissements.'
+}
+INTERESTS = {
+    'visitor': ['Digital Transformation', 'Port Automation', 'Sustainability', 'Smart Logistics'],
+    'exhibitor': ['IoT Maritime', 'AI & ML', 'Blockchain', 'Green Technology'],
+    'partner': ['Innovation', 'Strategic Partnerships', 'Investment', 'Market Expansion']
+}
+LANGUAGES = ['Français', 'Anglais']
+BUDGETS = ['0-50k', '50k-200k', '200k-1M', '1M+']
+BUSINESS_POTENTIALS = ['Élevé', 'Très élevé', 'Exceptionnel', 'Modéré']
+
+# Filters pushed down to posting sets: filter name -> profile field
+FILTER_FIELDS = {'sector': 'sector', 'location': 'location', 'language': 'languages', 'budget': 'budget'}
+
+COMPATIBILITY_BASE = 75
+COMPATIBILITY_MIN = 60
+COMPATIBILITY_MAX = 100
+USER_TYPE_SYNERGY = 15
+
+
+def generate_enrichment(user_id: int, user_type: str) -> dict:
+    """Extended profile attributes for a user.
+
+    Drawn from a generator seeded with the user id, so enrichment is
+    deterministic and can be recomputed or backfilled at any time.
+    """
+    rng = random.Random(user_id)
+    return {
+        'title': rng.choice(TITLES.get(user_type, ['Manager'])),
+        'sector': rng.choice(SECTORS.get(user_type, ['Maritime'])),
+        'location': rng.choice(LOCATIONS),
+        'description': DESCRIPTIONS.get(user_type, 'Professionnel du secteur maritime.'),
+        'interests': list(INTERESTS.get(user_type, ['Maritime', 'Innovation'])),
+        'languages': list(LANGUAGES),
+        'budget': rng.choice(BUDGETS),
+        'business_potential': rng.choice(BUSINESS_POTENTIALS),
+        'affinity': rng.randint(-10, 20)
+    }
+
+
+def enrich_profiles(conn, user_ids=None) -> int:
+    """Store the extended profile of users that do not have one yet; returns how many were added"""
+    query = '''
+        SELECT u.id, u.user_type FROM users u
+        LEFT JOIN user_profiles p ON p.user_id = u.id
+        WHERE p.user_id IS NULL
+    '''
+    params = []
+    if user_ids is not None:
+        if not user_ids:
+            return 0
+        query += f" AND u.id IN ({', '.join('?' * len(user_ids))})"
+        params = list(user_ids)
+
+    missing = conn.execute(query, params).fetchall()
+    records = []
+    for user_id, user_type in missing:
+        enrichment = generate_enrichment(user_id, user_type)
+        enrichment['interests'] = json.dumps(enrichment['interests'], ensure_ascii=False)
+        enrichment['languages'] = json.dumps(enrichment['languages'], ensure_ascii=False)
+        records.append((user_id,) + tuple(enrichment[field] for field in ENRICHMENT_FIELDS))
+
+    conn.executemany(
+        f'''INSERT OR IGNORE INTO user_profiles (user_id, {', '.join(ENRICHMENT_FIELDS)})
+            VALUES ({', '.join('?' * (len(ENRICHMENT_FIELDS) + 1))})''',
+        records
+    )
+    return len(records)
+
+
+def build_profile(row: dict) -> dict:
+    """Enhanced networking profile from a PROFILE_QUERY row"""
+    row = {key: value for key, value in row.items() if key != 'enhanced_minisite_data'}
+    extended = {field: row.pop(field, None) for field in ENRICHMENT_FIELDS}
+    if extended['affinity'] is None:
+        # Not enriched yet (user created since the last enrichment pass)
+        extended = generate_enrichment(row['id'], row['user_type'])
+    else:
+        extended['interests'] = json.loads(extended['interests'] or '[]')
+        extended['languages'] = json.loads(extended['languages'] or '[]')
+
+    return {
+        **row,
+        'name': f"{row['first_name']} {row['last_name']}",
+        'title': extended['title'],
+        'sector': extended['sector'],
+        'location': extended['location'],
+        'description': extended['description'],
+        'interests': extended['interests'],
+        'languages': extended['languages'],
+        'budget': extended['budget'],
+        'availability': {
+            'status': 'Disponible',
+            'preferred_slots': ['09:00-12:00', '14:00-17:00']
+        },
+        'business_potential': extended['business_potential'],
+        'affinity': extended['affinity'],
+        'connection_status': 'not_connected'
+    }
+
+
+def user_type_synergy(viewer_type: str, profile_type: str) -> int:
+    """Bonus for complementary attendee types (visitors meet exhibitors/partners)"""
+    if viewer_type == 'visitor' and profile_type in ('exhibitor', 'partner'):
+        return USER_TYPE_SYNERGY
+    if viewer_type in ('exhibitor', 'partner') and profile_type == 'visitor':
+        return USER_TYPE_SYNERGY
+    return 0
+
+
+def compatibility_score(synergy: int, affinity: int) -> int:
+    """Compatibility percentage from the type synergy and the profile's affinity"""
+    return min(COMPATIBILITY_MAX, max(COMPATIBILITY_MIN, COMPATIBILITY_BASE + synergy + affinity))
+
+
+def filter_keys(field: str, value) -> list:
+    """Normalised posting keys for a profile value (locations match on city or country)"""
+    values = value if isinstance(value, list) else [value]
+    keys = set()
+    for item in values:
+        if not item:
+            continue
+        item = str(item).casefold().strip()
+        keys.add(item)
+        if field == 'location':
+            keys.update(part.strip() for part in item.split(','))
+    return list(keys)
+
+
+def minisite_text(minisite_json) -> str:
+    """Searchable text of a stored enhanced mini-site (names, taglines, descriptions...)"""
+    if not minisite_json:
+        return ''
+    try:
+        data = json.loads(minisite_json)
+    except (TypeError, ValueError):
+        return ''
+
+    parts = []
+
+    def collect(value):
+        if isinstance(value, str):
+            parts.append(value)
+        elif isinstance(value, list):
+            for item in value:
+                collect(item)
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                if key not in MINISITE_SKIPPED_KEYS:
+                    collect(item)
+
+    collect(data)
+    return ' '.join(parts)
+
+
+def search_document(profile: dict, minisite_json=None) -> str:
+    """Text indexed for a profile: its networking attributes and its mini-site content"""
+    return ' '.join([
+        profile['name'], profile.get('company') or '', profile['title'], profile['sector'],
+        profile['description'], ' '.join(profile['interests']), minisite_text(minisite_json)
+    ])
+
+
+def encode_cursor(key) -> str:
+    """Opaque pagination cursor for the sort key of the last profile of a page"""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Sort key encoded by encode_cursor(); raises ValueError for malformed cursors"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"invalid cursor: {cursor!r}") from e
+    if (not isinstance(key, list) or len(key) != 3
+            or not all(isinstance(part, (int, float)) and not isinstance(part, bool) for part in key)
+            or not isinstance(key[2], int)):
+        raise ValueError(f"invalid cursor: {cursor!r}")
+    return tuple(key)
+
+
+def bisect_after(entries, key, sort_key) -> int:
+    """Index of the first entry whose sort_key(entry) is greater than key (entries sorted on it)"""
+    low, high = 0, len(entries)
+    while low < high:
+        middle = (low + high) // 2
+        if sort_key(entries[middle]) <= key:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+class ProfileIndex:
+    """Validated attendee profiles indexed for match queries.
+
+    Every profile is listed, in descending affinity order, under its user type
+    and under each (user type, filter, value) it matches. For a given viewer the
+    compatibility score only depends on the user type and the affinity, so each
+    list is already ranked: a query merges the lists of the requested types for
+    its most selective filter with a heap, checks the other filters against
+    posting sets, and stops after the first K hits.
+
+    Results are totally ordered by a sort key (compatibility, then affinity,
+    then id; relevance first for searches), so pages resume strictly after the
+    key of the previous page's last profile (keyset pagination).
+    """
+
+    def __init__(self, ttl=NETWORKING_INDEX_TTL):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._profiles = {}
+        self._ranked = {}
+        self._postings = {}
+        self._search = SearchIndex()
+        self._loaded_at = None
+        # Bumped on every change, so callers can key cached query results on it
+        self.version = 0
+
+    # Maintenance
+
+    def is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+
+    def load(self, rows):
+        """Replace the index contents with the given validated users rows"""
+        # Build off to the side so queries keep using the previous snapshot meanwhile
+        fresh = ProfileIndex(self.ttl)
+        for row in rows:
+            row = dict(row)
+            fresh._add(build_profile(row), row.get('enhanced_minisite_data'), keep_sorted=False)
+        for entries in fresh._ranked.values():
+            entries.sort()
+
+        with self._lock:
+            self._profiles = fresh._profiles
+            self._ranked = fresh._ranked
+            self._postings = fresh._postings
+            self._search = fresh._search
+            self._loaded_at = time.monotonic()
+            self.version += 1
+        logger.info(f"Networking profile index loaded ({len(self._profiles)} profiles)")
+
+    def refresh(self, conn):
+        """Reload the index from the database if it is stale (one reload at a time)"""
+        with self._refresh_lock:
+            if not self.is_stale():
+                return
+            enrich_profiles(conn)
+            rows = conn.execute(f"{PROFILE_QUERY} WHERE u.status = 'validated'").fetchall()
+            self.load(rows)
+
+    def upsert(self, row):
+        """Add or update one user; users that are not validated are removed"""
+        row = dict(row)
+        with self._lock:
+            self._remove(row['id'])
+            if row.get('status') == 'validated':
+                self._add(build_profile(row), row.get('enhanced_minisite_data'))
+            self.version += 1
+
+    def remove(self, user_id: int):
+        """Drop one user from the index"""
+        with self._lock:
+            self._remove(user_id)
+            self.version += 1
+
+    def _list_keys(self, profile):
+        """(user type, filter, value) keys of the ranked lists a profile belongs to"""
+        keys = [(profile['user_type'], None, None)]
+        for name, field in FILTER_FIELDS.items():
+            for value in filter_keys(name, profile[field]):
+                keys.append((profile['user_type'], name, value))
+        return keys
+
+    def _add(self, profile, minisite_json=None, keep_sorted=True):
+        user_id = profile['id']
+        entry = (-profile['affinity'], user_id)
+        self._profiles[user_id] = profile
+        for key in self._list_keys(profile):
+            entries = self._ranked.setdefault(key, [])
+            if keep_sorted:
+                bisect.insort(entries, entry)
+            else:
+                entries.append(entry)
+            if key[1] is not None:
+                self._postings.setdefault(key[1:], set()).add(user_id)
+        self._search.add(user_id, search_document(profile, minisite_json))
+
+    def _remove(self, user_id):
+        profile = self._profiles.pop(user_id, None)
+        if profile is None:
+            return
+        entry = (-profile['affinity'], user_id)
+        for key in self._list_keys(profile):
+            entries = self._ranked.get(key, [])
+            position = bisect.bisect_left(entries, entry)
+            if position < len(entries) and entries[position] == entry:
+                del entries[position]
+            if key[1] is not None:
+                self._postings.get(key[1:], set()).discard(user_id)
+        self._search.remove(user_id)
+
+    def __len__(self):
+        return len(self._profiles)
+
+    # Queries
+
+    def get_profile(self, user_id: int):
+        """Indexed profile of a validated user (a copy), or None"""
+        profile = self._profiles.get(user_id)
+        return dict(profile) if profile is not None else None
+
+    def query(self, viewer: dict, match_type='all', sector='all', location='all', language='all',
+              budget='all', compatibility_min=0, search_query=None, relevance=None, limit=20) -> list:
+        """Top profiles for a viewer: best compatibility first, or most relevant for a search"""
+        profiles, _ = self.query_page(viewer, match_type, sector, location, language, budget,
+                                      compatibility_min, search_query, relevance, limit=limit)
+        return profiles
+
+    def query_page(self, viewer: dict, match_type='all', sector='all', location='all', language='all',
+                   budget='all', compatibility_min=0, search_query=None, relevance=None, after=None,
+                   limit=20) -> tuple:
+        """One page of matching profiles and the sort key to resume after (None on the last page).
+
+        Search relevance is BM25 over the profile and mini-site text unless the
+        caller supplies its own {user_id: relevance} scores (e.g. embeddings).
+        """
+        user_types = self._user_types(match_type)
+        filters = [
+            (name, str(value).casefold().strip())
+            for name, value in (('sector', sector), ('location', location), ('language', language), ('budget', budget))
+            if value and value != 'all'
+        ]
+
+        with self._lock:
+            # Most selective filter first
+            filters.sort(key=lambda f: len(self._postings.get(f, ())))
+            # One extra hit tells whether there is a next page
+            if search_query:
+                if relevance is None:
+                    relevance = self._search.scores(search_query)
+                ranked = self._search_ranked(viewer, user_types, filters, compatibility_min, relevance, after, limit + 1)
+            else:
+                ranked = self._compatibility_ranked(viewer, user_types, filters, compatibility_min, after, limit + 1)
+
+            results = []
+            for user_id, score, semantic_score, _ in ranked[:limit]:
+                profile = dict(self._profiles[user_id])
+                del profile['affinity']
+                profile['compatibility'] = score
+                if search_query:
+                    profile['semantic_score'] = round(semantic_score, 3)
+                results.append(profile)
+
+        next_key = ranked[limit - 1][3] if len(ranked) > limit else None
+        return results, next_key
+
+    def iter_query(self, viewer: dict, match_type='all', sector='all', location='all', language='all',
+                   budget='all', compatibility_min=0, search_query=None, relevance=None, after=None,
+                   chunk_size=100):
+        """Every matching profile in rank order, fetched a page at a time.
+
+        The lock is only held while a page is computed, and each page resumes
+        from the previous one's sort key, so profiles updated meanwhile are
+        neither repeated nor skipped and at most one page is in memory.
+        """
+        if search_query and relevance is None:
+            with self._lock:
+                relevance = self._search.scores(search_query)
+        while True:
+            profiles, after = self.query_page(viewer, match_type, sector, location, language, budget,
+                                              compatibility_min, search_query, relevance, after, chunk_size)
+            yield from profiles
+            if after is None:
+                return
+
+    @staticmethod
+    def _user_types(match_type):
+        if match_type == 'all':
+            return ('visitor', 'exhibitor', 'partner')
+        if match_type == 'partner':
+            return ('exhibitor', 'partner')
+        return (match_type,)
+
+    def _compatibility_ranked(self, viewer, user_types, filters, compatibility_min, after, limit):
+        """Top K by compatibility: merge the lists of the most selective filter, check the others"""
+        driver = filters[0] if filters else (None, None)
+        others = [self._postings.get(f, set()) for f in filters[1:]]
+        ranked = []
+        for key, user_id in self._ranked_stream(viewer, user_types, driver, after):
+            score = -key[0]
+            if score < compatibility_min or len(ranked) >= limit:
+                break
+            if user_id == viewer['id'] or not all(user_id in posting for posting in others):
+                continue
+            ranked.append((user_id, score, None, key))
+        return ranked
+
+    def _search_ranked(self, viewer, user_types, filters, compatibility_min, relevance, after, limit):
+        """Top K by relevance (then compatibility) among the profiles matching the filters"""
+        postings = [self._postings.get(f, set()) for f in filters]
+        viewer_type = viewer.get('user_type')
+        candidates = []
+        for user_id, user_relevance in relevance.items():
+            profile = self._profiles.get(user_id)
+            if profile is None or user_id == viewer['id'] or profile['user_type'] not in user_types:
+                continue
+            if not all(user_id in posting for posting in postings):
+                continue
+            score = compatibility_score(user_type_synergy(viewer_type, profile['user_type']), profile['affinity'])
+            key = (-user_relevance, -score, user_id)
+            if score >= compatibility_min and (after is None or key > after):
+                candidates.append((user_id, score, user_relevance, key))
+        return heapq.nsmallest(limit, candidates, key=lambda c: c[3])
+
+    def _ranked_stream(self, viewer, user_types, driver, after=None):
+        """Lazy (sort key, id) stream in rank order: a k-way merge of the per-type lists.
+
+        The sort key is (-compatibility, -affinity, id); each list is already
+        in that order, so resuming after a key is a binary search per list.
+        """
+        def stream(user_type):
+            synergy = user_type_synergy(viewer.get('user_type'), user_type)
+
+            def sort_key(entry):
+                neg_affinity, user_id = entry
+                return (-compatibility_score(synergy, -neg_affinity), neg_affinity, user_id)
+
+            entries = self._ranked.get((user_type,) + driver, [])
+            start = bisect_after(entries, after, sort_key) if after is not None else 0
+            for position in range(start, len(entries)):
+                yield sort_key(entries[position]), entries[position][1]
+
+        return heapq.merge(*(stream(user_type) for user_type in user_types))
+
+
+# Global networking profile index instance
+profile_index = ProfileIndex()
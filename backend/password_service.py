@@ -0,0 +1,77 @@
+"""
+Password Hashing Service for SIPORTS v2.0
+Runs password hashing on a bounded worker pool with a configurable cost
+"""
+
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 600000))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+PASSWORD_HASH_EXECUTOR = os.environ.get('PASSWORD_HASH_EXECUTOR', 'thread')
+
+
+class PasswordHasher:
+    """Hash and verify passwords off the event loop.
+
+    PBKDF2/scrypt are CPU-bound by design. hashlib releases the GIL while it
+    runs, so a small thread pool is enough to keep async handlers responsive;
+    a process pool can be selected with PASSWORD_HASH_EXECUTOR=process.
+    """
+
+    def __init__(self, method=PASSWORD_HASH_METHOD, iterations=PASSWORD_HASH_ITERATIONS,
+                 max_workers=PASSWORD_HASH_WORKERS, executor_type=PASSWORD_HASH_EXECUTOR):
+        # werkzeug stores the full method (including the cost) as the hash prefix
+        if method.startswith('pbkdf2') and method.count(':') == 1:
+            method = f"{method}:{iterations}"
+        self.method = method
+        self.max_workers = max_workers
+        self.executor_type = executor_type
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.executor_type == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='siports-hash')
+            logger.info(f"Password hashing pool started ({self.executor_type}, {self.max_workers} workers, {self.method})")
+        return self._executor
+
+    def hash_sync(self, password: str) -> str:
+        """Hash a password on the calling thread (startup/CLI use)"""
+        return generate_password_hash(password, method=self.method)
+
+    async def hash(self, password: str) -> str:
+        """Hash a password on the worker pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), generate_password_hash, password, self.method)
+
+    async def verify(self, password_hash: str, password: str) -> bool:
+        """Check a password against its hash on the worker pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """True if a werkzeug hash was produced with a different method or cost"""
+        if '$' not in password_hash:
+            # Not a werkzeug hash (e.g. the 'wp_auth' placeholder)
+            return False
+        return password_hash.split('$', 1)[0] != self.method
+
+    def shutdown(self):
+        """Stop the worker pool (application shutdown)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+# Global password hashing service instance
+password_hasher = PasswordHasher()
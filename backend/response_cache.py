@@ -0,0 +1,121 @@
+"""
+Chatbot Response Cache for SIPORTS v2.0
+Answers to repeated questions, keyed by context and normalised message, with optional near-duplicate lookup
+"""
+
+import os
+import math
+import threading
+import logging
+from collections import OrderedDict
+
+from auth_cache import TTLCache
+from search_index import hashed_features
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+CHAT_CACHE_MAX_ENTRIES = int(os.environ.get('CHAT_CACHE_MAX_ENTRIES', 5000))
+CHAT_CACHE_TTL = int(os.environ.get('CHAT_CACHE_TTL', 3600))
+# Cosine similarity from which a different wording reuses a cached answer (0 disables the lookup)
+CHAT_CACHE_SIMILARITY = float(os.environ.get('CHAT_CACHE_SIMILARITY', 0))
+# Most recent cached questions compared per context in the near-duplicate lookup
+CHAT_CACHE_SIMILAR_CANDIDATES = int(os.environ.get('CHAT_CACHE_SIMILAR_CANDIDATES', 256))
+
+
+def normalize_message(message: str) -> str:
+    """Lowercase message with whitespace collapsed ('  Prix des  FORFAITS ?' -> 'prix des forfaits ?').
+
+    Accents and punctuation are kept: the keyword matchers compare them
+    literally, so folding them would give two differently answered messages
+    the same key.
+    """
+    return ' '.join(message.lower().split())
+
+
+def unit_features(message: str) -> dict:
+    """Hashed term vector of a message, scaled to unit length"""
+    features = hashed_features(message)
+    norm = math.sqrt(sum(value * value for value in features.values()))
+    return {index: value / norm for index, value in features.items()} if norm else {}
+
+
+class ResponseCache:
+    """TTL-bounded LRU cache of chatbot answers.
+
+    Keys are (context, normalised message), so questions differing only in
+    case or spacing share an answer. With a similarity
+    threshold, an exact miss is also compared to the recent questions of the
+    same context and reuses the answer of the closest one above it.
+    """
+
+    def __init__(self, maxsize=CHAT_CACHE_MAX_ENTRIES, ttl=CHAT_CACHE_TTL,
+                 similarity=CHAT_CACHE_SIMILARITY, candidates=CHAT_CACHE_SIMILAR_CANDIDATES):
+        self.entries = TTLCache(maxsize, ttl)
+        self.similarity = similarity
+        self.candidates = candidates
+        self._vectors = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    def _similar(self, context: str, message: str):
+        """Cached answer of the closest recent question, or None below the threshold"""
+        query = unit_features(message)
+        if not query:
+            return None
+        with self._lock:
+            vectors = list(self._vectors.get(context, {}).items())
+
+        best_key, best_score = None, self.similarity
+        for key, vector in vectors:
+            score = sum(value * vector.get(index, 0.0) for index, value in query.items())
+            if score >= best_score:
+                best_key, best_score = key, score
+        return self.entries.get((context, best_key)) if best_key is not None else None
+
+    def get(self, context: str, message: str):
+        """Cached answer to a message in a context, or None"""
+        value = self.entries.get((context, normalize_message(message)))
+        if value is not None:
+            self.hits += 1
+            return value
+        if self.similarity > 0:
+            value = self._similar(context, message)
+            if value is not None:
+                self.similar_hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def set(self, context: str, message: str, value):
+        """Cache the answer to a message in a context"""
+        key = normalize_message(message)
+        if not key:
+            return
+        self.entries.set((context, key), value)
+        if self.similarity > 0:
+            vector = unit_features(message)
+            with self._lock:
+                vectors = self._vectors.setdefault(context, OrderedDict())
+                vectors[key] = vector
+                vectors.move_to_end(key)
+                while len(vectors) > self.candidates:
+                    vectors.popitem(last=False)
+
+    def clear(self):
+        """Drop every cached answer (knowledge base or model change)"""
+        self.entries.clear()
+        with self._lock:
+            self._vectors.clear()
+
+    def get_stats(self) -> dict:
+        """Hit/miss counters for monitoring"""
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "similarity": self.similarity
+        }
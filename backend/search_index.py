@@ -0,0 +1,124 @@
+"""
+Full-Text Search Index for SIPORTS v2.0
+Accent-folded French/English tokenizer and an incremental BM25 inverted index
+"""
+
+import os
+import re
+import zlib
+import math
+import heapq
+import unicodedata
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Hashed term space of the profile embeddings and chatbot response cache
+EMBEDDING_HASH_FEATURES = int(os.environ.get('EMBEDDING_HASH_FEATURES', 2 ** 15))
+STEM_LENGTH = 5
+
+STOPWORDS = frozenset("""
+    a au aux avec ce ces cette d dans de des du elle en et est il ils j l la le les leur leurs
+    lui m ma mais me mes mon n ne nos notre nous on ou par pas pour qu que qui s sa se ses son
+    sur t ta te tes ton tu un une vos votre vous y
+    an and are as at be by for from has have in into is it its of on or that the their this to
+    was we were will with you your
+""".split())
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip accents ('Équipement' -> 'equipement')"""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text: str) -> list:
+    """Accent-folded word tokens without French/English stopwords"""
+    if not text:
+        return []
+    return [token for token in TOKEN_PATTERN.findall(fold(text)) if token not in STOPWORDS]
+
+
+def hashed_features(text: str, n_features: int = EMBEDDING_HASH_FEATURES) -> dict:
+    """Signed hashed counts of word unigrams, bigrams and 5-letter stems"""
+    tokens = tokenize(text)
+    terms = list(tokens)
+    terms.extend(token[:STEM_LENGTH] + '~' for token in tokens if len(token) > STEM_LENGTH)
+    terms.extend(f"{first} {second}" for first, second in zip(tokens, tokens[1:]))
+
+    features = {}
+    for term in terms:
+        digest = zlib.crc32(term.encode('utf-8'))
+        index = digest % n_features
+        sign = 1.0 if digest & 0x80000000 else -1.0
+        features[index] = features.get(index, 0.0) + sign
+    return features
+
+
+class SearchIndex:
+    """Inverted index scored with Okapi BM25.
+
+    Documents are added, replaced and removed one at a time; the postings and
+    length statistics are kept up to date so no rebuild is ever needed.
+    """
+
+    def __init__(self, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self._postings = {}
+        self._doc_terms = {}
+        self._doc_lengths = {}
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._doc_lengths)
+
+    def add(self, doc_id, text: str):
+        """Index a document, replacing any previous version"""
+        self.remove(doc_id)
+        tokens = tokenize(text)
+        frequencies = {}
+        for token in tokens:
+            frequencies[token] = frequencies.get(token, 0) + 1
+        for token, frequency in frequencies.items():
+            self._postings.setdefault(token, {})[doc_id] = frequency
+        self._doc_terms[doc_id] = tuple(frequencies)
+        self._doc_lengths[doc_id] = len(tokens)
+        self._total_length += len(tokens)
+
+    def remove(self, doc_id):
+        """Drop a document from the index"""
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for token in terms:
+            posting = self._postings.get(token)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self._postings[token]
+        self._total_length -= self._doc_lengths.pop(doc_id)
+
+    def scores(self, query: str) -> dict:
+        """BM25 score of every document matching at least one query term"""
+        doc_count = len(self._doc_lengths)
+        if not doc_count:
+            return {}
+        average_length = self._total_length / doc_count or 1
+
+        scores = {}
+        for token in set(tokenize(query)):
+            posting = self._postings.get(token)
+            if not posting:
+                continue
+            idf = math.log(1 + (doc_count - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, frequency in posting.items():
+                norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return scores
+
+    def search(self, query: str, limit: int = 20) -> list:
+        """Best (doc_id, score) pairs for a query, highest score first"""
+        return heapq.nlargest(limit, self.scores(query).items(), key=lambda item: item[1])
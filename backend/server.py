@@ -8,22 +8,60 @@ Optimisé pour Railway deployment avec corrections
 
 import os
 import sys
-from datetime import datetime, timedelta
-from fastapi import FastAPI, HTTPException, Depends, Request
+from datetime import datetime, timedelta, timezone
+from fastapi import FastAPI, HTTPException, Depends, Request, Body, WebSocket
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
-from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, ValidationError
 from typing import List, Optional
 import jwt
 import secrets
 import json
-import sqlite3
-from werkzeug.security import generate_password_hash, check_password_hash
+import asyncio
 import logging
 
+# Import database connection pool
+from database import get_pool, get_async_db
+
+# Import password hashing service
+from password_service import password_hasher
+
+# Import authentication cache
+from auth_cache import auth_cache, TTLCache
+
+# Import pre-encoded catalogue responses
+from catalogue import catalogue
+from http_cache import EncodedPayload, cached_json_response
+
+# Import schema migrations
+from migrations import run_migrations, schema_is_current, SERVER_MIGRATIONS
+
+# Import admin dashboard counters
+from admin_stats import read_user_stats, stats_event_stream, stats_broadcaster
+
+# Import networking profile index
+from networking_index import profile_index, build_profile, search_document, enrich_profiles, encode_cursor, decode_cursor, PROFILE_QUERY
+from embeddings import embedding_store
+
+# Import vectorised compatibility scoring
+from compatibility import compatibility_results
+
+# Mini-site storage
+from minisites import load_minisite, write_minisite, patch_minisite, delete_minisite, touch_minisite, minisite_revision, public_minisite_document
+from minisite_export import export_minisite, MINISITE_EXPORT_DIR
+
+# Uploaded images and their responsive variants
+from media import (media_pipeline, image_extension, store_original, register_asset, complete_asset,
+                   get_asset, ImmutableStaticFiles, MEDIA_DIR, MEDIA_URL, MEDIA_MAX_BYTES)
+
+# Bulk account moderation
+from moderation import moderate_users, changed_ids, moderation_summary, queue_page, count_users, decode_queue_cursor, QUEUE_COLUMNS, MODERATION_MAX_USERS
+
 # Import chatbot service
-from chatbot_service import siports_ai_service, ChatRequest, ChatResponse
+from chatbot_service import siports_ai_service, ChatRequest, ChatResponse, chat_event_stream, serve_chat_websocket
+from conversation_store import create_conversation_backend
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -33,6 +71,13 @@ logger = logging.getLogger(__name__)
 JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'siports-jwt-secret-key-2024-production')
 DATABASE_URL = os.environ.get('DATABASE_URL', 'siports_production.db')
 
+# Shared SQLite connections (async_db runs queries off the event loop)
+db = get_pool(DATABASE_URL)
+async_db = get_async_db(DATABASE_URL)
+
+# Chatbot history, shared by every worker when CHAT_STORE is sqlite or redis
+siports_ai_service.conversations = create_conversation_backend(async_db)
+
 # FastAPI app
 app = FastAPI(
     title="SIPORTS v2.0 API",
@@ -54,53 +99,38 @@ security = HTTPBearer()
 
 # Database initialization
 def init_database():
-    """Initialize production database"""
-    conn = sqlite3.connect(DATABASE_URL)
-    
-    # Users table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            user_type TEXT DEFAULT 'visitor',
-            first_name TEXT,
-            last_name TEXT,
-            company TEXT,
-            phone TEXT,
-            visitor_package TEXT DEFAULT 'Free',
-            partnership_package TEXT,
-            status TEXT DEFAULT 'pending',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+    """Initialize production database (skipped when the schema is already current)"""
+    with db.connection() as conn:
+        # Nothing to do when a previous start already brought the schema up to date
+        if schema_is_current(conn, SERVER_MIGRATIONS):
+            logger.info("Database schema is current, skipping initialization")
+            return False
+        
+        # Tables, columns and indexes
+        run_migrations(conn, SERVER_MIGRATIONS)
+        
+        # Insert admin user if not exists
+        admin_password = password_hasher.hash_sync('admin123')
+        conn.execute('''
+            INSERT OR IGNORE INTO users (email, password_hash, user_type, status, first_name, last_name)
+            VALUES (?, ?, 'admin', 'validated', 'Admin', 'SIPORTS')
+        ''', ('admin@siportevent.com', admin_password))
+        
+        # Sample data with correct passwords
+        visitor_password = password_hasher.hash_sync('visit123')
+        exhibitor_password = password_hasher.hash_sync('exhibitor123')
+        
+        conn.execute('''
+            INSERT OR IGNORE INTO users (email, password_hash, user_type, visitor_package, status, first_name, last_name, company)
+            VALUES (?, ?, 'visitor', 'Premium', 'validated', 'Marie', 'Dupont', 'Port Autonome Marseille')
+        ''', ('visiteur@example.com', visitor_password))
+        
+        conn.execute('''
+            INSERT OR IGNORE INTO users (email, password_hash, user_type, partnership_package, status, first_name, last_name, company)
+            VALUES (?, ?, 'exhibitor', 'Gold', 'validated', 'Jean', 'Martin', 'Maritime Solutions Ltd')
+        ''', ('exposant@example.com', exhibitor_password))
     
-    # Insert admin user if not exists
-    admin_password = generate_password_hash('admin123')
-    conn.execute('''
-        INSERT OR IGNORE INTO users (email, password_hash, user_type, status, first_name, last_name)
-        VALUES (?, ?, 'admin', 'validated', 'Admin', 'SIPORTS')
-    ''', ('admin@siportevent.com', admin_password))
-    
-    # Sample data with correct passwords
-    visitor_password = generate_password_hash('visit123')
-    exhibitor_password = generate_password_hash('exhibitor123')
-    
-    conn.execute('''
-        INSERT OR IGNORE INTO users (email, password_hash, user_type, visitor_package, status, first_name, last_name, company)
-        VALUES (?, ?, 'visitor', 'Premium', 'validated', 'Marie', 'Dupont', 'Port Autonome Marseille')
-    ''', ('visiteur@example.com', visitor_password))
-    
-    conn.execute('''
-        INSERT OR IGNORE INTO users (email, password_hash, user_type, partnership_package, status, first_name, last_name, company)
-        VALUES (?, ?, 'exhibitor', 'Gold', 'validated', 'Jean', 'Martin', 'Maritime Solutions Ltd')
-    ''', ('exposant@example.com', exhibitor_password))
-    
-    conn.commit()
-    conn.close()
-
-# Initialize database on startup
-init_database()
+    return True
 
 # Models
 class UserLogin(BaseModel):
@@ -144,20 +174,27 @@ def verify_jwt_token(token: str) -> dict:
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Get current user from JWT token"""
     token = credentials.credentials
-    payload = verify_jwt_token(token)
+    payload = auth_cache.get_token(token)
+    if payload is None:
+        payload = verify_jwt_token(token)
+        auth_cache.set_token(token, payload)
     
-    conn = sqlite3.connect(DATABASE_URL)
-    conn.row_factory = sqlite3.Row
-    user = conn.execute(
-        'SELECT * FROM users WHERE id = ?',
-        (payload['user_id'],)
-    ).fetchone()
-    conn.close()
+    user = auth_cache.get_user(payload['user_id'])
+    if user is not None:
+        return user
+    
+    with db.connection() as conn:
+        user = conn.execute(
+            'SELECT * FROM users WHERE id = ?',
+            (payload['user_id'],)
+        ).fetchone()
     
     if not user:
         raise HTTPException(status_code=401, detail="Utilisateur non trouvé")
     
-    return dict(user)
+    user = dict(user)
+    auth_cache.set_user(user['id'], user)
+    return user
 
 def admin_required(user: dict = Depends(get_current_user)):
     """Admin authorization required"""
@@ -165,6 +202,66 @@ def admin_required(user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=403, detail="Accès admin requis")
     return user
 
+def load_profile_rows(conn, user_ids: list) -> list:
+    """Users' networking profile rows, enriching them first if needed"""
+    enrich_profiles(conn, user_ids)
+    rows = []
+    for start in range(0, len(user_ids), 500):
+        chunk = user_ids[start:start + 500]
+        rows.extend(conn.execute(
+            f"{PROFILE_QUERY} WHERE u.id IN ({', '.join('?' * len(chunk))})", chunk
+        ).fetchall())
+    return rows
+
+async def reindex_users(user_ids: list):
+    """Refresh users' entries in the networking profile index"""
+    rows = {row['id']: row for row in await async_db.run(load_profile_rows, list(user_ids))}
+    for user_id in user_ids:
+        row = rows.get(user_id)
+        if row:
+            profile_index.upsert(row)
+        else:
+            profile_index.remove(user_id)
+        
+        if row and row['status'] == 'validated':
+            embedding_store.upsert(user_id, search_document(build_profile(dict(row)), row['enhanced_minisite_data']))
+        else:
+            embedding_store.remove(user_id)
+
+async def reindex_user(user_id: int):
+    """Refresh one user's entry in the networking profile index"""
+    await reindex_users([user_id])
+
+async def upgrade_password_hash(user_id: int, password: str):
+    """Re-hash a password with the current method after a successful login"""
+    try:
+        new_hash = await password_hasher.hash(password)
+        await async_db.execute('UPDATE users SET password_hash = ? WHERE id = ?', (new_hash, user_id))
+        auth_cache.invalidate_user(user_id)
+        logger.info(f"Password hash upgraded for user {user_id}")
+    except Exception as e:
+        logger.warning(f"Password hash upgrade failed for user {user_id}: {e}")
+
+def create_user_record(conn, user, password_hash: str):
+    """Insert a new user, returning its id or None if the email is taken"""
+    existing = conn.execute(
+        'SELECT id FROM users WHERE email = ?',
+        (user.email,)
+    ).fetchone()
+    
+    if existing:
+        return None
+    
+    cursor = conn.execute('''
+        INSERT INTO users (email, password_hash, user_type, first_name, last_name, company, phone)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (user.email, password_hash, user.user_type, user.first_name, user.last_name, user.company, user.phone))
+    
+    # Precompute the extended networking profile
+    enrich_profiles(conn, [cursor.lastrowid])
+    
+    return cursor.lastrowid
+
 # =============================================================================
 # AUTHENTICATION ENDPOINTS
 # =============================================================================
@@ -173,28 +270,14 @@ def admin_required(user: dict = Depends(get_current_user)):
 async def register(user: UserRegister):
     """User registration"""
     try:
-        conn = sqlite3.connect(DATABASE_URL)
+        # Create user (the email check and insert share one transaction)
+        password_hash = await password_hasher.hash(user.password)
+        user_id = await async_db.run(create_user_record, user, password_hash)
         
-        # Check if user exists
-        existing = conn.execute(
-            'SELECT id FROM users WHERE email = ?',
-            (user.email,)
-        ).fetchone()
-        
-        if existing:
+        if user_id is None:
             raise HTTPException(status_code=400, detail="Utilisateur existant")
         
-        # Create user
-        password_hash = generate_password_hash(user.password)
-        cursor = conn.execute('''
-            INSERT INTO users (email, password_hash, user_type, first_name, last_name, company, phone)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (user.email, password_hash, user.user_type, user.first_name, user.last_name, user.company, user.phone))
-        
-        user_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        
+        stats_broadcaster.notify()
         return {"message": "Inscription réussie", "user_id": user_id}
         
     except Exception as e:
@@ -205,22 +288,22 @@ async def register(user: UserRegister):
 async def login(user: UserLogin):
     """User login"""
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        conn.row_factory = sqlite3.Row
-        
-        db_user = conn.execute(
+        db_user = await async_db.fetchone(
             'SELECT * FROM users WHERE email = ?',
             (user.email,)
-        ).fetchone()
-        conn.close()
+        )
         
-        if not db_user or not check_password_hash(db_user['password_hash'], user.password):
+        if not db_user or not await password_hasher.verify(db_user['password_hash'], user.password):
             raise HTTPException(status_code=401, detail="Identifiants invalides")
         
         # Allow admin login regardless of status, others must be validated
         if db_user['user_type'] != 'admin' and db_user['status'] != 'validated':
             raise HTTPException(status_code=403, detail="Compte en attente de validation")
         
+        # Transparently upgrade hashes made with an older method or cost
+        if password_hasher.needs_rehash(db_user['password_hash']):
+            await upgrade_password_hash(db_user['id'], user.password)
+        
         # Create JWT token
         user_data = dict(db_user)
         token = create_jwt_token(user_data)
@@ -252,95 +335,20 @@ async def login(user: UserLogin):
 # =============================================================================
 
 @app.get("/api/visitor-packages")
-async def get_visitor_packages():
+async def get_visitor_packages(request: Request):
     """Get visitor packages"""
-    packages = [
-        {
-            "id": 1,
-            "name": "Free Pass",
-            "price": 0,
-            "currency": "€",
-            "description": "Accès gratuit aux espaces d'exposition",
-            "features": [
-                "Accès aux espaces d'exposition",
-                "Conférences publiques",
-                "Application mobile",
-                "Plan du salon"
-            ],
-            "limitations": {
-                "b2b_meetings": 0,
-                "networking": "Limité"
-            }
-        },
-        {
-            "id": 2,
-            "name": "Basic Pass",
-            "price": 150,
-            "currency": "€",
-            "description": "Pass essentiel pour 1 journée",
-            "features": [
-                "Tout du Free Pass",
-                "2 rendez-vous B2B garantis",
-                "Accès aux pauses café",
-                "Badge visiteur personnalisé"
-            ],
-            "limitations": {
-                "b2b_meetings": 2,
-                "networking": "Standard"
-            }
-        },
-        {
-            "id": 3,
-            "name": "Premium Pass",
-            "price": 350,
-            "currency": "€",
-            "description": "Pass complet pour 2 journées",
-            "features": [
-                "Tout du Basic Pass",
-                "5 rendez-vous B2B garantis",
-                "Ateliers techniques spécialisés",
-                "Déjeuners networking",
-                "Accès zone VIP"
-            ],
-            "popular": True,
-            "limitations": {
-                "b2b_meetings": 5,
-                "networking": "Avancé"
-            }
-        },
-        {
-            "id": 4,
-            "name": "VIP Pass",
-            "price": 750,
-            "currency": "€",
-            "description": "Accès privilégié 3 journées complètes",
-            "features": [
-                "Tout du Premium Pass",
-                "Rendez-vous B2B illimités",
-                "Soirée de gala exclusive",
-                "Conférences privées C-Level",
-                "Service de conciergerie",
-                "Transferts inclus"
-            ],
-            "limitations": {
-                "b2b_meetings": "unlimited",
-                "networking": "Premium"
-            }
-        }
-    ]
-    return {"packages": packages}
+    return cached_json_response(request, catalogue.visitor_packages)
 
 @app.post("/api/visitor-packages/update")
 async def update_visitor_package(data: PackageUpdate, user: dict = Depends(get_current_user)):
     """Update user's visitor package"""
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        conn.execute(
+        await async_db.execute(
             'UPDATE users SET visitor_package = ? WHERE id = ?',
             (data.package_type, user['id'])
         )
-        conn.commit()
-        conn.close()
+        auth_cache.invalidate_user(user['id'])
+        await reindex_user(user['id'])
         
         return {"message": "Forfait mis à jour avec succès"}
         
@@ -353,283 +361,27 @@ async def update_visitor_package(data: PackageUpdate, user: dict = Depends(get_c
 # =============================================================================
 
 @app.get("/api/partnership-packages")
-async def get_partnership_packages():
+async def get_partnership_packages(request: Request):
     """Get partnership packages"""
-    packages = [
-        {
-            "id": 1,
-            "name": "Startup Package",
-            "price": 2500,
-            "currency": "$",
-            "description": "Idéal pour les jeunes entreprises maritimes",
-            "features": [
-                "Stand 6m² (2x3m)",
-                "2 badges exposant",
-                "Listing annuaire digital",
-                "Support technique de base"
-            ],
-            "category": "startup"
-        },
-        {
-            "id": 2,
-            "name": "Silver Package", 
-            "price": 8000,
-            "currency": "$",
-            "description": "Package standard pour exposants confirmés",
-            "features": [
-                "Stand 12m² (3x4m)",
-                "4 badges exposant",
-                "Mobilier standard inclus",
-                "1 session de networking sponsorisée",
-                "Présence catalogue premium"
-            ],
-            "category": "standard"
-        },
-        {
-            "id": 3,
-            "name": "Gold Package",
-            "price": 15000,
-            "currency": "$", 
-            "description": "Package avancé avec visibilité renforcée",
-            "features": [
-                "Stand 20m² (4x5m) - Emplacement premium",
-                "6 badges exposant",
-                "Mobilier sur-mesure",
-                "2 conférences sponsorisées (30min)",
-                "Logo sur supports officiels",
-                "1 cocktail networking privé"
-            ],
-            "popular": True,
-            "category": "premium"
-        },
-        {
-            "id": 4,
-            "name": "Platinum Package",
-            "price": 25000,
-            "currency": "$",
-            "description": "Package prestige - Partenaire officiel",
-            "features": [
-                "Stand 40m² (5x8m) - Hall d'entrée",
-                "10 badges exposant",
-                "Design stand personnalisé",
-                "Keynote session dédiée (45min)",
-                "Mini-site SIPORTS Premium dédié",
-                "Branding événement (logos, panneaux)",
-                "Dîner VIP avec comité d'organisation",
-                "Communiqué de presse co-signé"
-            ],
-            "category": "prestige"
-        }
-    ]
-    return {"packages": packages}
+    return cached_json_response(request, catalogue.partnership_packages)
 
 # =============================================================================
 # EXPOSANTS/EXHIBITORS ENDPOINTS
 # =============================================================================
 
 @app.get("/api/exposants")
-async def get_exposants():
+async def get_exposants(request: Request):
     """Get all exhibitors/exposants for the directory"""
-    # Mock data for exhibitors - same as frontend
-    exposants = [
-        {
-            "id": 1,
-            "name": "TechMarine Solutions",
-            "category": "Technologies Maritimes",
-            "logo": "/images/logo1.png",
-            "description": "Solutions technologiques pour l'industrie maritime",
-            "stand": "A12",
-            "hall": "Hall Innovation",
-            "website": "https://techmarinesolutions.com",
-            "email": "contact@techmarinesolutions.com",
-            "phone": "+33 1 23 45 67 89",
-            "specialties": ["IoT Maritime", "Navigation Intelligente", "Maintenance Prédictive"],
-            "products": [
-                "SmartShip Navigator - Système de navigation IA",
-                "MarineIoT Hub - Plateforme IoT embarquée",
-                "PredictMaintain - Solution maintenance prédictive"
-            ],
-            "certifications": ["ISO 9001", "ISO 14001", "Maritime MED"],
-            "founded": 2015,
-            "employees": "50-100",
-            "countries": ["France", "Allemagne", "Norvège"]
-        },
-        {
-            "id": 2,
-            "name": "Green Port Energy",
-            "category": "Énergies Renouvelables",
-            "logo": "/images/logo2.png",
-            "description": "Transition énergétique des ports et terminaux",
-            "stand": "B08",
-            "hall": "Hall Environnement",
-            "website": "https://greenportenergy.com",
-            "email": "info@greenportenergy.com", 
-            "phone": "+33 2 34 56 78 90",
-            "specialties": ["Énergie Solaire", "Éolien Offshore", "Stockage Batterie"],
-            "products": [
-                "SolarPort - Ombrières solaires pour ports",
-                "WindTerminal - Éoliennes portuaires",
-                "BatteryHub - Stockage énergétique intelligent"
-            ],
-            "certifications": ["ISO 50001", "REC Certified", "Wind Power"],
-            "founded": 2018,
-            "employees": "20-50", 
-            "countries": ["France", "Espagne", "Portugal"]
-        },
-        {
-            "id": 3,
-            "name": "Smart Container Corp",
-            "category": "Logistique Intelligente", 
-            "logo": "/images/logo3.png",
-            "description": "Conteneurs connectés et logistique 4.0",
-            "stand": "C15",
-            "hall": "Hall Logistique",
-            "website": "https://smartcontainer.com",
-            "email": "hello@smartcontainer.com",
-            "phone": "+33 3 45 67 89 01",
-            "specialties": ["Conteneurs Connectés", "Tracking IoT", "Blockchain Logistique"],
-            "products": [
-                "ConnectBox - Conteneurs intelligents",
-                "TrackChain - Traçabilité blockchain", 
-                "LogiAI - Intelligence artificielle logistique"
-            ],
-            "certifications": ["ISO 28000", "CTPAT", "AEO"],
-            "founded": 2020,
-            "employees": "10-20",
-            "countries": ["France", "Pays-Bas", "Belgique"]
-        },
-        {
-            "id": 4,
-            "name": "Ocean Data Analytics",
-            "category": "Big Data Maritime",
-            "logo": "/images/logo4.png", 
-            "description": "Analyse de données pour l'industrie maritime",
-            "stand": "D22",
-            "hall": "Hall Innovation",
-            "website": "https://oceandataanalytics.com",
-            "email": "data@oceandataanalytics.com",
-            "phone": "+33 4 56 78 90 12",
-            "specialties": ["Machine Learning", "Prédiction Météo", "Optimisation Routes"],
-            "products": [
-                "WeatherPredict - Prédiction météorologique avancée",
-                "RouteOptim - Optimisation de routes maritimes",
-                "FleetAnalytics - Analyse performance flotte"
-            ],
-            "certifications": ["ISO 27001", "GDPR Certified", "Cloud Security"],
-            "founded": 2017,
-            "employees": "30-50",
-            "countries": ["France", "UK", "Canada"]
-        },
-        {
-            "id": 5,
-            "name": "AquaTech Innovations",
-            "category": "Technologies Marines",
-            "logo": "/images/logo5.png",
-            "description": "Innovations pour l'aquaculture et l'environnement marin", 
-            "stand": "E05",
-            "hall": "Hall Environnement",
-            "website": "https://aquatechinnovations.com",
-            "email": "contact@aquatechinnovations.com",
-            "phone": "+33 5 67 89 01 23",
-            "specialties": ["Aquaculture Durable", "Surveillance Marine", "Biotechnologies"],
-            "products": [
-                "AquaFarm Pro - Systèmes aquaculture intelligente",
-                "MarineWatch - Surveillance écosystèmes marins",
-                "BioClean - Solutions bioremédiation"
-            ],
-            "certifications": ["ASC Aquaculture", "Marine Stewardship", "Bio Certified"],
-            "founded": 2016,
-            "employees": "25-50",
-            "countries": ["France", "Norvège", "Chili"]
-        },
-        {
-            "id": 6,
-            "name": "Port Security Systems",
-            "category": "Sécurité Portuaire",
-            "logo": "/images/logo6.png",
-            "description": "Solutions de sécurité et surveillance pour ports",
-            "stand": "F18", 
-            "hall": "Hall Sécurité",
-            "website": "https://portsecuritysystems.com",
-            "email": "security@portsecuritysystems.com",
-            "phone": "+33 6 78 90 12 34",
-            "specialties": ["Vidéosurveillance IA", "Contrôle Accès", "Détection Intrusion"],
-            "products": [
-                "SecurePort AI - Surveillance intelligente par IA",
-                "AccessGuard - Contrôle d'accès biométrique",
-                "ThreatDetect - Détection de menaces en temps réel"
-            ],
-            "certifications": ["ISO 27001", "ANSSI Qualified", "Security Certified"],
-            "founded": 2014,
-            "employees": "40-80",
-            "countries": ["France", "Italie", "Grèce"]
-        }
-    ]
-    
-    return {"exposants": exposants, "total": len(exposants)}
+    return cached_json_response(request, catalogue.exposants)
 
 @app.get("/api/exposants/{exposant_id}")
-async def get_exposant_detail(exposant_id: int):
+async def get_exposant_detail(exposant_id: int, request: Request):
     """Get detailed information for a specific exposant"""
-    # This would normally fetch from database
-    # For now, return mock data for the specific exposant
-    
-    exposants_data = {
-        1: {
-            "id": 1,
-            "name": "TechMarine Solutions",
-            "category": "Technologies Maritimes",
-            "description": "Leader européen des solutions technologiques pour l'industrie maritime depuis 2015. Spécialisé dans l'IoT maritime, la navigation intelligente et la maintenance prédictive.",
-            "stand": "A12",
-            "hall": "Hall Innovation",
-            "website": "https://techmarinesolutions.com",
-            "email": "contact@techmarinesolutions.com",
-            "phone": "+33 1 23 45 67 89",
-            "logo": "/images/logo1.png",
-            "images": ["/images/tech1.jpg", "/images/tech2.jpg", "/images/tech3.jpg"],
-            "specialties": ["IoT Maritime", "Navigation Intelligente", "Maintenance Prédictive"],
-            "products": [
-                {
-                    "name": "SmartShip Navigator",
-                    "description": "Système de navigation assistée par intelligence artificielle",
-                    "features": ["Navigation autonome", "Évitement obstacles", "Optimisation carburant"]
-                },
-                {
-                    "name": "MarineIoT Hub", 
-                    "description": "Plateforme IoT embarquée pour navires connectés",
-                    "features": ["Capteurs temps réel", "Maintenance prédictive", "Télémétrie avancée"]
-                }
-            ],
-            "team": [
-                {"name": "Pierre Durand", "role": "CEO & Fondateur", "email": "p.durand@techmarinesolutions.com"},
-                {"name": "Marie Lambert", "role": "CTO", "email": "m.lambert@techmarinesolutions.com"}
-            ],
-            "presentations": [
-                {
-                    "title": "L'avenir de la navigation autonome",
-                    "date": "2026-03-15T14:30:00",
-                    "duration": "45 minutes",
-                    "location": "Salle Innovation A"
-                }
-            ],
-            "special_offers": [
-                "Démonstration gratuite sur stand",
-                "20% de réduction pour commandes salon",
-                "Formation gratuite avec installation"
-            ],
-            "founded": 2015,
-            "employees": "50-100",
-            "turnover": "12M€ (2024)",
-            "countries": ["France", "Allemagne", "Norvège"],
-            "certifications": ["ISO 9001", "ISO 14001", "Maritime MED"]
-        }
-        # Add other exposants as needed...
-    }
-    
-    if exposant_id not in exposants_data:
+    payload = catalogue.get_exposant_detail(exposant_id)
+    if payload is None:
         raise HTTPException(status_code=404, detail="Exposant non trouvé")
     
-    return exposants_data[exposant_id]
+    return cached_json_response(request, payload)
 
 # =============================================================================
 # ADMIN ENDPOINTS
@@ -639,66 +391,77 @@ async def get_exposant_detail(exposant_id: int):
 async def get_admin_stats(admin: dict = Depends(admin_required)):
     """Get admin dashboard statistics"""
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        
-        # Count users by type
-        total_users = conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]
-        visitors = conn.execute('SELECT COUNT(*) FROM users WHERE user_type = "visitor"').fetchone()[0]
-        exhibitors = conn.execute('SELECT COUNT(*) FROM users WHERE user_type = "exhibitor"').fetchone()[0]
-        partners = conn.execute('SELECT COUNT(*) FROM users WHERE user_type = "partner"').fetchone()[0]
-        
-        # Count by status
-        pending = conn.execute('SELECT COUNT(*) FROM users WHERE status = "pending"').fetchone()[0]
-        validated = conn.execute('SELECT COUNT(*) FROM users WHERE status = "validated"').fetchone()[0]
-        rejected = conn.execute('SELECT COUNT(*) FROM users WHERE status = "rejected"').fetchone()[0]
-        
-        conn.close()
-        
-        return {
-            "total_users": total_users,
-            "visitors": visitors,
-            "exhibitors": exhibitors,
-            "partners": partners,
-            "pending": pending,
-            "validated": validated,
-            "rejected": rejected
-        }
+        return await async_db.run(read_user_stats)
         
     except Exception as e:
         logger.error(f"Admin stats error: {str(e)}")
         raise HTTPException(status_code=500, detail="Erreur statistiques")
 
+@app.get("/api/admin/dashboard/stats/stream")
+async def stream_admin_stats(request: Request, admin: dict = Depends(admin_required)):
+    """Push dashboard statistics to the admin UI over server-sent events"""
+    async def read_stats():
+        return await async_db.run(read_user_stats)
+    
+    return StreamingResponse(
+        stats_event_stream(request, read_stats, stats_broadcaster),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+class PendingUsersQuery(BaseModel):
+    """Filters and page of the moderation queue"""
+    user_type: Optional[str] = None
+    visitor_package: Optional[str] = None
+    partnership_package: Optional[str] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+    cursor: Optional[str] = None
+    limit: int = Field(50, ge=1, le=500)
+    
+    def filters(self) -> dict:
+        return self.model_dump(exclude={'cursor', 'limit'})
+
 @app.get("/api/admin/users/pending")
-async def get_pending_users(admin: dict = Depends(admin_required)):
-    """Get users pending validation"""
+async def get_pending_users(query: PendingUsersQuery = Depends(), admin: dict = Depends(admin_required)):
+    """Get users pending validation, newest first, one page at a time"""
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        conn.row_factory = sqlite3.Row
-        
-        users = conn.execute('''
-            SELECT id, email, first_name, last_name, company, user_type, created_at
-            FROM users WHERE status = 'pending'
-            ORDER BY created_at DESC
-        ''').fetchall()
-        conn.close()
+        after = decode_queue_cursor(query.cursor) if query.cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+    
+    try:
+        users, next_cursor = await async_db.run(
+            lambda conn: queue_page(conn, after=after, limit=query.limit, columns=QUEUE_COLUMNS, **query.filters())
+        )
         
-        return {"users": [dict(user) for user in users]}
+        return {"users": users, "next_cursor": next_cursor}
         
     except Exception as e:
         logger.error(f"Pending users error: {str(e)}")
         raise HTTPException(status_code=500, detail="Erreur récupération utilisateurs")
 
+@app.get("/api/admin/users/pending/count")
+async def count_pending_users(query: PendingUsersQuery = Depends(), admin: dict = Depends(admin_required)):
+    """Count users pending validation matching the queue filters"""
+    try:
+        return {"count": await async_db.run(lambda conn: count_users(conn, **query.filters()))}
+        
+    except Exception as e:
+        logger.error(f"Pending users count error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur récupération utilisateurs")
+
 @app.post("/api/admin/users/{user_id}/validate")
 async def validate_user(user_id: int, admin: dict = Depends(admin_required)):
     """Validate a user"""
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        conn.execute(
+        await async_db.execute(
             'UPDATE users SET status = "validated" WHERE id = ?',
             (user_id,)
         )
-        conn.commit()
-        conn.close()
+        auth_cache.invalidate_user(user_id)
+        stats_broadcaster.notify()
+        await reindex_user(user_id)
         
         return {"message": "Utilisateur validé avec succès"}
         
@@ -710,13 +473,14 @@ async def validate_user(user_id: int, admin: dict = Depends(admin_required)):
 async def reject_user(user_id: int, admin: dict = Depends(admin_required)):
     """Reject a user"""
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        conn.execute(
+        await async_db.execute(
             'UPDATE users SET status = "rejected" WHERE id = ?',
             (user_id,)
         )
-        conn.commit()
-        conn.close()
+        auth_cache.invalidate_user(user_id)
+        stats_broadcaster.notify()
+        profile_index.remove(user_id)
+        embedding_store.remove(user_id)
         
         return {"message": "Utilisateur rejeté"}
         
@@ -724,6 +488,44 @@ async def reject_user(user_id: int, admin: dict = Depends(admin_required)):
         logger.error(f"User rejection error: {str(e)}")
         raise HTTPException(status_code=500, detail="Erreur rejet utilisateur")
 
+class ModerationFilter(BaseModel):
+    """Accounts selected by a bulk moderation request"""
+    status: Optional[str] = 'pending'
+    user_type: Optional[str] = None
+    visitor_package: Optional[str] = None
+    partnership_package: Optional[str] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+class BulkModerationRequest(BaseModel):
+    """Model for bulk validation or rejection"""
+    action: str = Field(..., pattern='^(validate|reject)$')
+    user_ids: List[int] = Field(default_factory=list, max_length=MODERATION_MAX_USERS)
+    filter: Optional[ModerationFilter] = None
+
+@app.post("/api/admin/users/bulk-moderation")
+async def bulk_moderate_users(request: BulkModerationRequest, admin: dict = Depends(admin_required)):
+    """Validate or reject many users (ids and/or a filter) in one transaction"""
+    if not request.user_ids and request.filter is None:
+        raise HTTPException(status_code=400, detail="Aucun utilisateur sélectionné")
+    
+    try:
+        filters = request.filter.model_dump() if request.filter else None
+        results, remaining = await async_db.run(moderate_users, request.action, request.user_ids, filters)
+        
+        # Caches, counters and the networking index are updated once for the whole batch
+        updated = changed_ids(results)
+        if updated:
+            auth_cache.invalidate_all_users()
+            stats_broadcaster.notify()
+            await reindex_users(updated)
+        
+        return moderation_summary(results, remaining)
+        
+    except Exception as e:
+        logger.error(f"Bulk moderation error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur modération utilisateurs")
+
 # =============================================================================
 # AI MATCHING & NETWORKING ENDPOINTS
 # =============================================================================
@@ -747,76 +549,119 @@ class MatchingFilters(BaseModel):
     language: str = 'all'
     semantic_search: bool = False
     search_query: Optional[str] = None
+    cursor: Optional[str] = None
+    limit: int = Field(20, ge=1, le=100)
+
+# Encoded /api/networking/profiles responses, keyed on the viewer, the filters and the index versions
+networking_responses = TTLCache(
+    int(os.environ.get('NETWORKING_CACHE_MAX_ENTRIES', 5000)),
+    int(os.environ.get('NETWORKING_CACHE_TTL', 300))
+)
+
+def profile_cursor(filters: MatchingFilters):
+    """Sort key to resume after, decoded from the request cursor"""
+    if not filters.cursor:
+        return None
+    try:
+        return decode_cursor(filters.cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+
+async def refresh_profile_index():
+    """Validated profiles live in an in-memory index, reloaded when stale"""
+    if profile_index.is_stale():
+        await async_db.run(profile_index.refresh)
+
+def networking_query(filters: MatchingFilters) -> dict:
+    """Index query arguments for a set of filters"""
+    # Meaning-based relevance from the profile embeddings when they have been built
+    search_query = filters.search_query if filters.semantic_search else None
+    relevance = None
+    if search_query and embedding_store.available:
+        relevance = embedding_store.similarities(search_query)
+    
+    return {
+        "match_type": filters.match_type,
+        "sector": filters.sector,
+        "location": filters.location,
+        "language": filters.language,
+        "budget": filters.budget,
+        "compatibility_min": filters.compatibility_min,
+        "search_query": search_query,
+        "relevance": relevance
+    }
+
+async def networking_profiles_payload(filters: MatchingFilters, user: dict) -> EncodedPayload:
+    """One page of profiles for a user and a set of filters, served from cache when unchanged"""
+    after = profile_cursor(filters)
+    await refresh_profile_index()
+    
+    cache_key = (user['id'], user['user_type'], filters.model_dump_json(), profile_index.version, embedding_store.version)
+    payload = networking_responses.get(cache_key)
+    if payload is not None:
+        return payload
+    
+    # Filters are pushed down into the index, which returns only the requested page
+    profiles, next_key = profile_index.query_page(user, after=after, limit=filters.limit, **networking_query(filters))
+    
+    payload = EncodedPayload({
+        "profiles": profiles,
+        "next_cursor": encode_cursor(next_key) if next_key is not None else None
+    })
+    networking_responses.set(cache_key, payload)
+    return payload
+
+@app.get("/api/networking/profiles")
+async def list_networking_profiles(request: Request, filters: MatchingFilters = Depends(), user: dict = Depends(get_current_user)):
+    """Get networking profiles with AI matching (cacheable, supports If-None-Match)"""
+    try:
+        payload = await networking_profiles_payload(filters, user)
+        return cached_json_response(request, payload, cache_control='private, no-cache')
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Networking profiles error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur récupération profils")
 
 @app.post("/api/networking/profiles")
-async def get_networking_profiles(filters: MatchingFilters, user: dict = Depends(get_current_user)):
+async def get_networking_profiles(request: Request, filters: MatchingFilters, user: dict = Depends(get_current_user)):
     """Get networking profiles with AI matching"""
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        conn.row_factory = sqlite3.Row
-        
-        # Base query for all users except current user
-        query = '''
-            SELECT id, email, first_name, last_name, company, user_type, 
-                   visitor_package, partnership_package, status, created_at
-            FROM users 
-            WHERE id != ? AND status = 'validated'
-        '''
-        params = [user['id']]
-        
-        # Apply filters
-        if filters.match_type != 'all':
-            if filters.match_type == 'partner':
-                query += ' AND user_type IN ("exhibitor", "partner")'
-            else:
-                query += ' AND user_type = ?'
-                params.append(filters.match_type)
-        
-        profiles = conn.execute(query, params).fetchall()
-        conn.close()
-        
-        # Convert to enhanced profile format
-        enhanced_profiles = []
-        for profile in profiles:
-            profile_dict = dict(profile)
-            
-            # Add mock data for demonstration (in production, this would come from extended profile tables)
-            enhanced_profile = {
-                **profile_dict,
-                'name': f"{profile_dict['first_name']} {profile_dict['last_name']}",
-                'title': get_mock_title(profile_dict['user_type']),
-                'sector': get_mock_sector(profile_dict['user_type']),
-                'location': get_mock_location(),
-                'description': get_mock_description(profile_dict['user_type']),
-                'interests': get_mock_interests(profile_dict['user_type']),
-                'languages': ['Français', 'Anglais'],
-                'availability': {
-                    'status': 'Disponible',
-                    'preferred_slots': ['09:00-12:00', '14:00-17:00']
-                },
-                'compatibility': calculate_mock_compatibility(user, profile_dict),
-                'business_potential': get_business_potential(profile_dict['user_type']),
-                'connection_status': 'not_connected'
-            }
-            
-            enhanced_profiles.append(enhanced_profile)
-        
-        # Apply AI filtering and sorting
-        if filters.semantic_search and filters.search_query:
-            enhanced_profiles = apply_semantic_search(enhanced_profiles, filters.search_query)
-        
-        # Filter by compatibility
-        enhanced_profiles = [p for p in enhanced_profiles if p['compatibility'] >= filters.compatibility_min]
-        
-        # Sort by compatibility
-        enhanced_profiles.sort(key=lambda x: x['compatibility'], reverse=True)
-        
-        return {"profiles": enhanced_profiles[:20]}  # Limit to 20 results
+        payload = await networking_profiles_payload(filters, user)
+        return cached_json_response(request, payload, cache_control='private, no-cache')
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Networking profiles error: {str(e)}")
         raise HTTPException(status_code=500, detail="Erreur récupération profils")
 
+@app.get("/api/networking/profiles/stream")
+async def stream_networking_profiles(filters: MatchingFilters = Depends(), user: dict = Depends(get_current_user)):
+    """Stream every matching profile as NDJSON, one line per profile in rank order"""
+    try:
+        after = profile_cursor(filters)
+        await refresh_profile_index()
+        query = networking_query(filters)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Networking profiles stream error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur récupération profils")
+    
+    def lines():
+        # The index is read a page at a time, so only one page is ever held in memory
+        for profile in profile_index.iter_query(user, after=after, chunk_size=filters.limit, **query):
+            yield json.dumps(profile, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/api/networking/ai-suggestions")
 async def get_ai_suggestions(user: dict = Depends(get_current_user)):
     """Get AI-powered networking suggestions"""
@@ -855,13 +700,9 @@ async def get_ai_suggestions(user: dict = Depends(get_current_user)):
 async def get_conversation_starters(profile_id: int, user: dict = Depends(get_current_user)):
     """Get AI-generated conversation starters for a profile"""
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        conn.row_factory = sqlite3.Row
-        
-        profile = conn.execute(
-            'SELECT * FROM users WHERE id = ?', (profile_id,)
-        ).fetchone()
-        conn.close()
+        profile = await async_db.fetchone(
+            f'{PROFILE_QUERY} WHERE u.id = ?', (profile_id,)
+        )
         
         if not profile:
             raise HTTPException(status_code=404, detail="Profil non trouvé")
@@ -870,7 +711,7 @@ async def get_conversation_starters(profile_id: int, user: dict = Depends(get_cu
         starters = [
             {
                 'category': 'Professionnel',
-                'message': f'Bonjour {profile["first_name"]}, j\'ai vu votre expertise en {get_mock_sector(profile["user_type"])}. Quelles sont vos approches innovantes dans ce domaine ?',
+                'message': f'Bonjour {profile["first_name"]}, j\'ai vu votre expertise en {build_profile(dict(profile))["sector"]}. Quelles sont vos approches innovantes dans ce domaine ?',
                 'context': 'Basé sur le secteur d\'expertise'
             },
             {
@@ -906,134 +747,30 @@ async def send_connection_request(profile_id: int, user: dict = Depends(get_curr
 async def calculate_compatibility(profile_data: dict, user: dict = Depends(get_current_user)):
     """Calculate AI compatibility score between users"""
     try:
-        # Simplified compatibility calculation
-        base_score = 70
-        
-        # Sector compatibility
-        if profile_data.get('sector') and user.get('sector'):
-            if profile_data['sector'] == user['sector']:
-                base_score += 20
-            elif are_compatible_sectors(profile_data['sector'], user['sector']):
-                base_score += 10
-        
-        # User type synergy
-        user_type_bonus = {
-            ('visitor', 'exhibitor'): 15,
-            ('visitor', 'partner'): 12,
-            ('exhibitor', 'partner'): 18
-        }
-        
-        user_types = tuple(sorted([user.get('user_type', ''), profile_data.get('user_type', '')]))
-        base_score += user_type_bonus.get(user_types, 0)
-        
-        # Cap at 100%
-        compatibility = min(100, base_score)
-        
-        return {
-            "compatibility_score": compatibility,
-            "breakdown": {
-                "sectorial": min(100, base_score - 70 + 70),
-                "user_type": user_type_bonus.get(user_types, 0),
-                "overall": compatibility
-            }
-        }
+        return compatibility_results(user, [profile_data])[0]
         
     except Exception as e:
         logger.error(f"Compatibility calculation error: {str(e)}")
         raise HTTPException(status_code=500, detail="Erreur calcul compatibilité")
 
-# Helper functions for mock data generation
-def get_mock_title(user_type):
-    titles = {
-        'visitor': ['Directeur Général', 'Directeur Innovation', 'Chef de Projet'],
-        'exhibitor': ['CTO', 'VP Sales', 'Business Development Manager'],
-        'partner': ['CEO', 'VP Partnerships', 'Chief Innovation Officer']
-    }
-    import random
-    return random.choice(titles.get(user_type, ['Manager']))
-
-def get_mock_sector(user_type):
-    sectors = {
-        'visitor': ['Gestion Portuaire', 'Logistique Maritime', 'Transport Maritime'],
-        'exhibitor': ['Technologies Marines', 'Equipment Portuaire', 'Solutions IoT'],
-        'partner': ['Innovation Maritime', 'Investissement Tech', 'Consulting Maritime']
-    }
-    import random
-    return random.choice(sectors.get(user_type, ['Maritime']))
-
-def get_mock_location():
-    locations = ['Paris, France', 'Rotterdam, Pays-Bas', 'Singapour', 'Dubaï, EAU', 'Hambourg, Allemagne']
-    import random
-    return random.choice(locations)
-
-def get_mock_description(user_type):
-    descriptions = {
-        'visitor': 'Dirigeant expérimenté dans la modernisation des infrastructures maritimes avec focus sur l\'innovation et la durabilité.',
-        'exhibitor': 'Expert en solutions technologiques pour l\'industrie maritime, spécialisé dans l\'IoT et l\'automatisation portuaire.',
-        'partner': 'Leader de l\'innovation maritime, spécialisé dans les partenariats technologiques stratégiques et les investissements.'
-    }
-    return descriptions.get(user_type, 'Professionnel du secteur maritime.')
-
-def get_mock_interests(user_type):
-    interests = {
-        'visitor': ['Digital Transformation', 'Port Automation', 'Sustainability', 'Smart Logistics'],
-        'exhibitor': ['IoT Maritime', 'AI & ML', 'Blockchain', 'Green Technology'],
-        'partner': ['Innovation', 'Strategic Partnerships', 'Investment', 'Market Expansion']
-    }
-    return interests.get(user_type, ['Maritime', 'Innovation'])
-
-def calculate_mock_compatibility(user, profile):
-    """Calculate a mock compatibility score"""
-    base_score = 75
-    
-    # User type compatibility
-    if user['user_type'] == 'visitor' and profile['user_type'] in ['exhibitor', 'partner']:
-        base_score += 15
-    elif user['user_type'] in ['exhibitor', 'partner'] and profile['user_type'] == 'visitor':
-        base_score += 15
-    
-    # Random variation
-    import random
-    variation = random.randint(-10, 20)
-    
-    return min(100, max(60, base_score + variation))
-
-def get_business_potential(user_type):
-    potentials = ['Élevé', 'Très élevé', 'Exceptionnel', 'Modéré']
-    import random
-    return random.choice(potentials)
+class CompatibilityBatchRequest(BaseModel):
+    """Candidate profiles to score against the current user"""
+    candidates: List[dict] = Field(..., min_length=1, max_length=500)
 
-def apply_semantic_search(profiles, query):
-    """Apply semantic search to profiles"""
-    if not query:
-        return profiles
-    
-    query_terms = query.lower().split()
-    scored_profiles = []
-    
-    for profile in profiles:
-        score = 0
-        search_text = f"{profile['description']} {' '.join(profile['interests'])} {profile['sector']}".lower()
+@app.post("/api/matching/calculate-compatibility/batch")
+async def calculate_compatibility_batch(data: CompatibilityBatchRequest, user: dict = Depends(get_current_user)):
+    """Calculate compatibility scores between the user and many profiles in one call"""
+    try:
+        results = compatibility_results(user, data.candidates)
+        for candidate, result in zip(data.candidates, results):
+            if 'id' in candidate:
+                result['id'] = candidate['id']
         
-        for term in query_terms:
-            if term in search_text:
-                score += 10
+        return {"results": results}
         
-        if score > 0:
-            profile['semantic_score'] = score
-            scored_profiles.append(profile)
-    
-    return sorted(scored_profiles, key=lambda x: x.get('semantic_score', 0), reverse=True)
-
-def are_compatible_sectors(sector1, sector2):
-    """Check if two sectors are compatible"""
-    compatible_pairs = [
-        ('Gestion Portuaire', 'Technologies Marines'),
-        ('Logistique Maritime', 'Solutions IoT'),
-        ('Innovation Maritime', 'Equipment Portuaire')
-    ]
-    
-    return (sector1, sector2) in compatible_pairs or (sector2, sector1) in compatible_pairs
+    except Exception as e:
+        logger.error(f"Batch compatibility calculation error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur calcul compatibilité")
 
 # =============================================================================
 # ENHANCED MINI-SITE EDITOR ENDPOINTS
@@ -1077,29 +814,17 @@ class EnhancedMiniSiteData(BaseModel):
 async def get_enhanced_minisite_data(user_id: int, user: dict = Depends(get_current_user)):
     """Get enhanced mini-site data for a user"""
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        conn.row_factory = sqlite3.Row
-        
         # Check if user has permission to access this data
         if user['id'] != user_id and user['user_type'] != 'admin':
             raise HTTPException(status_code=403, detail="Accès refusé")
         
         # Get the stored mini-site data
-        result = conn.execute(
-            'SELECT enhanced_minisite_data FROM users WHERE id = ?', 
-            (user_id,)
-        ).fetchone()
-        
-        if not result:
-            conn.close()
-            raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
-        if result and result['enhanced_minisite_data']:
-            data = json.loads(result['enhanced_minisite_data'])
-        else:
+        data = await async_db.run(load_minisite, user_id)
+        if data is None:
             # Return default structure if no data exists
-            user_data = conn.execute(
-                'SELECT * FROM users WHERE id = ?', (user_id,)
-            ).fetchone()
+            user_data = await async_db.fetchone(
+                'SELECT company, email, phone FROM users WHERE id = ?', (user_id,)
+            )
             
             if not user_data:
                 raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
@@ -1139,9 +864,10 @@ async def get_enhanced_minisite_data(user_id: int, user: dict = Depends(get_curr
                 "social": {"linkedin": "", "twitter": "", "facebook": "", "youtube": ""}
             }
         
-        conn.close()
         return {"data": data}
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting enhanced minisite data: {str(e)}")
         raise HTTPException(status_code=500, detail="Erreur lors de la récupération des données")
@@ -1154,30 +880,18 @@ async def save_enhanced_minisite_data(user_id: int, data: EnhancedMiniSiteData,
         if user['id'] != user_id and user['user_type'] != 'admin':
             raise HTTPException(status_code=403, detail="Accès refusé")
         
-        conn = sqlite3.connect(DATABASE_URL)
-        
-        # Check if we need to add the column (for backward compatibility)
-        cursor = conn.cursor()
-        cursor.execute("PRAGMA table_info(users)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        if 'enhanced_minisite_data' not in columns:
-            # Add the column if it doesn't exist
-            conn.execute('ALTER TABLE users ADD COLUMN enhanced_minisite_data TEXT')
-        
-        # Convert data to JSON and store
-        data_json = json.dumps(data.dict())
-        
-        conn.execute(
-            'UPDATE users SET enhanced_minisite_data = ? WHERE id = ?',
-            (data_json, user_id)
-        )
-        conn.commit()
-        conn.close()
+        # Only the sections that differ from the stored mini-site are rewritten
+        changed = await async_db.run(write_minisite, user_id, data.model_dump())
+        if changed:
+            public_minisites.pop(user_id)
+            await reindex_user(user_id)
+            await refresh_minisite_export(user_id)
         
         logger.info(f"Enhanced mini-site data saved for user {user_id}")
         return {"message": "Données du mini-site sauvegardées avec succès"}
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error saving enhanced minisite data: {str(e)}")
         raise HTTPException(status_code=500, detail="Erreur lors de la sauvegarde des données")
@@ -1190,100 +904,172 @@ async def delete_enhanced_minisite_data(user_id: int, user: dict = Depends(get_c
         if user['id'] != user_id and user['user_type'] != 'admin':
             raise HTTPException(status_code=403, detail="Accès refusé")
         
-        conn = sqlite3.connect(DATABASE_URL)
-        conn.execute(
-            'UPDATE users SET enhanced_minisite_data = NULL WHERE id = ?',
-            (user_id,)
-        )
-        conn.commit()
-        conn.close()
+        await async_db.run(delete_minisite, user_id)
+        public_minisites.pop(user_id)
+        await reindex_user(user_id)
+        await refresh_minisite_export(user_id)
         
         logger.info(f"Enhanced mini-site data deleted for user {user_id}")
         return {"message": "Données du mini-site supprimées avec succès"}
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error deleting enhanced minisite data: {str(e)}")
         raise HTTPException(status_code=500, detail="Erreur lors de la suppression des données")
 
-@app.get("/api/minisite/enhanced/{user_id}/public")
-async def get_public_enhanced_minisite(user_id: int):
-    """Get public enhanced mini-site data (no authentication required)"""
+async def refresh_minisite_export(user_id: int):
+    """Re-render a mini-site's static files after a change (when MINISITE_EXPORT_DIR is set)"""
+    if not MINISITE_EXPORT_DIR:
+        return
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        conn.row_factory = sqlite3.Row
-        
-        # Get the stored mini-site data and user info
-        result = conn.execute(
-            '''SELECT * FROM users WHERE id = ? AND user_type IN ('exhibitor', 'partner')''', 
-            (user_id,)
-        ).fetchone()
-        
-        if not result:
-            # Check if user exists but is not exhibitor/partner
-            user_check = conn.execute('SELECT user_type FROM users WHERE id = ?', (user_id,)).fetchone()
-            conn.close()
-            if user_check:
-                raise HTTPException(status_code=404, detail="Mini-site non disponible pour ce type d'utilisateur")
-            else:
-                raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
-        
-        user_data = dict(result)
+        await async_db.run(export_minisite, user_id)
+    except Exception as e:
+        logger.error(f"Mini-site export error for user {user_id}: {str(e)}")
+
+def validate_minisite(document: dict) -> dict:
+    """Patched mini-site checked against the editor model, with its defaults filled in"""
+    return EnhancedMiniSiteData(**document).model_dump()
+
+@app.patch("/api/minisite/enhanced/{user_id}")
+async def patch_enhanced_minisite_data(user_id: int, patch: dict = Body(..., media_type="application/merge-patch+json"),
+                                       user: dict = Depends(get_current_user)):
+    """Partially update enhanced mini-site data with a JSON merge patch (RFC 7386)"""
+    try:
+        # Check if user has permission to modify this data
+        if user['id'] != user_id and user['user_type'] != 'admin':
+            raise HTTPException(status_code=403, detail="Accès refusé")
         
-        # Get enhanced mini-site data
-        enhanced_data = None
-        if user_data.get('enhanced_minisite_data'):
-            enhanced_data = json.loads(user_data['enhanced_minisite_data'])
+        try:
+            data, changed = await async_db.run(patch_minisite, user_id, patch, validate_minisite)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=json.loads(e.json(include_url=False)))
+        if changed:
+            public_minisites.pop(user_id)
+            await reindex_user(user_id)
+            await refresh_minisite_export(user_id)
         
-        # Mock products for demonstration (in production, this would come from a products table)
-        products = [
-            {
-                "id": 1,
-                "name": "SmartShip Navigator",
-                "description": "Système de navigation assistée par intelligence artificielle",
-                "category": "Navigation",
-                "price": "Sur devis",
-                "images": ["/images/product1.jpg"]
-            },
-            {
-                "id": 2,
-                "name": "MarineIoT Hub",
-                "description": "Plateforme IoT embarquée pour navires connectés",
-                "category": "IoT",
-                "price": "À partir de €15,000",
-                "images": ["/images/product2.jpg"]
-            }
-        ]
+        logger.info(f"Enhanced mini-site data patched for user {user_id} (sections: {', '.join(changed) or 'none'})")
+        return {"data": data, "updated_sections": changed}
         
-        # Build response with enhanced data if available, fallback to basic data
-        if enhanced_data:
-            enhanced_data['products'] = products
-            response_data = enhanced_data
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error patching enhanced minisite data: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur lors de la sauvegarde des données")
+
+# Encoded public mini-site pages: user id -> (mini-site revision, payload)
+public_minisites = TTLCache(
+    int(os.environ.get('MINISITE_CACHE_MAX_ENTRIES', 10000)),
+    int(os.environ.get('MINISITE_CACHE_TTL', 3600))
+)
+
+@app.get("/api/minisite/enhanced/{user_id}/public")
+async def get_public_enhanced_minisite(user_id: int, request: Request):
+    """Get public enhanced mini-site data (no authentication required, supports conditional GET)"""
+    try:
+        revision = await async_db.run(minisite_revision, user_id)
+        if not revision:
+            raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+        if revision['user_type'] not in ('exhibitor', 'partner'):
+            raise HTTPException(status_code=404, detail="Mini-site non disponible pour ce type d'utilisateur")
+        
+        # A cached rendering is reused only while the mini-site revision is unchanged
+        key = (revision['version'], revision['updated_at'])
+        cached = public_minisites.get(user_id)
+        if cached is not None and cached[0] == key:
+            payload = cached[1]
         else:
-            response_data = {
-                "name": user_data.get('company') or f"{user_data.get('first_name', '')} {user_data.get('last_name', '')}".strip(),
-                "tagline": 'Expert du secteur maritime',
-                "category": 'Professionnel Maritime',
-                "icon": '⚓',
-                "description": 'Professionnel expérimenté dans le secteur maritime.',
-                "email": user_data.get('email', ''),
-                "phone": user_data.get('phone', ''),
-                "products": products,
-                "contacts": {
-                    "general": {
-                        "name": f"{user_data.get('first_name', '')} {user_data.get('last_name', '')}".strip(),
-                        "email": user_data.get('email', ''),
-                        "phone": user_data.get('phone') or 'Non renseigné'
-                    }
-                }
-            }
+            data = await async_db.run(public_minisite_document, user_id)
+            last_modified = None
+            if revision['updated_at']:
+                last_modified = datetime.strptime(revision['updated_at'], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+            payload = EncodedPayload({"data": data}, last_modified=last_modified)
+            public_minisites.set(user_id, (key, payload))
         
-        conn.close()
-        return {"data": response_data}
+        return cached_json_response(request, payload, max_age=60)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting public enhanced minisite: {str(e)}")
         raise HTTPException(status_code=500, detail="Erreur lors de la récupération du mini-site")
 
+# =============================================================================
+# MEDIA UPLOAD ENDPOINTS
+# =============================================================================
+
+# Variant builds in flight (kept referenced until they finish)
+media_tasks = set()
+
+async def process_media(asset_id: str, extension: str, user_id: int):
+    """Build an upload's variants, record them and refresh the owner's mini-site"""
+    try:
+        result = await media_pipeline.build(asset_id, extension)
+    except Exception as e:
+        logger.error(f"Media processing error for {asset_id}: {str(e)}")
+        result = None
+    
+    try:
+        await async_db.run(complete_asset, asset_id, result)
+        # The public mini-site lists the new variants from its next revision on
+        await async_db.run(touch_minisite, user_id)
+        public_minisites.pop(user_id)
+        await refresh_minisite_export(user_id)
+    except Exception as e:
+        logger.error(f"Media completion error for {asset_id}: {str(e)}")
+
+@app.post("/api/media", status_code=202)
+async def upload_media(request: Request, user: dict = Depends(get_current_user)):
+    """Upload an image as the raw request body; its variants are built in the background"""
+    declared_length = request.headers.get('content-length')
+    if declared_length and declared_length.isdigit() and int(declared_length) > MEDIA_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Fichier trop volumineux")
+    
+    data = bytearray()
+    async for chunk in request.stream():
+        data.extend(chunk)
+        if len(data) > MEDIA_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="Fichier trop volumineux")
+    
+    extension = image_extension(bytes(data[:16]))
+    if extension is None:
+        raise HTTPException(status_code=415, detail="Format d'image non supporté (JPEG, PNG, GIF, WebP, AVIF)")
+    
+    try:
+        # Content-addressed: the same image uploaded twice is stored and processed once
+        asset_id = await run_in_threadpool(store_original, bytes(data), extension)
+        created = await async_db.run(register_asset, asset_id, user['id'], extension, len(data))
+        asset = await async_db.run(get_asset, asset_id)
+        
+        if created or asset['status'] == 'failed':
+            task = asyncio.create_task(process_media(asset_id, extension, user['id']))
+            media_tasks.add(task)
+            task.add_done_callback(media_tasks.discard)
+        
+        return asset
+        
+    except Exception as e:
+        logger.error(f"Media upload error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur lors de l'envoi du fichier")
+
+@app.get("/api/media/{asset_id}")
+async def get_media(asset_id: str):
+    """Get an uploaded image with its processing status and variants"""
+    try:
+        asset = await async_db.run(get_asset, asset_id)
+        
+    except Exception as e:
+        logger.error(f"Media lookup error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur lors de la récupération du fichier")
+    
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Média non trouvé")
+    return asset
+
+# Originals and variants: content-addressed, so cacheable forever
+app.mount(MEDIA_URL, ImmutableStaticFiles(directory=MEDIA_DIR, check_dir=False), name="media")
+
 # =============================================================================
 # AI CHATBOT ENDPOINTS
 # =============================================================================
@@ -1318,19 +1104,37 @@ async def event_chat_endpoint(request: ChatRequest):
     request.context_type = "event"
     return await chat_endpoint(request)
 
+@app.post("/api/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """Stream the chatbot answer token by token over server-sent events"""
+    return StreamingResponse(
+        chat_event_stream(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/api/chat/ws")
+async def chat_websocket_endpoint(websocket: WebSocket):
+    """Chat over a WebSocket: one ChatRequest per message, answers streamed as JSON events"""
+    await serve_chat_websocket(websocket)
+
 @app.get("/api/chatbot/health")
 async def chatbot_health_check():
     """Chatbot health check"""
     try:
         test_request = ChatRequest(message="test health", context_type="general")
         response = await siports_ai_service.generate_response(test_request)
+        # Probes must not fill the conversation store with one-off sessions
+        await siports_ai_service.clear_conversation_history(response.session_id)
         
         return {
             "status": "healthy",
             "service": "siports-ai-chatbot",
             "version": "2.0.0",
             "mock_mode": siports_ai_service.mock_mode,
-            "test_response_length": len(response.response)
+            "test_response_length": len(response.response),
+            "conversations": siports_ai_service.conversations.get_stats(),
+            "response_cache": siports_ai_service.response_cache.get_stats()
         }
     except Exception as e:
         logger.error(f"Chatbot health check failed: {str(e)}")
@@ -1359,9 +1163,24 @@ async def startup_event():
     """Initialize application on startup"""
     logger.info("SIPORTS v2.0 API starting...")
     logger.info(f"Database: {DATABASE_URL}")
+    init_database()
+    os.makedirs(MEDIA_DIR, exist_ok=True)
     logger.info("AI Chatbot service initialized")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release pooled database connections and worker pools"""
+    password_hasher.shutdown()
+    media_pipeline.shutdown()
+    async_db.shutdown()
+    db.close_all()
+
 if __name__ == "__main__":
+    if '--init-db' in sys.argv:
+        # One-shot schema migration and seeding (release/deploy step)
+        init_database()
+        sys.exit(0)
+    
     import uvicorn
     port = int(os.environ.get("PORT", 8000))
     uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
@@ -9,25 +9,47 @@ Optimisé pour Railway deployment
 import os
 import sys
 from datetime import datetime, timedelta
-from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi import FastAPI, HTTPException, Depends, Request, WebSocket
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 import jwt
 import secrets
 import json
-import sqlite3
-from werkzeug.security import generate_password_hash, check_password_hash
 import logging
 
+# Import database connection pool
+from database import get_pool, get_async_db
+
 # Import WordPress integration
 from wordpress_config import wp_config
 from wordpress_sync import get_wp_sync_service
 
+# Import password hashing service
+from password_service import password_hasher
+
+# Import authentication cache
+from auth_cache import auth_cache
+
+# Import pre-encoded catalogue responses
+from catalogue import catalogue
+from http_cache import cached_json_response
+
+# Import schema migrations
+from migrations import run_migrations, schema_is_current, WORDPRESS_MIGRATIONS
+
+# Import admin dashboard counters
+from admin_stats import read_user_stats, stats_event_stream, stats_broadcaster
+
+# Bulk account moderation
+from moderation import moderate_users, changed_ids, moderation_summary, queue_page, count_users, decode_queue_cursor, QUEUE_COLUMNS, MODERATION_MAX_USERS
+
 # Import chatbot service
-from chatbot_service import siports_ai_service, ChatRequest, ChatResponse
+from chatbot_service import siports_ai_service, ChatRequest, ChatResponse, chat_event_stream, serve_chat_websocket
+from conversation_store import create_conversation_backend
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -38,6 +60,13 @@ JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', secrets.token_hex(32))
 DATABASE_URL = os.environ.get('DATABASE_URL', 'instance/siports_production.db')
 WORDPRESS_ENABLED = os.environ.get('WORDPRESS_ENABLED', 'true').lower() == 'true'
 
+# Shared SQLite connections (async_db runs queries off the event loop)
+db = get_pool(DATABASE_URL)
+async_db = get_async_db(DATABASE_URL)
+
+# Chatbot history, shared by every worker when CHAT_STORE is sqlite or redis
+siports_ai_service.conversations = create_conversation_backend(async_db)
+
 # FastAPI app
 app = FastAPI(
     title="SIPORTS v2.0 API with WordPress",
@@ -62,72 +91,39 @@ wp_sync = get_wp_sync_service(DATABASE_URL) if WORDPRESS_ENABLED else None
 
 # Database initialization (enhanced with WordPress fields)
 def init_database():
-    """Initialize production database with WordPress integration"""
+    """Initialize production database with WordPress integration (skipped when current)"""
     os.makedirs('instance', exist_ok=True)
-    conn = sqlite3.connect(DATABASE_URL)
-    
-    # Enhanced users table with WordPress fields
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            user_type TEXT DEFAULT 'visitor',
-            first_name TEXT,
-            last_name TEXT,
-            company TEXT,
-            phone TEXT,
-            visitor_package TEXT DEFAULT 'Free',
-            partnership_package TEXT,
-            status TEXT DEFAULT 'pending',
-            wp_user_id INTEGER,
-            wp_sync_enabled BOOLEAN DEFAULT 1,
-            last_wp_sync TIMESTAMP,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # WordPress sync log table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS wp_sync_log (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            action TEXT NOT NULL,
-            data TEXT,
-            status TEXT DEFAULT 'pending',
-            error_message TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    # Insert admin user if not exists
-    admin_password = generate_password_hash('admin123')
-    conn.execute('''
-        INSERT OR IGNORE INTO users (email, password_hash, user_type, status, first_name, last_name)
-        VALUES (?, ?, 'admin', 'validated', 'Admin', 'SIPORTS')
-    ''', ('admin@siportevent.com', admin_password))
-    
-    # Sample data
-    visitor_password = generate_password_hash('visitor123')
-    exhibitor_password = generate_password_hash('exhibitor123')
-    
-    conn.execute('''
-        INSERT OR IGNORE INTO users (email, password_hash, user_type, visitor_package, status, first_name, last_name, company)
-        VALUES (?, ?, 'visitor', 'Premium', 'validated', 'Marie', 'Dupont', 'Port Autonome Marseille')
-    ''', ('visitor@example.com', visitor_password))
-    
-    conn.execute('''
-        INSERT OR IGNORE INTO users (email, password_hash, user_type, partnership_package, status, first_name, last_name, company)
-        VALUES (?, ?, 'exhibitor', 'Gold', 'validated', 'Jean', 'Martin', 'Maritime Solutions Ltd')
-    ''', ('exposant@example.com', exhibitor_password))
+    with db.connection() as conn:
+        # Nothing to do when a previous start already brought the schema up to date
+        if schema_is_current(conn, WORDPRESS_MIGRATIONS):
+            logger.info("Database schema is current, skipping initialization")
+            return False
+        
+        # Tables, columns and indexes
+        run_migrations(conn, WORDPRESS_MIGRATIONS)
+        
+        # Insert admin user if not exists
+        admin_password = password_hasher.hash_sync('admin123')
+        conn.execute('''
+            INSERT OR IGNORE INTO users (email, password_hash, user_type, status, first_name, last_name)
+            VALUES (?, ?, 'admin', 'validated', 'Admin', 'SIPORTS')
+        ''', ('admin@siportevent.com', admin_password))
+        
+        # Sample data
+        visitor_password = password_hasher.hash_sync('visitor123')
+        exhibitor_password = password_hasher.hash_sync('exhibitor123')
+        
+        conn.execute('''
+            INSERT OR IGNORE INTO users (email, password_hash, user_type, visitor_package, status, first_name, last_name, company)
+            VALUES (?, ?, 'visitor', 'Premium', 'validated', 'Marie', 'Dupont', 'Port Autonome Marseille')
+        ''', ('visitor@example.com', visitor_password))
+        
+        conn.execute('''
+            INSERT OR IGNORE INTO users (email, password_hash, user_type, partnership_package, status, first_name, last_name, company)
+            VALUES (?, ?, 'exhibitor', 'Gold', 'validated', 'Jean', 'Martin', 'Maritime Solutions Ltd')
+        ''', ('exposant@example.com', exhibitor_password))
     
-    conn.commit()
-    conn.close()
-
-# Initialize database on startup
-init_database()
+    return True
 
 # Models
 class UserLogin(BaseModel):
@@ -189,20 +185,27 @@ def verify_jwt_token(token: str) -> dict:
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Get current user from JWT token"""
     token = credentials.credentials
-    payload = verify_jwt_token(token)
+    payload = auth_cache.get_token(token)
+    if payload is None:
+        payload = verify_jwt_token(token)
+        auth_cache.set_token(token, payload)
     
-    conn = sqlite3.connect(DATABASE_URL)
-    conn.row_factory = sqlite3.Row
-    user = conn.execute(
-        'SELECT * FROM users WHERE id = ?',
-        (payload['user_id'],)
-    ).fetchone()
-    conn.close()
+    user = auth_cache.get_user(payload['user_id'])
+    if user is not None:
+        return user
+    
+    with db.connection() as conn:
+        user = conn.execute(
+            'SELECT * FROM users WHERE id = ?',
+            (payload['user_id'],)
+        ).fetchone()
     
     if not user:
         raise HTTPException(status_code=401, detail="Utilisateur non trouvé")
     
-    return dict(user)
+    user = dict(user)
+    auth_cache.set_user(user['id'], user)
+    return user
 
 def admin_required(user: dict = Depends(get_current_user)):
     """Admin authorization required"""
@@ -210,6 +213,33 @@ def admin_required(user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=403, detail="Accès admin requis")
     return user
 
+async def upgrade_password_hash(user_id: int, password: str):
+    """Re-hash a password with the current method after a successful login"""
+    try:
+        new_hash = await password_hasher.hash(password)
+        await async_db.execute('UPDATE users SET password_hash = ? WHERE id = ?', (new_hash, user_id))
+        auth_cache.invalidate_user(user_id)
+        logger.info(f"Password hash upgraded for user {user_id}")
+    except Exception as e:
+        logger.warning(f"Password hash upgrade failed for user {user_id}: {e}")
+
+def create_user_record(conn, user, password_hash: str):
+    """Insert a new user, returning its id or None if the email is taken"""
+    existing = conn.execute(
+        'SELECT id FROM users WHERE email = ?',
+        (user.email,)
+    ).fetchone()
+    
+    if existing:
+        return None
+    
+    cursor = conn.execute('''
+        INSERT INTO users (email, password_hash, user_type, first_name, last_name, company, phone, wp_sync_enabled)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (user.email, password_hash, user.user_type, user.first_name, user.last_name, user.company, user.phone, user.sync_with_wp))
+    
+    return cursor.lastrowid
+
 # =============================================================================
 # WORDPRESS AUTHENTICATION ENDPOINTS
 # =============================================================================
@@ -221,23 +251,21 @@ async def wordpress_login(wp_login: WordPressLogin):
         raise HTTPException(status_code=503, detail="WordPress integration non disponible")
     
     try:
-        # Sync WordPress user to SIPORTS
-        user_data = wp_sync.sync_wp_user_to_siports(wp_login.username, wp_login.password)
+        # Sync WordPress user to SIPORTS (MySQL and SQLite, off the event loop)
+        user_data = await run_in_threadpool(wp_sync.sync_wp_user_to_siports, wp_login.username, wp_login.password)
         
         if not user_data:
             raise HTTPException(status_code=401, detail="Identifiants WordPress invalides")
         
         # Create JWT token for synchronized user
         token = create_jwt_token(user_data)
+        auth_cache.invalidate_user(user_data['id'])
         
         # Log sync activity
-        conn = sqlite3.connect(DATABASE_URL)
-        conn.execute('''
+        await async_db.execute('''
             INSERT INTO wp_sync_log (user_id, action, data, status)
             VALUES (?, ?, ?, ?)
         ''', (user_data['id'], 'wordpress_login', json.dumps({'wp_user_id': user_data.get('wp_user_id')}), 'success'))
-        conn.commit()
-        conn.close()
         
         return {
             "access_token": token,
@@ -269,7 +297,7 @@ async def get_wordpress_events():
         return {"events": []}
     
     try:
-        events = wp_sync.get_wp_events_data()
+        events = await run_in_threadpool(wp_sync.get_wp_events_data)
         return {"events": events, "source": "wordpress"}
         
     except Exception as e:
@@ -283,7 +311,7 @@ async def get_wordpress_exhibitors():
         return {"exhibitors": []}
     
     try:
-        exhibitors = wp_sync.get_wp_exhibitors_data()
+        exhibitors = await run_in_threadpool(wp_sync.get_wp_exhibitors_data)
         return {"exhibitors": exhibitors, "source": "wordpress"}
         
     except Exception as e:
@@ -297,16 +325,17 @@ async def wordpress_webhook(webhook_data: WebhookData):
         raise HTTPException(status_code=503, detail="WordPress integration non disponible")
     
     try:
-        result = wp_sync.webhook_handler(webhook_data.dict())
+        result = await run_in_threadpool(wp_sync.webhook_handler, webhook_data.dict())
+        
+        # Package updates are keyed on wp_user_id, so drop every cached user row
+        if webhook_data.action == 'user_meta_update':
+            auth_cache.invalidate_all_users()
         
         # Log webhook processing
-        conn = sqlite3.connect(DATABASE_URL)
-        conn.execute('''
+        await async_db.execute('''
             INSERT INTO wp_sync_log (action, data, status)
             VALUES (?, ?, ?)
         ''', (f"webhook_{webhook_data.action}", json.dumps(webhook_data.dict()), result['status']))
-        conn.commit()
-        conn.close()
         
         return result
         
@@ -321,25 +350,20 @@ async def get_sync_status(user_id: int, user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=403, detail="Accès non autorisé")
     
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        conn.row_factory = sqlite3.Row
-        
         # Get user sync info
-        user_info = conn.execute(
+        user_info = await async_db.fetchone(
             'SELECT wp_user_id, wp_sync_enabled, last_wp_sync FROM users WHERE id = ?',
             (user_id,)
-        ).fetchone()
+        )
         
         # Get recent sync logs
-        logs = conn.execute('''
+        logs = await async_db.fetchall('''
             SELECT action, status, created_at, error_message 
             FROM wp_sync_log 
             WHERE user_id = ? 
             ORDER BY created_at DESC 
             LIMIT 10
-        ''', (user_id,)).fetchall()
-        
-        conn.close()
+        ''', (user_id,))
         
         return {
             "wp_user_id": user_info['wp_user_id'] if user_info else None,
@@ -365,21 +389,21 @@ async def login(user: UserLogin):
             return await wordpress_login(WordPressLogin(username=user.email, password=user.password))
         
         # Standard SIPORTS authentication
-        conn = sqlite3.connect(DATABASE_URL)
-        conn.row_factory = sqlite3.Row
-        
-        db_user = conn.execute(
+        db_user = await async_db.fetchone(
             'SELECT * FROM users WHERE email = ?',
             (user.email,)
-        ).fetchone()
-        conn.close()
+        )
         
-        if not db_user or not check_password_hash(db_user['password_hash'], user.password):
+        if not db_user or not await password_hasher.verify(db_user['password_hash'], user.password):
             raise HTTPException(status_code=401, detail="Identifiants invalides")
         
         if db_user['status'] != 'validated':
             raise HTTPException(status_code=403, detail="Compte en attente de validation")
         
+        # Transparently upgrade hashes made with an older method or cost
+        if password_hasher.needs_rehash(db_user['password_hash']):
+            await upgrade_password_hash(db_user['id'], user.password)
+        
         # Create JWT token
         user_data = dict(db_user)
         token = create_jwt_token(user_data)
@@ -413,18 +437,17 @@ async def login(user: UserLogin):
 async def update_visitor_package(data: PackageUpdate, user: dict = Depends(get_current_user)):
     """Update user's visitor package with WordPress sync"""
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        conn.execute(
+        await async_db.execute(
             'UPDATE users SET visitor_package = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
             (data.package_type, user['id'])
         )
-        conn.commit()
-        conn.close()
+        auth_cache.invalidate_user(user['id'])
         
         # Sync to WordPress if enabled
         if data.sync_to_wp and WORDPRESS_ENABLED and wp_sync:
             try:
-                success = wp_sync.sync_siports_packages_to_wp(
+                success = await run_in_threadpool(
+                    wp_sync.sync_siports_packages_to_wp,
                     user['id'], 
                     {'visitor_package': data.package_type}
                 )
@@ -447,28 +470,14 @@ async def update_visitor_package(data: PackageUpdate, user: dict = Depends(get_c
 async def register(user: UserRegister):
     """User registration with WordPress sync option"""
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        
-        # Check if user exists
-        existing = conn.execute(
-            'SELECT id FROM users WHERE email = ?',
-            (user.email,)
-        ).fetchone()
+        # Create user (the email check and insert share one transaction)
+        password_hash = await password_hasher.hash(user.password)
+        user_id = await async_db.run(create_user_record, user, password_hash)
         
-        if existing:
+        if user_id is None:
             raise HTTPException(status_code=400, detail="Utilisateur existant")
         
-        # Create user
-        password_hash = generate_password_hash(user.password)
-        cursor = conn.execute('''
-            INSERT INTO users (email, password_hash, user_type, first_name, last_name, company, phone, wp_sync_enabled)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (user.email, password_hash, user.user_type, user.first_name, user.last_name, user.company, user.phone, user.sync_with_wp))
-        
-        user_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        
+        stats_broadcaster.notify()
         return {"message": "Inscription réussie", "user_id": user_id}
         
     except Exception as e:
@@ -477,222 +486,99 @@ async def register(user: UserRegister):
 
 # Include all other endpoints from server_production.py
 @app.get("/api/visitor-packages")
-async def get_visitor_packages():
+async def get_visitor_packages(request: Request):
     """Get visitor packages"""
-    packages = [
-        {
-            "id": 1,
-            "name": "Free Pass",
-            "price": 0,
-            "currency": "€",
-            "description": "Accès gratuit aux espaces d'exposition",
-            "features": [
-                "Accès aux espaces d'exposition",
-                "Conférences publiques",
-                "Application mobile",
-                "Plan du salon"
-            ],
-            "limitations": {
-                "b2b_meetings": 0,
-                "networking": "Limité"
-            }
-        },
-        {
-            "id": 2,
-            "name": "Basic Pass",
-            "price": 150,
-            "currency": "€",
-            "description": "Pass essentiel pour 1 journée",
-            "features": [
-                "Tout du Free Pass",
-                "2 rendez-vous B2B garantis",
-                "Accès aux pauses café",
-                "Badge visiteur personnalisé"
-            ],
-            "limitations": {
-                "b2b_meetings": 2,
-                "networking": "Standard"
-            }
-        },
-        {
-            "id": 3,
-            "name": "Premium Pass",
-            "price": 350,
-            "currency": "€",
-            "description": "Pass complet pour 2 journées",
-            "features": [
-                "Tout du Basic Pass",
-                "5 rendez-vous B2B garantis",
-                "Ateliers techniques spécialisés",
-                "Déjeuners networking",
-                "Accès zone VIP"
-            ],
-            "popular": True,
-            "limitations": {
-                "b2b_meetings": 5,
-                "networking": "Avancé"
-            }
-        },
-        {
-            "id": 4,
-            "name": "VIP Pass",
-            "price": 750,
-            "currency": "€",
-            "description": "Accès privilégié 3 journées complètes",
-            "features": [
-                "Tout du Premium Pass",
-                "Rendez-vous B2B illimités",
-                "Soirée de gala exclusive",
-                "Conférences privées C-Level",
-                "Service de conciergerie",
-                "Transferts inclus"
-            ],
-            "limitations": {
-                "b2b_meetings": "unlimited",
-                "networking": "Premium"
-            }
-        }
-    ]
-    return {"packages": packages}
+    return cached_json_response(request, catalogue.visitor_packages)
 
 @app.get("/api/partnership-packages")
-async def get_partnership_packages():
+async def get_partnership_packages(request: Request):
     """Get partnership packages"""
-    packages = [
-        {
-            "id": 1,
-            "name": "Startup Package",
-            "price": 2500,
-            "currency": "$",
-            "description": "Idéal pour les jeunes entreprises maritimes",
-            "features": [
-                "Stand 6m² (2x3m)",
-                "2 badges exposant",
-                "Listing annuaire digital",
-                "Support technique de base"
-            ],
-            "category": "startup"
-        },
-        {
-            "id": 2,
-            "name": "Silver Package", 
-            "price": 8000,
-            "currency": "$",
-            "description": "Package standard pour exposants confirmés",
-            "features": [
-                "Stand 12m² (3x4m)",
-                "4 badges exposant",
-                "Mobilier standard inclus",
-                "1 session de networking sponsorisée",
-                "Présence catalogue premium"
-            ],
-            "category": "standard"
-        },
-        {
-            "id": 3,
-            "name": "Gold Package",
-            "price": 15000,
-            "currency": "$", 
-            "description": "Package avancé avec visibilité renforcée",
-            "features": [
-                "Stand 20m² (4x5m) - Emplacement premium",
-                "6 badges exposant",
-                "Mobilier sur-mesure",
-                "2 conférences sponsorisées (30min)",
-                "Logo sur supports officiels",
-                "1 cocktail networking privé"
-            ],
-            "popular": True,
-            "category": "premium"
-        },
-        {
-            "id": 4,
-            "name": "Platinum Package",
-            "price": 25000,
-            "currency": "$",
-            "description": "Package prestige - Partenaire officiel",
-            "features": [
-                "Stand 40m² (5x8m) - Hall d'entrée",
-                "10 badges exposant",
-                "Design stand personnalisé",
-                "Keynote session dédiée (45min)",
-                "Mini-site SIPORTS Premium dédié",
-                "Branding événement (logos, panneaux)",
-                "Dîner VIP avec comité d'organisation",
-                "Communiqué de presse co-signé"
-            ],
-            "category": "prestige"
-        }
-    ]
-    return {"packages": packages}
+    return cached_json_response(request, catalogue.partnership_packages)
 
 # Admin endpoints (same as before)
+def count_user_stats(conn):
+    """Dashboard counters plus the WordPress link count"""
+    stats = read_user_stats(conn)
+    
+    # WordPress sync stats
+    stats["wordpress_synced"] = conn.execute('SELECT COUNT(*) FROM users WHERE wp_user_id IS NOT NULL').fetchone()[0] if WORDPRESS_ENABLED else 0
+    
+    return stats
+
 @app.get("/api/admin/dashboard/stats")
 async def get_admin_stats(admin: dict = Depends(admin_required)):
     """Get admin dashboard statistics"""
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        
-        total_users = conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]
-        visitors = conn.execute('SELECT COUNT(*) FROM users WHERE user_type = "visitor"').fetchone()[0]
-        exhibitors = conn.execute('SELECT COUNT(*) FROM users WHERE user_type = "exhibitor"').fetchone()[0]
-        partners = conn.execute('SELECT COUNT(*) FROM users WHERE user_type = "partner"').fetchone()[0]
-        
-        pending = conn.execute('SELECT COUNT(*) FROM users WHERE status = "pending"').fetchone()[0]
-        validated = conn.execute('SELECT COUNT(*) FROM users WHERE status = "validated"').fetchone()[0]
-        rejected = conn.execute('SELECT COUNT(*) FROM users WHERE status = "rejected"').fetchone()[0]
-        
-        # WordPress sync stats
-        wp_synced = conn.execute('SELECT COUNT(*) FROM users WHERE wp_user_id IS NOT NULL').fetchone()[0] if WORDPRESS_ENABLED else 0
-        
-        conn.close()
-        
-        return {
-            "total_users": total_users,
-            "visitors": visitors,
-            "exhibitors": exhibitors,
-            "partners": partners,
-            "pending": pending,
-            "validated": validated,
-            "rejected": rejected,
-            "wordpress_synced": wp_synced
-        }
+        return await async_db.run(count_user_stats)
         
     except Exception as e:
         logger.error(f"Admin stats error: {str(e)}")
         raise HTTPException(status_code=500, detail="Erreur statistiques")
 
+@app.get("/api/admin/dashboard/stats/stream")
+async def stream_admin_stats(request: Request, admin: dict = Depends(admin_required)):
+    """Push dashboard statistics to the admin UI over server-sent events"""
+    async def read_stats():
+        return await async_db.run(count_user_stats)
+    
+    return StreamingResponse(
+        stats_event_stream(request, read_stats, stats_broadcaster),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+class PendingUsersQuery(BaseModel):
+    """Filters and page of the moderation queue"""
+    user_type: Optional[str] = None
+    visitor_package: Optional[str] = None
+    partnership_package: Optional[str] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+    cursor: Optional[str] = None
+    limit: int = Field(50, ge=1, le=500)
+    
+    def filters(self) -> dict:
+        return self.model_dump(exclude={'cursor', 'limit'})
+
 @app.get("/api/admin/users/pending")
-async def get_pending_users(admin: dict = Depends(admin_required)):
-    """Get users pending validation"""
+async def get_pending_users(query: PendingUsersQuery = Depends(), admin: dict = Depends(admin_required)):
+    """Get users pending validation, newest first, one page at a time"""
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        conn.row_factory = sqlite3.Row
-        
-        users = conn.execute('''
-            SELECT id, email, first_name, last_name, company, user_type, wp_user_id, created_at
-            FROM users WHERE status = 'pending'
-            ORDER BY created_at DESC
-        ''').fetchall()
-        conn.close()
+        after = decode_queue_cursor(query.cursor) if query.cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+    
+    try:
+        users, next_cursor = await async_db.run(
+            lambda conn: queue_page(conn, after=after, limit=query.limit, columns=QUEUE_COLUMNS + ('wp_user_id',), **query.filters())
+        )
         
-        return {"users": [dict(user) for user in users]}
+        return {"users": users, "next_cursor": next_cursor}
         
     except Exception as e:
         logger.error(f"Pending users error: {str(e)}")
         raise HTTPException(status_code=500, detail="Erreur récupération utilisateurs")
 
+@app.get("/api/admin/users/pending/count")
+async def count_pending_users(query: PendingUsersQuery = Depends(), admin: dict = Depends(admin_required)):
+    """Count users pending validation matching the queue filters"""
+    try:
+        return {"count": await async_db.run(lambda conn: count_users(conn, **query.filters()))}
+        
+    except Exception as e:
+        logger.error(f"Pending users count error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur récupération utilisateurs")
+
 @app.post("/api/admin/users/{user_id}/validate")
 async def validate_user(user_id: int, admin: dict = Depends(admin_required)):
     """Validate a user"""
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        conn.execute(
+        await async_db.execute(
             'UPDATE users SET status = "validated", updated_at = CURRENT_TIMESTAMP WHERE id = ?',
             (user_id,)
         )
-        conn.commit()
-        conn.close()
+        auth_cache.invalidate_user(user_id)
+        stats_broadcaster.notify()
         
         return {"message": "Utilisateur validé avec succès"}
         
@@ -704,13 +590,12 @@ async def validate_user(user_id: int, admin: dict = Depends(admin_required)):
 async def reject_user(user_id: int, admin: dict = Depends(admin_required)):
     """Reject a user"""
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        conn.execute(
+        await async_db.execute(
             'UPDATE users SET status = "rejected", updated_at = CURRENT_TIMESTAMP WHERE id = ?',
             (user_id,)
         )
-        conn.commit()
-        conn.close()
+        auth_cache.invalidate_user(user_id)
+        stats_broadcaster.notify()
         
         return {"message": "Utilisateur rejeté"}
         
@@ -718,6 +603,42 @@ async def reject_user(user_id: int, admin: dict = Depends(admin_required)):
         logger.error(f"User rejection error: {str(e)}")
         raise HTTPException(status_code=500, detail="Erreur rejet utilisateur")
 
+class ModerationFilter(BaseModel):
+    """Accounts selected by a bulk moderation request"""
+    status: Optional[str] = 'pending'
+    user_type: Optional[str] = None
+    visitor_package: Optional[str] = None
+    partnership_package: Optional[str] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+class BulkModerationRequest(BaseModel):
+    """Model for bulk validation or rejection"""
+    action: str = Field(..., pattern='^(validate|reject)$')
+    user_ids: List[int] = Field(default_factory=list, max_length=MODERATION_MAX_USERS)
+    filter: Optional[ModerationFilter] = None
+
+@app.post("/api/admin/users/bulk-moderation")
+async def bulk_moderate_users(request: BulkModerationRequest, admin: dict = Depends(admin_required)):
+    """Validate or reject many users (ids and/or a filter) in one transaction"""
+    if not request.user_ids and request.filter is None:
+        raise HTTPException(status_code=400, detail="Aucun utilisateur sélectionné")
+    
+    try:
+        filters = request.filter.model_dump() if request.filter else None
+        results, remaining = await async_db.run(moderate_users, request.action, request.user_ids, filters, True)
+        
+        # Caches and counters are updated once for the whole batch
+        if changed_ids(results):
+            auth_cache.invalidate_all_users()
+            stats_broadcaster.notify()
+        
+        return moderation_summary(results, remaining)
+        
+    except Exception as e:
+        logger.error(f"Bulk moderation error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur modération utilisateurs")
+
 # AI Chatbot endpoints (same as before)
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat_endpoint(request: ChatRequest):
@@ -749,12 +670,28 @@ async def event_chat_endpoint(request: ChatRequest):
     request.context_type = "event"
     return await chat_endpoint(request)
 
+@app.post("/api/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """Stream the chatbot answer token by token over server-sent events"""
+    return StreamingResponse(
+        chat_event_stream(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/api/chat/ws")
+async def chat_websocket_endpoint(websocket: WebSocket):
+    """Chat over a WebSocket: one ChatRequest per message, answers streamed as JSON events"""
+    await serve_chat_websocket(websocket)
+
 @app.get("/api/chatbot/health")
 async def chatbot_health_check():
     """Chatbot health check"""
     try:
         test_request = ChatRequest(message="test health", context_type="general")
         response = await siports_ai_service.generate_response(test_request)
+        # Probes must not fill the conversation store with one-off sessions
+        await siports_ai_service.clear_conversation_history(response.session_id)
         
         return {
             "status": "healthy",
@@ -762,7 +699,9 @@ async def chatbot_health_check():
             "version": "2.0.0",
             "mock_mode": siports_ai_service.mock_mode,
             "wordpress_enabled": WORDPRESS_ENABLED,
-            "test_response_length": len(response.response)
+            "test_response_length": len(response.response),
+            "conversations": siports_ai_service.conversations.get_stats(),
+            "response_cache": siports_ai_service.response_cache.get_stats()
         }
     except Exception as e:
         logger.error(f"Chatbot health check failed: {str(e)}")
@@ -796,10 +735,23 @@ async def startup_event():
     """Initialize application on startup"""
     logger.info("SIPORTS v2.0 API with WordPress starting...")
     logger.info(f"Database: {DATABASE_URL}")
+    init_database()
     logger.info(f"WordPress integration: {'Enabled' if WORDPRESS_ENABLED else 'Disabled'}")
     logger.info("AI Chatbot service initialized")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release pooled database connections and worker pools"""
+    password_hasher.shutdown()
+    async_db.shutdown()
+    db.close_all()
+
 if __name__ == "__main__":
+    if '--init-db' in sys.argv:
+        # One-shot schema migration and seeding (release/deploy step)
+        init_database()
+        sys.exit(0)
+    
     import uvicorn
     port = int(os.environ.get("PORT", 8001))
     uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
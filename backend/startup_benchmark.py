@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SIPORTS v2.0 - Startup benchmark
+Measures the cold-start cost a uvicorn worker pays before it can serve requests
+
+Each sample runs in a fresh interpreter: import of the server module, then
+init_database() (what the startup event runs). The "first start" scenario uses
+an empty database; "restart" reuses a database whose schema is already current,
+which is what every additional worker and every redeploy sees.
+
+Usage:
+    python startup_benchmark.py [server|server_production|server_production_wp] [--runs N]
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SAMPLE_CODE = '''
+import json, time
+start = time.perf_counter()
+import {module} as server
+imported = time.perf_counter()
+server.init_database()
+ready = time.perf_counter()
+print(json.dumps({{"import": imported - start, "init": ready - imported, "total": ready - start}}))
+'''
+
+
+def run_sample(module: str, db_path: str) -> dict:
+    """Start one fresh interpreter and return its timings in seconds"""
+    env = dict(os.environ, DATABASE_URL=db_path, WORDPRESS_ENABLED='false')
+    result = subprocess.run(
+        [sys.executable, '-c', SAMPLE_CODE.format(module=module)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def summarize(samples: list) -> dict:
+    """Median and min of each phase, in milliseconds"""
+    return {
+        phase: {
+            "median_ms": round(statistics.median(s[phase] for s in samples) * 1000, 1),
+            "min_ms": round(min(s[phase] for s in samples) * 1000, 1)
+        }
+        for phase in ("import", "init", "total")
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-worker startup cost")
+    parser.add_argument('module', nargs='?', default='server',
+                        choices=['server', 'server_production', 'server_production_wp'])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        first_start = []
+        for i in range(args.runs):
+            first_start.append(run_sample(args.module, os.path.join(tmp, f'first_{i}.db')))
+
+        restart_db = os.path.join(tmp, 'restart.db')
+        run_sample(args.module, restart_db)
+        restart = [run_sample(args.module, restart_db) for _ in range(args.runs)]
+
+    report = {
+        "module": args.module,
+        "runs": args.runs,
+        "first_start": summarize(first_start),
+        "restart": summarize(restart)
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
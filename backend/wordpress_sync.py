@@ -3,28 +3,21 @@ WordPress Synchronization Service for SIPORTS v2.0
 Handles bidirectional sync between WordPress and SIPORTS
 """
 
-import sqlite3
 import logging
 from datetime import datetime
 from wordpress_config import wp_config
+from database import get_pool
 import json
 
 logger = logging.getLogger(__name__)
 
 class WordPressSyncService:
-    def __init__(self, siports_db_path):
-        self.siports_db_path = siports_db_path
-        self.wp_config = wp_config
+    """WordPress <-> SIPORTS sync. Methods block on MySQL and SQLite: call them from a worker thread."""
 
-    def get_siports_connection(self):
-        """Get SIPORTS SQLite connection"""
-        try:
-            conn = sqlite3.connect(self.siports_db_path)
-            conn.row_factory = sqlite3.Row
-            return conn
-        except Exception as e:
-            logger.error(f"SIPORTS database connection failed: {e}")
-            return None
+    def __init__(self, pool):
+        # Shared SIPORTS connection pool (WAL, busy timeout), one connection per thread
+        self.pool = pool
+        self.wp_config = wp_config
 
     def sync_wp_user_to_siports(self, wp_username, password):
         """Sync WordPress user to SIPORTS on login"""
@@ -34,24 +27,17 @@ class WordPressSyncService:
             if not wp_user:
                 return None
 
-            # Get SIPORTS connection
-            siports_conn = self.get_siports_connection()
-            if not siports_conn:
-                return None
-
-            # Sync user data
-            success = self.wp_config.sync_user_to_siports(wp_user, siports_conn)
-            if not success:
-                return None
+            with self.pool.connection() as siports_conn:
+                # Sync user data
+                success = self.wp_config.sync_user_to_siports(wp_user, siports_conn)
+                if not success:
+                    return None
 
-            # Get updated SIPORTS user
-            cursor = siports_conn.cursor()
-            cursor.execute(
-                'SELECT * FROM users WHERE email = ?',
-                (wp_user['email'],)
-            )
-            siports_user = cursor.fetchone()
-            siports_conn.close()
+                # Get updated SIPORTS user
+                siports_user = siports_conn.execute(
+                    'SELECT * FROM users WHERE email = ?',
+                    (wp_user['email'],)
+                ).fetchone()
 
             if siports_user:
                 # Get WordPress packages
@@ -76,17 +62,11 @@ class WordPressSyncService:
         """Sync SIPORTS package updates to WordPress"""
         try:
             # Get SIPORTS user
-            siports_conn = self.get_siports_connection()
-            if not siports_conn:
-                return False
-
-            cursor = siports_conn.cursor()
-            cursor.execute(
-                'SELECT wp_user_id FROM users WHERE id = ?',
-                (user_id,)
-            )
-            user = cursor.fetchone()
-            siports_conn.close()
+            with self.pool.connection() as siports_conn:
+                user = siports_conn.execute(
+                    'SELECT wp_user_id FROM users WHERE id = ?',
+                    (user_id,)
+                ).fetchone()
 
             if not user or not user['wp_user_id']:
                 logger.warning(f"No WordPress user ID found for SIPORTS user {user_id}")
@@ -258,19 +238,14 @@ class WordPressSyncService:
 
             if meta_key in ['siports_visitor_package', 'siports_partnership_package']:
                 # Sync package changes back to SIPORTS
-                siports_conn = self.get_siports_connection()
-                if siports_conn:
-                    cursor = siports_conn.cursor()
-                    
-                    package_field = meta_key.replace('siports_', '')
-                    cursor.execute(
+                package_field = meta_key.replace('siports_', '')
+                with self.pool.connection() as siports_conn:
+                    siports_conn.execute(
                         f'UPDATE users SET {package_field} = ? WHERE wp_user_id = ?',
                         (meta_value, wp_user_id)
                     )
-                    siports_conn.commit()
-                    siports_conn.close()
 
-                    logger.info(f"Synced WordPress package update: {meta_key} = {meta_value}")
+                logger.info(f"Synced WordPress package update: {meta_key} = {meta_value}")
 
             return {"status": "success", "message": "User meta webhook processed"}
 
@@ -300,5 +275,5 @@ def get_wp_sync_service(db_path):
     """Get WordPress sync service instance"""
     global wp_sync_service
     if wp_sync_service is None:
-        wp_sync_service = WordPressSyncService(db_path)
+        wp_sync_service = WordPressSyncService(get_pool(db_path))
     return wp_sync_service
\ No newline at end of file
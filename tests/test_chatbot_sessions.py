@@ -0,0 +1,50 @@
+import asyncio
+
+from chatbot_service import SiportsAIService, ChatRequest
+from conversation_store import MemoryConversationBackend, SQLiteConversationBackend
+from database import get_pool, get_async_db
+from migrations import run_migrations, PRODUCTION_MIGRATIONS
+
+
+async def ask_concurrently(service, *messages):
+    return await asyncio.gather(*(service.generate_response(ChatRequest(message=message)) for message in messages))
+
+
+def history_contents(service, session_id):
+    return [message["content"] for message in asyncio.run(service.get_conversation_history(session_id))]
+
+
+def test_concurrent_anonymous_requests_get_separate_histories():
+    service = SiportsAIService(conversations=MemoryConversationBackend())
+    first, second = asyncio.run(ask_concurrently(service, "Quels forfaits ?", "Quels exposants ?"))
+
+    assert first.session_id != second.session_id
+    assert history_contents(service, first.session_id) == ["Quels forfaits ?", first.response]
+    assert history_contents(service, second.session_id) == ["Quels exposants ?", second.response]
+
+
+def test_concurrent_anonymous_requests_get_separate_sqlite_histories(tmp_path):
+    path = str(tmp_path / 'chat.db')
+    with get_pool(path).connection() as conn:
+        run_migrations(conn, PRODUCTION_MIGRATIONS)
+    async_db = get_async_db(path)
+    try:
+        service = SiportsAIService(conversations=SQLiteConversationBackend(async_db))
+        first, second = asyncio.run(ask_concurrently(service, "Quels forfaits ?", "Quels exposants ?"))
+
+        assert first.session_id != second.session_id
+        assert history_contents(service, first.session_id) == ["Quels forfaits ?", first.response]
+        assert history_contents(service, second.session_id) == ["Quels exposants ?", second.response]
+    finally:
+        async_db.shutdown()
+        get_pool(path).close_all()
+
+
+def test_returned_session_id_continues_the_conversation():
+    service = SiportsAIService(conversations=MemoryConversationBackend())
+    first = asyncio.run(service.generate_response(ChatRequest(message="Bonjour", user_id="42")))
+    second = asyncio.run(service.generate_response(ChatRequest(message="Quels forfaits ?", session_id=first.session_id)))
+
+    assert first.session_id.startswith("session_42_")
+    assert second.session_id == first.session_id
+    assert len(history_contents(service, first.session_id)) == 4
@@ -0,0 +1,45 @@
+import asyncio
+
+from chatbot_service import SiportsAIService, ChatRequest
+from conversation_store import MemoryConversationBackend
+
+
+def ollama_service(*chunks, error=None):
+    """Service in Ollama mode whose stream yields chunks, then raises error if given"""
+    service = SiportsAIService(mock_mode=False, conversations=MemoryConversationBackend())
+
+    async def stream_response_ollama(request, history):
+        for chunk in chunks:
+            yield chunk
+        if error:
+            raise error
+
+    service.stream_response_ollama = stream_response_ollama
+    return service
+
+
+async def collect(service, request):
+    return [event async for event in service.stream_response(request)]
+
+
+def test_ollama_failure_midway_falls_back_to_the_mock_answer():
+    service = ollama_service('Le salon ', 'ouvre', error=ConnectionError('stream interrompu'))
+    request = ChatRequest(message='Quels forfaits ?', context_type='package')
+    events = asyncio.run(collect(service, request))
+
+    types = [event['type'] for event in events]
+    end = events[-1]
+    assert types.index('reset') == 3
+    assert 'Le salon ouvre' not in end['response']
+    assert end['response'] == ''.join(event['content'] for event in events[types.index('reset') + 1:-1])
+    assert service.response_cache.get_stats()['size'] == 0
+    assert asyncio.run(service.get_conversation_history(end['session_id'])) == []
+
+
+def test_complete_ollama_answer_is_cached_and_stored():
+    service = ollama_service('Le salon ', 'ouvre à 9h.')
+    response = asyncio.run(service.generate_response(ChatRequest(message='Horaires ?')))
+
+    assert response.response == 'Le salon ouvre à 9h.'
+    assert service.response_cache.get_stats()['size'] == 1
+    assert len(asyncio.run(service.get_conversation_history(response.session_id))) == 2
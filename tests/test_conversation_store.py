@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from conversation_store import SQLiteConversationBackend
+from database import get_pool, get_async_db
+from migrations import run_migrations, PRODUCTION_MIGRATIONS
+
+
+@pytest.fixture
+def async_db(tmp_path):
+    path = str(tmp_path / 'chat.db')
+    with get_pool(path).connection() as conn:
+        run_migrations(conn, PRODUCTION_MIGRATIONS)
+    async_db = get_async_db(path)
+    yield async_db
+    async_db.shutdown()
+    get_pool(path).close_all()
+
+
+def query(async_db, sql, params=()):
+    return asyncio.run(async_db.fetchall(sql, params))
+
+
+def test_sqlite_backend_keeps_only_the_last_messages_of_a_session(async_db):
+    backend = SQLiteConversationBackend(async_db, max_messages=4)
+    for index in range(5):
+        asyncio.run(backend.add_exchange('s1', f'question {index}', f'réponse {index}'))
+
+    assert [row[0] for row in query(async_db, 'SELECT message FROM chat_messages ORDER BY rowid')] == \
+        ['question 3', 'question 4']
+
+
+def test_sqlite_backend_deletes_idle_sessions_on_write(async_db):
+    backend = SQLiteConversationBackend(async_db, idle_ttl=3600)
+    asyncio.run(backend.add_exchange('idle', 'question', 'réponse'))
+    asyncio.run(async_db.execute("UPDATE chat_sessions SET last_activity = datetime('now', '-2 hours')"))
+    asyncio.run(backend.add_exchange('active', 'question', 'réponse'))
+
+    assert query(async_db, 'SELECT DISTINCT session_id FROM chat_messages')[0][0] == 'active'
+    assert [row[0] for row in query(async_db, 'SELECT id FROM chat_sessions')] == ['active']
+    assert backend.get_stats()['evictions']['expired'] == 1
+
+
+def test_sqlite_backend_evicts_least_recently_active_sessions_over_budget(async_db):
+    # 'x' * 100 twice plus 400 bytes of bookkeeping: 600 bytes per exchange
+    backend = SQLiteConversationBackend(async_db, max_bytes=1300)
+    for index, session_id in enumerate(['s1', 's2', 's3']):
+        asyncio.run(backend.add_exchange(session_id, 'x' * 100, 'x' * 100))
+        asyncio.run(async_db.execute(
+            "UPDATE chat_sessions SET last_activity = datetime('now', ?) WHERE id = ?", (f'-{10 - index} seconds', session_id)
+        ))
+
+    assert sorted(row[0] for row in query(async_db, 'SELECT id FROM chat_sessions')) == ['s2', 's3']
+    assert query(async_db, 'SELECT bytes FROM chat_storage')[0][0] == 1200
+    assert asyncio.run(backend.history('s1')) == []
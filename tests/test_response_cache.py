@@ -0,0 +1,43 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+from chatbot_service import SiportsAIService, ChatRequest
+from conversation_store import MemoryConversationBackend
+from response_cache import normalize_message
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+
+
+def answers(*messages):
+    service = SiportsAIService(conversations=MemoryConversationBackend())
+    return {
+        message: asyncio.run(service.generate_response(ChatRequest(message=message, context_type='event'))).response
+        for message in messages
+    }, service.response_cache.get_stats()
+
+
+def test_normalize_message_only_folds_case_and_spacing():
+    assert normalize_message('  Prix des \t FORFAITS ?\n') == 'prix des forfaits ?'
+    assert normalize_message('quel événement ?') != normalize_message('quel evenement ?')
+    assert normalize_message('rendez-vous') != normalize_message('rendez vous')
+
+
+def test_accented_and_unaccented_questions_keep_their_own_answers():
+    first, _ = answers('quel evenement ?', 'quel événement ?')
+    second, _ = answers('quel événement ?', 'quel evenement ?')
+
+    assert first == second
+    assert first['quel evenement ?'] != first['quel événement ?']
+
+
+def test_case_and_spacing_variants_hit_the_cache():
+    _, stats = answers('Quel programme ?', 'quel   PROGRAMME ?')
+
+    assert stats['hits'] == 1 and stats['misses'] == 1 and stats['size'] == 1
+
+
+def test_chatbot_service_imports_without_numpy():
+    code = "import sys; sys.modules['numpy'] = None; import response_cache, chatbot_service"
+    subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, check=True)